@@ -0,0 +1,122 @@
+# scripts/bench_api.py
+"""
+Load test of the insights API (insights_api.py): requests/sec and latency
+per endpoint for
+
+- uncached: a server started with --cache-size 0, so every request renders,
+- cached: the default server after one warm-up request per endpoint,
+- not_modified: cached, with the ETag sent back in If-None-Match (304s).
+
+Servers run in their own interpreters over a synthetic dataset written to a
+scratch data directory (bench_memory.write_datasets), or over an existing
+one with --data-dir. Each case runs ``--clients`` keep-alive connections for
+``--seconds`` per endpoint.
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+import numpy as np
+from bench_memory import write_datasets
+
+ENDPOINTS = ["/banks", "/sentiment", "/ratings/trend", "/insights"]
+CASES = ["uncached", "cached", "not_modified"]
+
+
+def start_server(data_dir, cache_size):
+    """Start insights_api.py on a free port; returns (process, port)."""
+    env = dict(os.environ, CX_DATA_DIR=data_dir, CX_METRICS="0")
+    proc = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                          "insights_api.py"),
+                             "--port", "0", "--cache-size", str(cache_size), "--quiet"],
+                            env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    for line in proc.stdout:
+        if line.startswith("Serving insights on "):
+            return proc, int(line.split()[3].rsplit(":", 1)[1])
+    proc.wait()
+    raise RuntimeError(f"insights_api.py exited with {proc.returncode}")
+
+def get(conn, path, etag=None):
+    conn.request("GET", path, headers={"If-None-Match": etag} if etag else {})
+    resp = conn.getresponse()
+    body = resp.read()
+    if resp.status not in (200, 304):
+        raise RuntimeError(f"GET {path}: {resp.status} {body[:200]!r}")
+    return resp.status, resp.getheader("ETag")
+
+def hammer(port, path, clients, seconds, etag=None):
+    """Issue GET ``path`` from ``clients`` threads for ``seconds``; returns latencies (s) and wall time."""
+    latencies = [[] for _ in range(clients)]
+    deadline = time.perf_counter() + seconds
+
+    def client(out):
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        try:
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                get(conn, path, etag)
+                out.append(time.perf_counter() - start)
+        finally:
+            conn.close()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(out,)) for out in latencies]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return np.concatenate([np.asarray(l) for l in latencies]), time.perf_counter() - start
+
+def run_case(case, port, endpoints, clients, seconds):
+    rows = []
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    for path in endpoints:
+        _, etag = get(conn, path)  # warm-up (fills the cache unless it is off)
+        lat, wall = hammer(port, path, clients, seconds, etag if case == "not_modified" else None)
+        rows.append((case, path, len(lat), len(lat) / wall, np.percentile(lat, 50) * 1000,
+                     np.percentile(lat, 95) * 1000))
+    conn.close()
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Requests/sec of the insights API, cached vs uncached.")
+    parser.add_argument("--rows", type=int, default=200_000, help="synthetic reviews (ignored with --data-dir)")
+    parser.add_argument("--data-dir", default=None, help="serve this data tree instead of a synthetic one")
+    parser.add_argument("--endpoints", nargs="+", default=ENDPOINTS)
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=CASES)
+    parser.add_argument("--clients", type=int, default=4, help="concurrent keep-alive connections")
+    parser.add_argument("--seconds", type=float, default=3.0, help="duration per endpoint and case")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="cx_bench_api_")
+    servers = []
+    try:
+        if args.data_dir is None:
+            start = time.perf_counter()
+            write_datasets(data_dir, args.rows, args.seed)
+            print(f"{args.rows} synthetic reviews written in {time.perf_counter() - start:.1f}s\n")
+        results = []
+        for case in args.cases:
+            proc, port = start_server(data_dir, 0 if case == "uncached" else 256)
+            servers.append(proc)
+            results += run_case(case, port, args.endpoints, args.clients, args.seconds)
+            proc.terminate()
+            proc.wait()
+        print(f"{'case':<14}{'endpoint':<16}{'requests':>9}{'req/s':>10}{'p50 ms':>9}{'p95 ms':>9}")
+        for case, path, n, rps, p50, p95 in results:
+            print(f"{case:<14}{path:<16}{n:>9}{rps:>10.1f}{p50:>9.2f}{p95:>9.2f}")
+    finally:
+        for proc in servers:
+            if proc.poll() is None:
+                proc.kill()
+        if args.data_dir is None:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
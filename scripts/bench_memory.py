@@ -0,0 +1,127 @@
+# scripts/bench_memory.py
+"""
+Memory of the in-memory review frame: plain pd.read_csv loaders with a
+suffix-duplicating merge (how the EDA used to load) against the compact
+loaders (storage.load_reviews: categoricals, int8/float32, parsed dates,
+text only when asked for) and a merge that carries only the needed columns.
+
+A synthetic cleaned_reviews / sentiment_results pair (Parquet and CSV) is
+written under a scratch data directory, and each case runs in a fresh
+interpreter with CX_DATA_DIR pointing there. Reported per case: seconds,
+the frame's deep memory_usage and the case's own peak RSS (VmHWM, read in
+the child: wait4's figure would include the parent that wrote the data).
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+import pandas as pd
+from config import APPS
+from storage import ChunkedDatasetWriter
+from metrics import process_peak_rss_mb
+from bench_suite import synthetic_raw_reviews
+
+CHUNK_ROWS = 500_000
+
+
+def write_datasets(data_dir, rows, seed=0, chunk_rows=CHUNK_ROWS):
+    """Write ``rows`` synthetic processed reviews as cleaned_reviews and sentiment_results."""
+    processed = os.path.join(data_dir, "processed")
+    rng = np.random.default_rng(seed)
+    with ChunkedDatasetWriter(processed, "cleaned_reviews") as cleaned, \
+            ChunkedDatasetWriter(processed, "sentiment_results") as scored:
+        for c, start in enumerate(range(0, rows, chunk_rows)):
+            size = min(chunk_rows, rows - start)
+            raw = synthetic_raw_reviews(size, seed=seed * 1000 + c, offset=start)
+            df = pd.DataFrame({
+                "review_id": np.arange(start, start + size, dtype="int64"),
+                "content": raw["content"].fillna(""),
+                "score": raw["score"],
+                "at": raw["at"],
+                "app": np.array(APPS, dtype=object)[rng.integers(0, len(APPS), size)],
+            })
+            # lower-casing stands in for clean_text; only the shape of the data matters here
+            df["clean_content"] = df["content"].str.lower()
+            cleaned.write(df)
+            compound = rng.uniform(-1, 1, size).round(4)
+            scored.write(df.assign(compound=compound,
+                                   sentiment=np.select([compound >= 0.05, compound <= -0.05],
+                                                       ["positive", "negative"], "neutral")))
+
+
+# -----------------------------
+# Cases (each runs in its own interpreter and returns the frame it built)
+# -----------------------------
+def case_read_csv():
+    from config import PROCESSED_DATA
+    cleaned = pd.read_csv(os.path.join(PROCESSED_DATA, "cleaned_reviews.csv"))
+    sentiment = pd.read_csv(os.path.join(PROCESSED_DATA, "sentiment_results.csv"))
+    return cleaned.merge(sentiment, how="left", on=["clean_content", "at"], suffixes=("", "_s"))
+
+def case_compact():
+    from eda_helpers import load_cleaned_reviews, load_sentiment_results, merge_sentiment_and_cleaned
+    cleaned = load_cleaned_reviews(text=["clean_content"])
+    sentiment = load_sentiment_results(columns=["review_id", "compound", "sentiment"])
+    return merge_sentiment_and_cleaned(cleaned, sentiment)
+
+def case_compact_no_text():
+    from eda_helpers import load_sentiment_results
+    return load_sentiment_results()
+
+CASES = {
+    "read_csv": case_read_csv,
+    "compact": case_compact,
+    "compact_no_text": case_compact_no_text,
+}
+
+
+def run_case(name, data_dir):
+    """Run one case in a fresh interpreter; returns its result dict."""
+    env = dict(os.environ, CX_DATA_DIR=data_dir, CX_METRICS="0")
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--case", name],
+                          cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+                          stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    result = [line for line in proc.stdout.splitlines() if line.startswith("BENCH ")]
+    if proc.returncode != 0 or not result:
+        raise RuntimeError(f"{name} failed:\n{proc.stdout[-2000:]}")
+    return json.loads(result[-1][6:])
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare review-frame memory: read_csv vs compact loaders.")
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default=None, help="where the datasets are written (kept if given)")
+    parser.add_argument("--case", help=argparse.SUPPRESS)  # internal: run one case in this process
+    args = parser.parse_args()
+
+    if args.case:
+        start = time.perf_counter()
+        df = CASES[args.case]()
+        seconds = time.perf_counter() - start
+        print("BENCH " + json.dumps({"seconds": seconds, "rows": len(df), "columns": len(df.columns),
+                                     "frame_mb": df.memory_usage(deep=True).sum() / 2**20,
+                                     "peak_mb": process_peak_rss_mb()}))
+        return
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="cx_bench_memory_")
+    try:
+        start = time.perf_counter()
+        write_datasets(workdir, args.rows, args.seed)
+        print(f"{args.rows} synthetic reviews written in {time.perf_counter() - start:.1f}s\n")
+        print(f"{'case':<18}{'rows':>10}{'cols':>6}{'seconds':>9}{'frame MB':>10}{'peak MB':>9}")
+        for name in args.cases:
+            result = run_case(name, workdir)
+            print(f"{name:<18}{result['rows']:>10}{result['columns']:>6}{result['seconds']:>9.2f}"
+                  f"{result['frame_mb']:>10.1f}{result['peak_mb']:>9.1f}")
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# scripts/bench_merge.py
+"""
+Benchmark joining sentiment results back onto cleaned reviews: the old merge
+on (clean_content, at) against the integer review_id join.
+
+Builds a synthetic corpus (short reviews drawn from a small vocabulary, so
+texts repeat the way real app reviews do), then times both merges and
+reports output row counts; the text merge fans out on duplicate
+(text, timestamp) pairs, the review_id join does not.
+"""
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from eda_helpers import merge_sentiment_and_cleaned
+
+WORDS = ("app good bad slow fast transfer failed money login otp update crash "
+         "easy nice worst best service bank account balance error fix please").split()
+
+def synthetic_frames(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(1, 6, rows)
+    words = np.array(WORDS, dtype=object)
+    texts = [" ".join(words[rng.integers(0, len(words), n)]) for n in lengths]
+    cleaned = pd.DataFrame({
+        "review_id": rng.permutation(rows).astype(np.int64) * 2654435761,
+        "clean_content": texts,
+        # minute resolution over a month, so some text/time pairs collide
+        "at": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 43_200, rows), unit="min"),
+        "app": pd.Categorical(rng.choice(["CBE", "BOA", "Amole"], rows)),
+        "score": rng.integers(1, 6, rows).astype(np.int8),
+    })
+    compound = rng.uniform(-1, 1, rows)
+    sentiment = cleaned.assign(
+        compound=compound,
+        sentiment=np.select([compound > 0.05, compound < -0.05], ["positive", "negative"], "neutral"),
+    ).sample(frac=1, random_state=seed).reset_index(drop=True)
+    return cleaned, sentiment
+
+def _time(fn, repeat):
+    best, out = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, out
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare text-keyed and review_id merges.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    cleaned, sentiment = synthetic_frames(args.rows)
+    text_secs, text_out = _time(lambda: merge_sentiment_and_cleaned(
+        cleaned, sentiment, on_cols=["clean_content", "at"]), args.repeat)
+    id_secs, id_out = _time(lambda: merge_sentiment_and_cleaned(cleaned, sentiment), args.repeat)
+
+    print(f"{args.rows} reviews, {cleaned['clean_content'].nunique()} distinct texts")
+    print(f"{'merge':<26}{'seconds':>9}{'rows out':>11}")
+    print(f"{'clean_content + at':<26}{text_secs:>9.2f}{len(text_out):>11}")
+    print(f"{'review_id':<26}{id_secs:>9.2f}{len(id_out):>11}")
+    print(f"speedup: {text_secs / id_secs:.1f}x")
+
+if __name__ == "__main__":
+    main()
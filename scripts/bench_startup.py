@@ -0,0 +1,81 @@
+# scripts/bench_startup.py
+"""
+Import-time benchmark for the entry-point scripts.
+
+Runs ``python -X importtime -c "import <module>"`` in a fresh interpreter for
+each entry point (several times, keeping the median) and reports the total
+import time plus the heaviest imports, so startup regressions are visible.
+"""
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPTS_DIR)
+
+ENTRY_POINTS = {
+    "scraper": "import scraper",
+    "scrape_scheduler": "import scrape_scheduler",
+    "preprocessing": "import preprocessing",
+    "sentiment": "import sentiment",
+    "topics": "import topics",
+    "create_tables": "import create_tables",
+    "insert_data": "import insert_data",
+    "run_eda": "import run_eda",
+    "task4_run": "import task4_run",
+}
+
+def parse_importtime(stderr):
+    """Return [(depth, module, cumulative_us)] from -X importtime output."""
+    out = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # nested imports are indented by two extra spaces per level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        out.append((depth, name.strip(), int(cumulative)))
+    return out
+
+def _run(statement):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([SCRIPTS_DIR, PROJECT_ROOT]))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=SCRIPTS_DIR, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{statement!r} failed:\n{proc.stderr[-2000:]}")
+    return parse_importtime(proc.stderr)
+
+def measure(statement, repeat=3):
+    """
+    Median import time (ms) of ``statement`` beyond bare interpreter startup,
+    and the heaviest modules it imports directly.
+    """
+    startup = {name for depth, name, _ in _run("pass") if depth == 0}
+    totals = []
+    direct = []
+    for _ in range(repeat):
+        rows = _run(statement)
+        totals.append(sum(us for depth, name, us in rows
+                          if depth == 0 and name not in startup) / 1000)
+        direct = [(name, us / 1000) for depth, name, us in rows if depth == 1]
+    heaviest = sorted(direct, key=lambda kv: kv[1], reverse=True)[:5]
+    return statistics.median(totals), heaviest
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time of entry-point scripts.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("scripts", nargs="*", default=list(ENTRY_POINTS))
+    args = parser.parse_args()
+
+    print(f"{'script':<18}{'import ms':>10}  heaviest imports")
+    for name in args.scripts:
+        total, top = measure(ENTRY_POINTS[name], args.repeat)
+        heavy = ", ".join(f"{mod} {ms:.0f}ms" for mod, ms in top)
+        print(f"{name:<18}{total:>10.1f}  {heavy}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+# scripts/bench_suite.py
+"""
+Benchmark every pipeline stage on seeded synthetic corpora.
+
+For each corpus size a raw corpus is written in google_play_scraper's CSV
+schema (one <app>_reviews.csv per app in apps.csv) under a scratch data
+directory, and every case runs in a fresh interpreter with CX_DATA_DIR
+pointing there, so peak RSS is the case's own. Cases run in
+pipeline order: each one reads what the previous ones wrote.
+
+Results (seconds, reviews/sec, peak RSS) are compared against a saved
+baseline (reports/benchmarks/baseline.json); a case more than --tolerance
+slower or larger than its baseline is reported as a regression and the
+exit code is 1. --save-baseline records the current run instead.
+
+The db_load case needs PostgreSQL (db_config); it loads into a scratch
+database named <PG_DATABASE>_bench, which is dropped afterwards.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+import pandas as pd
+from config import BASE_DIR, APPS
+from review_sources import FAKE_PHRASES
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BASE_DIR, "reports", "benchmarks", "baseline.json")
+SIZES = [10_000, 100_000]
+TOLERANCE = 0.25
+CHUNK_ROWS = 500_000
+
+RAW_COLUMNS = ["reviewId", "userName", "userImage", "content", "score", "thumbsUpCount",
+               "reviewCreatedVersion", "at", "replyContent", "repliedAt", "appVersion"]
+
+
+# -----------------------------
+# Synthetic corpus
+# -----------------------------
+def _vocabulary(size=5000):
+    # pronounceable pseudo-words, so texts vary the way real reviews do
+    syllables = ["ba", "ka", "lo", "mi", "ne", "ra", "si", "tu", "ve", "zo", "an", "el", "or", "us"]
+    words = []
+    for n in (2, 3, 4):
+        for i in range(len(syllables) ** n):
+            parts, k = [], i
+            for _ in range(n):
+                parts.append(syllables[k % len(syllables)])
+                k //= len(syllables)
+            words.append("".join(parts))
+            if len(words) == size:
+                return words
+    return words
+
+def synthetic_raw_reviews(rows, seed=0, start="2023-01-01", days=730, offset=0):
+    """
+    ``rows`` raw reviews in the scraper's CSV schema, newest first: a known
+    phrase plus Zipf-distributed filler words, with some upper case, URLs,
+    emoji and empty content so the cleaner has work to do.
+    """
+    rng = np.random.default_rng(seed)
+    phrases = np.array(FAKE_PHRASES, dtype=object)
+    vocab = np.array(_vocabulary(), dtype=object)
+    extra = rng.integers(0, 8, rows)
+    fillers = vocab[np.minimum(rng.zipf(1.5, extra.sum()) - 1, len(vocab) - 1)]
+    ends = np.cumsum(extra)
+    content = [p if not n else p + " " + " ".join(fillers[e - n:e])
+               for p, n, e in zip(phrases[rng.integers(0, len(phrases), rows)], extra, ends)]
+    noise = rng.random(rows)
+    for i in np.flatnonzero(noise < 0.02):
+        content[i] = content[i].upper()
+    for i in np.flatnonzero((noise >= 0.02) & (noise < 0.03)):
+        content[i] += " see https://example.com/help?id=1"
+    for i in np.flatnonzero((noise >= 0.03) & (noise < 0.04)):
+        content[i] += " 👍👍"
+    content = pd.Series(content, dtype=object)
+    content[noise > 0.995] = None
+
+    seconds = np.sort(rng.integers(0, days * 86_400, rows))[::-1]
+    ids = np.arange(offset, offset + rows)
+    return pd.DataFrame({
+        "reviewId": [f"synthetic-{seed}-{i}" for i in ids],
+        "userName": [f"user{u}" for u in rng.integers(0, 1_000_000, rows)],
+        "userImage": "",
+        "content": content,
+        "score": rng.integers(1, 6, rows),
+        "thumbsUpCount": rng.integers(0, 20, rows),
+        "reviewCreatedVersion": "1.0",
+        "at": pd.Timestamp(start) + pd.to_timedelta(seconds, unit="s"),
+        "replyContent": None,
+        "repliedAt": None,
+        "appVersion": "1.0",
+    }, columns=RAW_COLUMNS)
+
+def write_corpus(data_dir, rows, seed=0, chunk_rows=CHUNK_ROWS):
+    """Write ``rows`` raw reviews split evenly over the apps, in chunks."""
+    raw_dir = os.path.join(data_dir, "raw")
+    os.makedirs(raw_dir, exist_ok=True)
+    for a, app in enumerate(APPS):
+        app_rows = rows // len(APPS) + (1 if a < rows % len(APPS) else 0)
+        path = os.path.join(raw_dir, f"{app}_reviews.csv")
+        for c, start in enumerate(range(0, app_rows, chunk_rows)):
+            chunk = synthetic_raw_reviews(min(chunk_rows, app_rows - start), seed=seed * 1000 + a * 100 + c,
+                                          offset=start)
+            chunk.to_csv(path, mode="w" if c == 0 else "a", header=c == 0, index=False)
+
+
+# -----------------------------
+# Cases (each runs in its own interpreter and returns timed seconds)
+# -----------------------------
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+def case_clean_text():
+    from preprocessing import clean_series, iter_review_chunks
+    content = pd.concat([c["content"] for app in APPS for c in iter_review_chunks(app)], ignore_index=True)
+    return _timed(lambda: clean_series(content))
+
+def case_preprocess():
+    from preprocessing import preprocess_app_reviews
+    return _timed(preprocess_app_reviews)
+
+def case_sentiment():
+    from sentiment import run_sentiment
+    return _timed(lambda: run_sentiment(use_cache=False))
+
+def case_sentiment_batch():
+    from sentiment import run_sentiment
+    return _timed(lambda: run_sentiment(use_cache=False, engine="batch"))
+
+def case_topics():
+    from topics import run_topic_modeling
+    return _timed(run_topic_modeling)
+
+def case_merge():
+    from eda_helpers import load_cleaned_reviews, load_sentiment_results, merge_sentiment_and_cleaned
+    cleaned, sentiment = load_cleaned_reviews(text=["clean_content"]), load_sentiment_results()
+    return _timed(lambda: merge_sentiment_and_cleaned(cleaned, sentiment))
+
+def case_top_n_words():
+    from eda_helpers import load_sentiment_results, top_n_words
+    texts = load_sentiment_results(columns=["clean_content"])["clean_content"]
+    return _timed(lambda: top_n_words(texts, n=30))
+
+def case_plots():
+    import matplotlib
+    matplotlib.use("Agg")
+    from eda_helpers import (load_sentiment_results, plotting, plot_reviews_per_app, plot_rating_distribution,
+                             plot_avg_rating_over_time, plot_sentiment_distribution,
+                             plot_wordcloud_from_text, plot_top_keywords_bar, top_n_words)
+    df = load_sentiment_results(text=["clean_content"])
+    negative = df.loc[df["sentiment"] == "negative", "clean_content"]
+    plt, _ = plotting()
+
+    def draw():
+        for fig in (plot_reviews_per_app(df), plot_rating_distribution(df), plot_avg_rating_over_time(df),
+                    plot_sentiment_distribution(df), plot_wordcloud_from_text(negative),
+                    plot_top_keywords_bar(top_n_words(negative))):
+            fig.canvas.draw()
+            plt.close(fig)
+    return _timed(draw)
+
+def case_db_load():
+    from config import load_app_registry
+    from insert_data import connect, upsert_banks, load_all_banks
+    conn = connect()
+    try:
+        bank_id_map = upsert_banks(conn, {r["app_name"]: r.get("bank_name") for r in load_app_registry()})
+    finally:
+        conn.close()
+    return _timed(lambda: load_all_banks(bank_id_map, full=True))
+
+CASES = {
+    "clean_text": case_clean_text,
+    "preprocess": case_preprocess,
+    "sentiment": case_sentiment,
+    "sentiment_batch": case_sentiment_batch,
+    "topics": case_topics,
+    "merge": case_merge,
+    "top_n_words": case_top_n_words,
+    "plots": case_plots,
+    "db_load": case_db_load,
+}
+# earlier cases whose outputs a case reads
+REQUIRES = {
+    "sentiment": ["preprocess"], "sentiment_batch": ["preprocess"], "topics": ["preprocess"],
+    "merge": ["sentiment"], "top_n_words": ["sentiment"], "plots": ["sentiment"], "db_load": ["preprocess"],
+}
+
+
+# -----------------------------
+# Runner
+# -----------------------------
+def with_requirements(cases):
+    out = set()
+    todo = list(cases)
+    while todo:
+        case = todo.pop()
+        if case not in out:
+            out.add(case)
+            todo.extend(REQUIRES.get(case, []))
+    return [c for c in CASES if c in out]
+
+def run_case(name, data_dir, env=None):
+    """Run one case in a fresh interpreter; returns (seconds, peak RSS MB)."""
+    env = dict(os.environ, CX_DATA_DIR=data_dir, MPLBACKEND="Agg", **(env or {}))
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--case", name], cwd=SCRIPTS_DIR,
+                          env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    result = [line for line in proc.stdout.splitlines() if line.startswith("BENCH ")]
+    if proc.returncode != 0 or not result:
+        raise RuntimeError(f"{name} failed:\n{proc.stdout[-2000:]}")
+    result = json.loads(result[-1][6:])
+    return result["seconds"], result["peak_mb"]
+
+def create_scratch_db():
+    """(Re)create <PG_DATABASE>_bench with the schema; returns its name."""
+    import psycopg2
+    from psycopg2 import sql
+    from db_config import get_db_params
+    params = get_db_params()
+    name = params["dbname"] + "_bench"
+    conn = psycopg2.connect(**dict(params, dbname="postgres"))
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL("DROP DATABASE IF EXISTS {}").format(sql.Identifier(name)))
+            cur.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(name)))
+    finally:
+        conn.close()
+    subprocess.run([sys.executable, "create_tables.py"], cwd=SCRIPTS_DIR, check=True,
+                   env=dict(os.environ, PG_DATABASE=name), stdout=subprocess.DEVNULL)
+    return name
+
+def drop_scratch_db(name):
+    import psycopg2
+    from psycopg2 import sql
+    from db_config import get_db_params
+    conn = psycopg2.connect(**dict(get_db_params(), dbname="postgres"))
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL("DROP DATABASE IF EXISTS {}").format(sql.Identifier(name)))
+    finally:
+        conn.close()
+
+def load_baseline(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["results"]
+
+def save_baseline(results, path=BASELINE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    baseline = {
+        "saved_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs",
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, indent=2)
+
+def compare(result, base, tolerance=TOLERANCE):
+    if base is None:
+        return "new"
+    slower = result["seconds"] / base["seconds"] if base["seconds"] else 1.0
+    larger = result["peak_mb"] / base["peak_mb"] if base["peak_mb"] else 1.0
+    flag = "REGRESSION" if slower > 1 + tolerance or larger > 1 + tolerance else "ok"
+    return f"{flag} ({slower:.2f}x time, {larger:.2f}x RSS)"
+
+def run_suite(sizes=SIZES, cases=None, workdir=None, baseline_path=BASELINE_PATH,
+              tolerance=TOLERANCE, db=False, seed=0):
+    cases = with_requirements(cases or [c for c in CASES if c != "db_load" or db])
+    baseline = load_baseline(baseline_path)
+    workdir = workdir or tempfile.mkdtemp(prefix="cx_bench_")  # left in place for the caller
+    results = {}
+    regressions = 0
+
+    print(f"{'case':<16}{'rows':>11}{'seconds':>9}{'rows/s':>11}{'peak MB':>9}  vs baseline")
+    for rows in sizes:
+        data_dir = os.path.join(workdir, str(rows))
+        write_corpus(data_dir, rows, seed)
+        db_name = create_scratch_db() if "db_load" in cases else None
+        try:
+            for case in cases:
+                env = {"PG_DATABASE": db_name} if case == "db_load" else None
+                seconds, peak_mb = run_case(case, data_dir, env)
+                key = f"{case}@{rows}"
+                results[key] = {"seconds": round(seconds, 3), "peak_mb": round(peak_mb, 1)}
+                verdict = compare(results[key], baseline.get(key), tolerance)
+                regressions += verdict.startswith("REGRESSION")
+                print(f"{case:<16}{rows:>11}{seconds:>9.2f}{rows / seconds if seconds else 0:>11.0f}"
+                      f"{peak_mb:>9.1f}  {verdict}")
+        finally:
+            if db_name:
+                drop_scratch_db(db_name)
+    return results, regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages on synthetic corpora.")
+    parser.add_argument("--rows", type=int, nargs="+", default=SIZES, help="corpus sizes (10k .. 10M)")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=None,
+                        help="cases to run (plus the cases they read from; default: all but db_load)")
+    parser.add_argument("--db", action="store_true", help="include db_load (needs PostgreSQL)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default=None, help="where corpora are written (kept if given)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="allowed slowdown/RSS growth over the baseline (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--case", help=argparse.SUPPRESS)  # internal: run one case in this process
+    args = parser.parse_args()
+
+    if args.case:
+        from metrics import process_peak_rss_mb
+        # the case's own peak (VmHWM): wait4's would include the parent that wrote the corpus
+        print("BENCH " + json.dumps({"seconds": CASES[args.case](), "peak_mb": process_peak_rss_mb()}))
+        return
+
+    cases = args.cases
+    if cases and args.db and "db_load" not in cases:
+        cases = cases + ["db_load"]
+    workdir = args.workdir or tempfile.mkdtemp(prefix="cx_bench_")
+    try:
+        results, regressions = run_suite(args.rows, cases, workdir, args.baseline,
+                                         args.tolerance, args.db, args.seed)
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.save_baseline:
+        save_baseline({**load_baseline(args.baseline), **results}, args.baseline)
+        print(f"Baseline saved → {args.baseline}")
+    elif regressions:
+        print(f"⚠️ {regressions} regression(s) beyond {args.tolerance:.0%}")
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
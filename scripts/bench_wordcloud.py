@@ -0,0 +1,73 @@
+# scripts/bench_wordcloud.py
+"""
+Benchmark word-cloud input preparation on a synthetic corpus: the old path
+(join every review into one string and let WordCloud tokenize it) against
+streamed term frequencies (KeywordStats, one batch at a time).
+
+Reviews are generated in batches with Zipf-distributed words, so the new
+path never holds the corpus; the old path has to. Both are timed up to the
+word -> count dict the cloud is drawn from (drawing costs the same either
+way), and tracemalloc reports each path's peak Python allocation.
+"""
+import time
+import argparse
+import tracemalloc
+import numpy as np
+import pandas as pd
+from eda_helpers import WORDCLOUD_WORDS, wordcloud_stopwords
+from keywords import KeywordStats
+
+def synthetic_batches(rows, batch_rows, vocab=20_000, seed=0):
+    rng = np.random.default_rng(seed)
+    words = np.array([f"word{i}" for i in range(vocab)], dtype=object)
+    for start in range(0, rows, batch_rows):
+        size = min(batch_rows, rows - start)
+        lengths = rng.integers(2, 15, size)
+        ids = np.minimum(rng.zipf(1.3, lengths.sum()) - 1, vocab - 1)
+        ends = np.cumsum(lengths)
+        tokens = words[ids]
+        yield pd.Series([" ".join(tokens[e - n:e]) for n, e in zip(lengths, ends)])
+
+def joined_text(batches):
+    from wordcloud import WordCloud
+    texts = []
+    for batch in batches:
+        texts.extend(batch.dropna().astype(str).tolist())
+    text = " ".join(texts)
+    counts = WordCloud(collocations=False).process_text(text)
+    return dict(sorted(counts.items(), key=lambda kv: -kv[1])[:WORDCLOUD_WORDS])
+
+def streamed_frequencies(batches):
+    stats = KeywordStats()
+    for batch in batches:
+        stats.add(batch)
+    return stats.frequencies(n=WORDCLOUD_WORDS, stopwords=wordcloud_stopwords())
+
+def _measure(fn, rows, batch_rows):
+    tracemalloc.start()
+    start = time.perf_counter()
+    out = fn(synthetic_batches(rows, batch_rows))
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, out
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare joined-text and frequency-based word clouds.")
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--batch-rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(f"{args.rows} synthetic reviews, batches of {args.batch_rows}")
+    print(f"{'path':<22}{'seconds':>9}{'peak MB':>10}")
+    results = {}
+    for name, fn in [("joined text", joined_text), ("streamed frequencies", streamed_frequencies)]:
+        secs, peak, out = _measure(fn, args.rows, args.batch_rows)
+        results[name] = out
+        print(f"{name:<22}{secs:>9.2f}{peak / 2**20:>10.1f}")
+
+    old, new = results["joined text"], results["streamed frequencies"]
+    print(f"top-{WORDCLOUD_WORDS} words in common: {len(set(old) & set(new))}")
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,58 @@
 import os
+import csv
 
 # Base directory of the project
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-# Data folders
-RAW_DATA = os.path.join(BASE_DIR, "data", "raw")
-PROCESSED_DATA = os.path.join(BASE_DIR, "data", "processed")
+# Data folders; CX_DATA_DIR points raw/processed data at another tree (e.g. a
+# synthetic benchmark corpus, see bench_suite.py)
+DATA_DIR = os.getenv("CX_DATA_DIR", os.path.join(BASE_DIR, "data"))
+RAW_DATA = os.path.join(DATA_DIR, "raw")
+PROCESSED_DATA = os.path.join(DATA_DIR, "processed")
 
-# Create folders if missing
-os.makedirs(RAW_DATA, exist_ok=True)
-os.makedirs(PROCESSED_DATA, exist_ok=True)
+# Rendered plots: the committed reports/ folders, or reports/ inside the
+# CX_DATA_DIR tree so runs on another corpus never overwrite them
+REPORTS_DIR = os.path.join(DATA_DIR, "reports") if os.getenv("CX_DATA_DIR") else os.path.join(BASE_DIR, "reports")
+EDA_PLOTS = os.path.join(REPORTS_DIR, "plots")
+TASK4_PLOTS = os.path.join(REPORTS_DIR, "task4_plots")
+
+# Local NLTK data cache (VADER lexicon), searched before NLTK's defaults
+NLTK_DATA = os.path.join(BASE_DIR, "data", "nltk_data")
+
+def ensure_dir(path):
+    """Create a data folder on first write; nothing is created at import."""
+    os.makedirs(path, exist_ok=True)
+    return path
 
 # Cleaned CSV from preprocessing.py
 CLEANED_DATA = PROCESSED_DATA  # cleaned_reviews.csv lives here
 
+# App registry: one row per app (app_name, app_id, bank_name)
+APPS_FILE = os.path.join(BASE_DIR, "apps.csv")
+
+def load_app_registry(path=APPS_FILE):
+    """Return the app registry as a list of dicts, in file order."""
+    with open(path, newline="", encoding="utf-8") as f:
+        return [row for row in csv.DictReader(f) if row.get("app_name")]
+
 # App names (must match scraper)
-APPS = ["CBE", "BOA", "Amole"]
+APPS = [row["app_name"] for row in load_app_registry()]
+
+# Processed datasets are stored as Parquet; also export CSV copies unless
+# CX_EXPORT_CSV=0
+EXPORT_CSV = os.getenv("CX_EXPORT_CSV", "1") != "0"
+
+# Where EDA aggregates are computed: "parquet" (stream processed files) or
+# "postgres" (rollup tables); see eda_queries.py
+EDA_BACKEND = os.getenv("CX_EDA_BACKEND", "parquet")
+
+# Processes used to render plots (0: one per CPU); see plot_render.py
+PLOT_WORKERS = int(os.getenv("CX_PLOT_WORKERS", "0"))
+
+# Stage metrics (metrics.jsonl, Prometheus *.prom textfiles, profiles); see
+# metrics.py. CX_METRICS=0 turns the files off.
+METRICS_DIR = os.getenv("CX_METRICS_DIR", os.path.join(DATA_DIR, "metrics"))
+METRICS_ENABLED = os.getenv("CX_METRICS", "1") != "0"
 
 # Sentiment & Topic output files
 SENTIMENT_DATA = os.path.join(PROCESSED_DATA, "sentiment_results.csv")
@@ -1,16 +1,20 @@
 # scripts/create_tables.py
+import argparse
+from datetime import datetime
 import psycopg2
 from psycopg2 import sql
 from db_config import get_db_params
 
-DDL = """
+BANKS_DDL = """
 -- Banks table
 CREATE TABLE IF NOT EXISTS banks (
     bank_id SERIAL PRIMARY KEY,
     bank_name TEXT NOT NULL UNIQUE,
     app_name TEXT NOT NULL
 );
+"""
 
+REVIEWS_DDL = """
 -- Reviews table
 CREATE TABLE IF NOT EXISTS reviews (
     review_id SERIAL PRIMARY KEY,
@@ -27,14 +31,302 @@ CREATE TABLE IF NOT EXISTS reviews (
 );
 """
 
+# Stable 64-bit key assigned in preprocessing (review_id in the processed
+# datasets); joins against processed files go through this column.
+# cluster_key is the review_key of the review's near-duplicate cluster
+# (cluster_id, see dedup.py), for counting distinct complaints.
+# sentiment_model tags the scorer behind sentiment_label/score
+# (sentiment.CACHE_NAMES); score_db.py rescores rows whose tag is NULL or stale.
+REVIEW_KEY_DDL = """
+ALTER TABLE reviews ADD COLUMN IF NOT EXISTS review_key BIGINT;
+ALTER TABLE reviews ADD COLUMN IF NOT EXISTS cluster_key BIGINT;
+ALTER TABLE reviews ADD COLUMN IF NOT EXISTS sentiment_model TEXT;
+CREATE INDEX IF NOT EXISTS reviews_review_key_idx ON reviews (review_key);
+"""
+
+# Range-partitioned by month of review_date. Unique constraints on a
+# partitioned table must include the partition key, so review_id is indexed
+# (its sequence keeps it unique) rather than being the primary key. Rows with
+# a NULL or not-yet-partitioned review_date land in reviews_default.
+REVIEWS_PARTITIONED_DDL = """
+-- Reviews table (monthly range partitions)
+CREATE TABLE IF NOT EXISTS reviews (
+    review_id BIGSERIAL,
+    bank_id INTEGER NOT NULL REFERENCES banks(bank_id) ON DELETE CASCADE,
+    review_text TEXT NOT NULL,
+    review_hash CHAR(32) GENERATED ALWAYS AS (md5(review_text)) STORED,
+    rating SMALLINT,
+    review_date TIMESTAMP,
+    sentiment_label TEXT,
+    sentiment_score FLOAT,
+    source TEXT,
+    created_at TIMESTAMP DEFAULT NOW(),
+    review_key BIGINT,
+    UNIQUE (bank_id, review_hash, review_date)
+) PARTITION BY RANGE (review_date);
+
+CREATE TABLE IF NOT EXISTS reviews_default PARTITION OF reviews DEFAULT;
+CREATE INDEX IF NOT EXISTS reviews_review_id_idx ON reviews (review_id);
+"""
+
+LOAD_STATE_DDL = """
+-- Per-bank load progress (high-water mark of loaded review_date)
+CREATE TABLE IF NOT EXISTS load_state (
+    bank_id INTEGER PRIMARY KEY REFERENCES banks(bank_id) ON DELETE CASCADE,
+    high_water_date TIMESTAMP,
+    rows_loaded BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+"""
+
+# Per bank x day x rating x sentiment bucket counts, kept current by
+# refresh_rollups() after each load so dashboards never scan reviews.
+# Unrated / unscored reviews are bucketed as rating 0 / 'unscored'; reviews
+# without a review_date have no day and are left out.
+ROLLUP_DDL = """
+-- Daily review rollup
+CREATE TABLE IF NOT EXISTS review_daily_rollup (
+    bank_id INTEGER NOT NULL REFERENCES banks(bank_id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    rating SMALLINT NOT NULL,
+    sentiment_label TEXT NOT NULL,
+    review_count BIGINT NOT NULL,
+    score_sum FLOAT NOT NULL DEFAULT 0,
+    score_count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (bank_id, day, rating, sentiment_label)
+);
+
+CREATE OR REPLACE VIEW review_monthly_rollup AS
+SELECT bank_id, date_trunc('month', day)::date AS month, rating, sentiment_label,
+       sum(review_count) AS review_count, sum(score_sum) AS score_sum,
+       sum(score_count) AS score_count
+FROM review_daily_rollup
+GROUP BY bank_id, date_trunc('month', day), rating, sentiment_label;
+
+-- Average rating per bank per month (plot_avg_rating_over_time)
+CREATE OR REPLACE VIEW bank_monthly_rating AS
+SELECT b.bank_name, b.app_name, r.month,
+       sum(r.rating * r.review_count) FILTER (WHERE r.rating > 0)::float
+           / NULLIF(sum(r.review_count) FILTER (WHERE r.rating > 0), 0) AS avg_rating,
+       sum(r.review_count) AS review_count
+FROM review_monthly_rollup r JOIN banks b USING (bank_id)
+GROUP BY b.bank_name, b.app_name, r.month;
+
+-- Sentiment mix per bank (plot_sentiment_distribution)
+CREATE OR REPLACE VIEW bank_sentiment_mix AS
+SELECT b.bank_name, b.app_name, r.sentiment_label,
+       sum(r.review_count) AS review_count,
+       sum(r.score_sum) / NULLIF(sum(r.score_count), 0) AS avg_score
+FROM review_daily_rollup r JOIN banks b USING (bank_id)
+GROUP BY b.bank_name, b.app_name, r.sentiment_label;
+"""
+
+# BRIN on the date is tiny and prunes block ranges for date-range scans;
+# the covering index answers per-bank sentiment lookups from the index alone.
+INDEX_DDL = """
+CREATE INDEX IF NOT EXISTS reviews_review_date_brin ON reviews USING brin (review_date);
+CREATE INDEX IF NOT EXISTS reviews_bank_sentiment_idx
+    ON reviews (bank_id, sentiment_label) INCLUDE (rating, sentiment_score, review_date);
+"""
+
+INDEX_NAMES = ["reviews_review_date_brin", "reviews_bank_sentiment_idx", "reviews_review_id_idx",
+               "reviews_review_key_idx"]
+
+# Columns copied when moving rows between reviews tables (review_hash is generated)
+REVIEW_COPY_COLUMNS = ["review_id", "bank_id", "review_text", "rating", "review_date",
+                       "sentiment_label", "sentiment_score", "source", "created_at", "review_key", "cluster_key",
+                       "sentiment_model"]
+
+PARTITION_FUNCTION_DDL = """
+CREATE OR REPLACE FUNCTION create_review_partitions(from_date TIMESTAMP, to_date TIMESTAMP)
+RETURNS INTEGER AS $$
+DECLARE
+    month_start DATE := date_trunc('month', from_date)::date;
+    month_end DATE;
+    part_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    WHILE month_start <= to_date LOOP
+        month_end := (month_start + INTERVAL '1 month')::date;
+        part_name := format('reviews_y%sm%s', to_char(month_start, 'YYYY'), to_char(month_start, 'MM'));
+        IF to_regclass(part_name) IS NULL THEN
+            -- serialize loaders creating the same month only; existing months take no lock
+            PERFORM pg_advisory_xact_lock(hashtext('create_review_partitions'), hashtext(part_name));
+        END IF;
+        IF to_regclass(part_name) IS NULL THEN
+            -- rows for this month that already fell into the default partition
+            -- must move out before the new partition can be attached
+            CREATE TEMP TABLE _reviews_moved AS
+                SELECT {copy_columns} FROM reviews_default
+                WHERE review_date >= month_start AND review_date < month_end;
+            DELETE FROM reviews_default WHERE review_date >= month_start AND review_date < month_end;
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF reviews FOR VALUES FROM (%L) TO (%L)',
+                part_name, month_start, month_end
+            );
+            INSERT INTO reviews ({copy_columns}) SELECT {copy_columns} FROM _reviews_moved;
+            DROP TABLE _reviews_moved;
+            created := created + 1;
+        END IF;
+        month_start := month_end;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+""".replace("{copy_columns}", ", ".join(REVIEW_COPY_COLUMNS))
+
+DDL = BANKS_DDL + REVIEWS_DDL + REVIEW_KEY_DDL + LOAD_STATE_DDL + ROLLUP_DDL
+
+MONTHS_AHEAD = 3
+
+def is_partitioned(cur, table="reviews"):
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table,))
+    row = cur.fetchone()
+    return bool(row) and row[0] == "p"
+
+def ensure_partitions(cur, from_date=None, to_date=None, months_ahead=MONTHS_AHEAD):
+    """
+    Create monthly partitions from ``from_date`` (default: this month) through
+    ``months_ahead`` months past ``to_date`` (default: now). Returns the number created.
+    """
+    now = datetime.now()
+    from_date = from_date or now
+    to_date = max(to_date or now, now)
+    year, month = to_date.year, to_date.month + months_ahead
+    year, month = year + (month - 1) // 12, (month - 1) % 12 + 1
+    cur.execute("SELECT create_review_partitions(%s, %s)", (from_date, datetime(year, month, 1)))
+    return cur.fetchone()[0]
+
+def create_partitioned(cur, months_ahead=MONTHS_AHEAD):
+    """Create the partitioned schema and its upcoming partitions. Returns the number of partitions created."""
+    cur.execute("SELECT to_regclass('reviews') IS NOT NULL")
+    if cur.fetchone()[0] and not is_partitioned(cur):
+        raise ValueError("reviews already exists as an unpartitioned table; convert it with "
+                         "create_tables.py --migrate (migrate_to_partitioned) instead of --partitioned")
+    cur.execute(BANKS_DDL + REVIEWS_PARTITIONED_DDL + REVIEW_KEY_DDL + LOAD_STATE_DDL + ROLLUP_DDL
+                + PARTITION_FUNCTION_DDL)
+    return ensure_partitions(cur, months_ahead=months_ahead)
+
+def has_rollups(cur):
+    cur.execute("SELECT to_regclass('review_daily_rollup') IS NOT NULL")
+    return cur.fetchone()[0]
+
+def refresh_rollups(cur, bank_id=None, from_day=None, to_day=None, days=None):
+    """
+    Recompute the review_daily_rollup buckets for ``bank_id`` between
+    ``from_day`` and ``to_day`` (inclusive dates), or only on the dates in
+    ``days``, from reviews; with no arguments every bucket is rebuilt.
+    Buckets are recomputed rather than incremented so rescored or deleted
+    reviews are picked up too. Returns the number of buckets written.
+    """
+    if bank_id is not None:
+        # loaders and score_db workers may refresh the same bank's days at once;
+        # take the lock until commit so each rebuild sees the previous one
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext('review_daily_rollup'), %s)", (bank_id,))
+    rollup_where = [sql.SQL("TRUE")]
+    review_where = [sql.SQL("review_date IS NOT NULL")]
+    review_from = sql.SQL("reviews")
+    params = {"bank_id": bank_id, "from_day": from_day, "to_day": to_day, "days": days}
+    if days is not None:
+        # one range per day, so each can use the review_date index
+        rollup_where.append(sql.SQL("day = ANY(%(days)s::date[])"))
+        review_from = sql.SQL("reviews JOIN unnest(%(days)s::date[]) AS d(day) "
+                              "ON review_date >= d.day AND review_date < d.day + 1")
+    if bank_id is not None:
+        rollup_where.append(sql.SQL("bank_id = %(bank_id)s"))
+        review_where.append(sql.SQL("bank_id = %(bank_id)s"))
+    if from_day is not None:
+        rollup_where.append(sql.SQL("day >= %(from_day)s"))
+        review_where.append(sql.SQL("review_date >= %(from_day)s::date"))
+    if to_day is not None:
+        rollup_where.append(sql.SQL("day <= %(to_day)s"))
+        review_where.append(sql.SQL("review_date < %(to_day)s::date + 1"))
+
+    cur.execute(sql.SQL("DELETE FROM review_daily_rollup WHERE {}").format(
+        sql.SQL(" AND ").join(rollup_where)), params)
+    cur.execute(sql.SQL("""
+        INSERT INTO review_daily_rollup
+            (bank_id, day, rating, sentiment_label, review_count, score_sum, score_count)
+        SELECT bank_id, review_date::date, COALESCE(rating, 0), COALESCE(sentiment_label, 'unscored'),
+               count(*), COALESCE(sum(sentiment_score), 0), count(sentiment_score)
+        FROM {}
+        WHERE {}
+        GROUP BY 1, 2, 3, 4
+    """).format(review_from, sql.SQL(" AND ").join(review_where)), params)
+    return cur.rowcount
+
+def migrate_to_partitioned(cur, drop_old=False, months_ahead=MONTHS_AHEAD):
+    """
+    Convert an existing unpartitioned ``reviews`` table in place: rename it to
+    reviews_unpartitioned, create the partitioned table with partitions
+    covering its date range, copy every row (keeping review_id) and move the
+    id sequence past the copied ids. Run inside one transaction.
+    """
+    if is_partitioned(cur):
+        print("reviews is already partitioned.")
+        return 0
+    cur.execute(REVIEW_KEY_DDL)  # tables created before review_key existed
+    cur.execute("ALTER TABLE reviews RENAME TO reviews_unpartitioned")
+    # index names are schema-wide; free them for the new table
+    for name in INDEX_NAMES:
+        cur.execute(sql.SQL("ALTER INDEX IF EXISTS {} RENAME TO {}").format(
+            sql.Identifier(name), sql.Identifier(name.replace("reviews_", "reviews_unpartitioned_", 1))
+        ))
+    cur.execute(REVIEWS_PARTITIONED_DDL + REVIEW_KEY_DDL + PARTITION_FUNCTION_DDL)
+    cur.execute("SELECT min(review_date), max(review_date) FROM reviews_unpartitioned")
+    lo, hi = cur.fetchone()
+    ensure_partitions(cur, lo, hi, months_ahead)
+    columns = sql.SQL(", ").join(map(sql.Identifier, REVIEW_COPY_COLUMNS))
+    cur.execute(sql.SQL("INSERT INTO reviews ({cols}) SELECT {cols} FROM reviews_unpartitioned").format(cols=columns))
+    moved = cur.rowcount
+    cur.execute(
+        "SELECT setval(pg_get_serial_sequence('reviews', 'review_id'), "
+        "GREATEST((SELECT max(review_id) FROM reviews), 1))"
+    )
+    if drop_old:
+        cur.execute("DROP TABLE reviews_unpartitioned")
+    return moved
+
 def main():
+    parser = argparse.ArgumentParser(description="Create or migrate the bank_reviews schema.")
+    parser.add_argument("--partitioned", action="store_true",
+                        help="create reviews range-partitioned by month of review_date")
+    parser.add_argument("--migrate", action="store_true",
+                        help="convert an existing unpartitioned reviews table to partitions")
+    parser.add_argument("--drop-old", action="store_true",
+                        help="drop reviews_unpartitioned after --migrate copies it")
+    parser.add_argument("--refresh-rollups", action="store_true",
+                        help="rebuild every review_daily_rollup bucket from reviews")
+    parser.add_argument("--months-ahead", type=int, default=MONTHS_AHEAD,
+                        help="future monthly partitions to keep ready")
+    args = parser.parse_args()
+
     params = get_db_params()
     conn = None
     try:
         conn = psycopg2.connect(**params)
+        if args.migrate:
+            with conn.cursor() as cur:
+                moved = migrate_to_partitioned(cur, args.drop_old, args.months_ahead)
+                cur.execute(INDEX_DDL)
+            conn.commit()
+            print(f"Migrated {moved} reviews into the partitioned table.")
+            return
+        if args.refresh_rollups:
+            with conn.cursor() as cur:
+                cur.execute(ROLLUP_DDL)
+                buckets = refresh_rollups(cur)
+            conn.commit()
+            print(f"Rollups rebuilt ({buckets} daily buckets).")
+            return
         conn.autocommit = True
         with conn.cursor() as cur:
-            cur.execute(DDL)
+            if args.partitioned or is_partitioned(cur):
+                created = create_partitioned(cur, args.months_ahead)
+                print(f"Partitioned tables created/verified ({created} new partitions).")
+            else:
+                cur.execute(DDL)
+            cur.execute(INDEX_DDL)
             print("Tables created/verified successfully.")
     except Exception as e:
         print("Error creating tables:", e)
@@ -0,0 +1,259 @@
+# scripts/dedup.py
+"""
+Near-duplicate clustering of cleaned reviews with MinHash and LSH banding.
+
+Each review's clean_content is shingled into its words and word bigrams, and
+NUM_PERM MinHash values (multiply-shift hashes of 64-bit shingle keys)
+estimate the Jaccard similarity of any two reviews. Signatures are cut into
+BANDS bands; reviews that share a band's bucket are candidates, and each
+candidate is compared with the bucket's first review only, so the work grows
+with the number of reviews rather than its square. Pairs whose estimated
+similarity reaches THRESHOLD are linked, and the connected components are
+the clusters.
+
+A cluster's id (``cluster_id``) is the review_id of its oldest review. A
+newer review that joins one cluster leaves its id as it was, but one that
+links two clusters merges them, and the rows of the cluster whose oldest
+review is younger take the other's id. Treat ids as a grouping of the current
+dataset, not as permanent: rows already loaded into PostgreSQL keep the
+cluster_key they were loaded with. preprocessing.py adds the column to
+cleaned_reviews; sentiment.py and topics.py score one review per cluster and
+copy the result to the others, and insert_data.py loads it as
+reviews.cluster_key for counting. Run this script to (re)cluster an existing
+cleaned_reviews dataset (signatures are spilled to disk; see add_clusters)
+and print the largest clusters.
+"""
+import argparse
+import numpy as np
+import pandas as pd
+from config import PROCESSED_DATA, EXPORT_CSV
+from score_cache import text_hashes
+from metrics import stage
+
+NUM_PERM = 64       # MinHash values per review
+BANDS = 16          # LSH bands of NUM_PERM // BANDS rows each
+THRESHOLD = 0.7     # estimated Jaccard similarity that links two reviews
+SEED = 1
+BATCH_ROWS = 50_000
+PERM_CHUNK = 16     # hash functions evaluated per pass (bounds memory)
+
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+_FNV = np.uint64(0x100000001B3)
+
+
+def shingle_keys(texts):
+    """
+    64-bit keys of every review's word and word-bigram shingles. Returns
+    (keys, starts): the keys grouped by review and the offset of each
+    review's first key. Empty reviews get a single key of 0.
+    """
+    lengths = np.empty(len(texts), dtype=np.int64)
+    words = []
+    for i, text in enumerate(texts):
+        tokens = text.split() if isinstance(text, str) else []
+        lengths[i] = len(tokens)
+        words.extend(tokens)
+    codes, vocab = pd.factorize(pd.Series(words, dtype=object))
+    word_keys = text_hashes(vocab).view(np.uint64)[codes] if len(words) else np.empty(0, np.uint64)
+
+    doc = np.repeat(np.arange(len(texts)), lengths)
+    same = doc[:-1] == doc[1:]
+    bigrams = (word_keys[:-1][same] * _MIX) ^ word_keys[1:][same]
+    empty = np.flatnonzero(lengths == 0)
+    keys = np.concatenate([word_keys, bigrams, np.zeros(len(empty), np.uint64)])
+    owner = np.concatenate([doc, doc[:-1][same], empty])
+    order = np.argsort(owner, kind="stable")
+    starts = np.searchsorted(owner[order], np.arange(len(texts)))
+    return keys[order], starts
+
+def _hash_params(num_perm, seed):
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, 2**63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)  # odd multipliers
+    b = rng.integers(0, 2**63, num_perm, dtype=np.uint64)
+    return a, b
+
+def minhash_signatures(texts, num_perm=NUM_PERM, seed=SEED):
+    """(len(texts), num_perm) uint32 MinHash signatures; each distinct text is hashed once."""
+    a, b = _hash_params(num_perm, seed)
+    codes, distinct = pd.factorize(pd.Series(texts, dtype=object), use_na_sentinel=False)
+    keys, starts = shingle_keys(distinct)
+    sig = np.empty((len(distinct), num_perm), dtype=np.uint32)
+    if not len(distinct):
+        return sig
+    for p in range(0, num_perm, PERM_CHUNK):
+        # multiply-shift: the top 32 bits of a*x + b (mod 2**64); one row per hash
+        # function keeps each review's keys contiguous for reduceat
+        h = a[p:p + PERM_CHUNK, None] * keys
+        h += b[p:p + PERM_CHUNK, None]
+        h >>= np.uint64(32)
+        sig[:, p:p + PERM_CHUNK] = np.minimum.reduceat(h, starts, axis=1).T
+    return sig[codes]
+
+def iter_signatures(texts, num_perm=NUM_PERM, seed=SEED, batch_rows=BATCH_ROWS):
+    for start in range(0, len(texts), batch_rows):
+        yield minhash_signatures(texts[start:start + batch_rows], num_perm, seed)
+
+def lsh_components(sig, bands=BANDS, threshold=THRESHOLD):
+    """
+    Cluster the rows of ``sig``; returns, for every row, the position of the
+    first row of its cluster.
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    n, num_perm = sig.shape
+    rows = num_perm // bands
+    src, dst = [], []
+    for band in range(bands):
+        cols = np.asarray(sig[:, band * rows:(band + 1) * rows])  # one read of a memmap
+        bucket = np.zeros(n, dtype=np.uint64)
+        for j in range(rows):
+            bucket = (bucket ^ cols[:, j].astype(np.uint64)) * _FNV
+        order = np.argsort(bucket, kind="stable")
+        new_bucket = np.r_[True, bucket[order][1:] != bucket[order][:-1]]
+        first = order[np.flatnonzero(new_bucket)][np.cumsum(new_bucket) - 1]
+        member = order[~new_bucket]
+        first = first[~new_bucket]
+        for start in range(0, len(member), 1_000_000):
+            m, f = member[start:start + 1_000_000], first[start:start + 1_000_000]
+            similar = (sig[m] == sig[f]).mean(axis=1) >= threshold
+            src.append(m[similar])
+            dst.append(f[similar])
+
+    src = np.concatenate(src) if src else np.empty(0, np.int64)
+    dst = np.concatenate(dst) if dst else np.empty(0, np.int64)
+    graph = coo_matrix((np.ones(len(src), dtype=np.int8), (src, dst)), shape=(n, n))
+    _, labels = connected_components(graph, directed=False)
+    _, first_of_label = np.unique(labels, return_index=True)
+    return first_of_label[labels]
+
+def _oldest_first(review_ids, dates=None):
+    if dates is None:
+        return np.argsort(review_ids, kind="stable")
+    return np.lexsort((review_ids, pd.to_datetime(dates).to_numpy()))
+
+def cluster_ids(df, num_perm=NUM_PERM, bands=BANDS, threshold=THRESHOLD, seed=SEED):
+    """cluster_id (review_id of the cluster's oldest review) for every row of ``df``."""
+    order = _oldest_first(df["review_id"].to_numpy(), df["at"] if "at" in df.columns else None)
+    texts = df["clean_content"].to_numpy()[order]
+    sig = np.concatenate(list(iter_signatures(texts, num_perm, seed))) if len(df) else \
+        np.empty((0, num_perm), np.uint32)
+    first = lsh_components(sig, bands, threshold)
+    out = np.empty(len(df), dtype=np.int64)
+    out[order] = df["review_id"].to_numpy()[order][first]
+    return out
+
+def representative_texts(df, column="clean_content", key=None):
+    """
+    ``column`` of each row's cluster representative (the row whose review_id
+    is the cluster_id, else the cluster's first row in ``df``); ``df[column]``
+    itself when there are no clusters. With ``key`` (one value per row, e.g.
+    sentiment.sentiment_keys) clusters are split by it first: a row only
+    takes the text of a row with the same key.
+    """
+    if "cluster_id" not in df.columns:
+        return df[column]
+    group = df["cluster_id"].to_numpy()
+    if key is not None:
+        group = pd.MultiIndex.from_arrays([group, np.asarray(key)]).factorize()[0]
+    group = pd.Series(group, index=df.index)
+    is_rep = (df["review_id"] == df["cluster_id"]).to_numpy()
+    first = np.argsort(~is_rep, kind="stable")
+    reps = pd.Series(df[column].to_numpy()[first], index=group.to_numpy()[first])
+    return group.map(reps[~reps.index.duplicated()])
+
+def cluster_heads(df):
+    """Mask selecting one row per cluster (every row when there are no clusters)."""
+    if "cluster_id" not in df.columns:
+        return np.ones(len(df), dtype=bool)
+    return ~df["cluster_id"].duplicated().to_numpy()
+
+def fan_out(df, heads, values):
+    """Spread ``values``, computed for the ``heads`` rows of ``df``, to every row of their cluster."""
+    if "cluster_id" not in df.columns:
+        return np.asarray(values)
+    return df["cluster_id"].map(pd.Series(values, index=df["cluster_id"][heads])).to_numpy()
+
+def cluster_report(df, n=10):
+    """Print cluster counts and the ``n`` largest clusters."""
+    sizes = df["cluster_id"].value_counts()
+    dup = int((sizes - 1).sum())
+    print(f"{len(df)} reviews in {len(sizes)} clusters: {dup} near-duplicates "
+          f"({dup / max(len(df), 1):.1%}) share their cluster's scores")
+    if "clean_content" in df.columns:
+        texts = representative_texts(df.loc[df["cluster_id"].isin(sizes.index[:n])])
+        sample = texts.groupby(df["cluster_id"]).first()
+        for cid, size in sizes.head(n).items():
+            print(f"  {size:>7}  {str(sample.get(cid, ''))[:60]!r}")
+
+def add_clusters(directory=PROCESSED_DATA, name="cleaned_reviews", num_perm=NUM_PERM, bands=BANDS,
+                 threshold=THRESHOLD, seed=SEED, csv=EXPORT_CSV, batch_rows=BATCH_ROWS):
+    """
+    (Re)compute cluster_id for a saved dataset without loading its text at
+    once: review_id and at are read first to fix the oldest-first order, then
+    signatures are built batch by batch into a temporary file next to the
+    dataset (not held in memory), and the file is rewritten with the new
+    column. Memory still grows with the number of reviews, by a few 8-byte
+    values each for ids, order and LSH buckets, but not with their text or
+    signatures. Returns the dataset's review_id -> cluster_id.
+    """
+    import os
+    import pyarrow.parquet as pq
+    from storage import parquet_path, ChunkedDatasetWriter, ROW_GROUP_SIZE
+
+    path = parquet_path(directory, name)
+    sig_path = path + ".sig.npy"
+    with stage("signatures") as st:
+        keys = pq.read_table(path, columns=["review_id", "at"]).to_pandas()
+        ids = keys["review_id"].to_numpy()
+        order = _oldest_first(ids, keys["at"])
+        del keys
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        # rows go straight to their oldest-first position on disk
+        sig = np.lib.format.open_memmap(sig_path, mode="w+", dtype=np.uint32, shape=(len(ids), num_perm)) \
+            if len(ids) else np.empty((0, num_perm), np.uint32)
+        offset = 0
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_rows, columns=["clean_content"]):
+            texts = batch.column(0).to_numpy(zero_copy_only=False)
+            sig[rank[offset:offset + len(texts)]] = minhash_signatures(texts, num_perm, seed)
+            offset += len(texts)
+        del rank
+        st.rows = len(ids)
+    try:
+        with stage("lsh", rows=len(ids)):
+            first = lsh_components(sig, bands, threshold)
+    finally:
+        del sig
+        if os.path.exists(sig_path):
+            os.remove(sig_path)
+    clusters = np.empty(len(ids), dtype=np.int64)
+    clusters[order] = ids[order][first]
+
+    with stage("rewrite", rows=len(ids)), ChunkedDatasetWriter(directory, name, csv=csv) as writer:
+        offset = 0
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=ROW_GROUP_SIZE):
+            part = batch.to_pandas()
+            part["cluster_id"] = clusters[offset:offset + len(part)]
+            offset += len(part)
+            writer.write(part)
+    return pd.Series(clusters, index=ids, name="cluster_id")
+
+def main():
+    parser = argparse.ArgumentParser(description="Cluster near-duplicate cleaned reviews (MinHash + LSH).")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="estimated Jaccard to link reviews")
+    parser.add_argument("--perms", type=int, default=NUM_PERM, help="MinHash values per review")
+    parser.add_argument("--bands", type=int, default=BANDS, help="LSH bands (must divide --perms)")
+    parser.add_argument("--top", type=int, default=10, help="largest clusters to print")
+    args = parser.parse_args()
+    if args.perms % args.bands:
+        parser.error("--bands must divide --perms")
+
+    with stage("dedup") as st:
+        clusters = add_clusters(num_perm=args.perms, bands=args.bands, threshold=args.threshold)
+        st.rows = len(clusters)
+    from storage import load_reviews
+    cluster_report(load_reviews(PROCESSED_DATA, "cleaned_reviews", text=["clean_content"]), args.top)
+
+if __name__ == "__main__":
+    main()
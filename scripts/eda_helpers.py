@@ -2,53 +2,72 @@
 import os
 import pandas as pd
 import numpy as np
-from collections import Counter
-import matplotlib.pyplot as plt
-import seaborn as sns
-from wordcloud import WordCloud
-
-sns.set(style="whitegrid")
 
 import sys
-import os
 
-# allow relative imports from project root
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-
-from scripts.config import PROCESSED_DATA
-
-def load_cleaned_reviews(fname="cleaned_reviews.csv"):
-    path = os.path.join(PROCESSED_DATA, fname)
-    if not os.path.exists(path):
-        raise FileNotFoundError(f"Missing file: {path}")
-    return pd.read_csv(path)
-
-def load_sentiment_results(fname="sentiment_results.csv"):
-    path = os.path.join(PROCESSED_DATA, fname)
-    if not os.path.exists(path):
-        raise FileNotFoundError(f"Missing file: {path}")
-    return pd.read_csv(path)
-
-def merge_sentiment_and_cleaned(cleaned_df, sentiment_df, on_cols=None):
-    # default merge by content and date if no review_id
-    if on_cols is None:
-        # prefer unique id if present
-        if "review_id" in cleaned_df.columns and "review_id" in sentiment_df.columns:
-            on_cols = ["review_id"]
-        else:
-            # fallback to content + date (not ideal but works)
-            on_cols = ["clean_content", "at"] if "at" in cleaned_df.columns else ["clean_content"]
-    merged = cleaned_df.merge(sentiment_df, how="left", left_on=on_cols, right_on=on_cols, suffixes=("", "_s"))
-    return merged
-
-def save_plot(fig, path, dpi=150):
+# the scripts import each other flat (from config import ...); this keeps that
+# working when the module is imported as scripts.<name> (notebooks, python -m)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import PROCESSED_DATA
+from storage import load_reviews
+from eda_queries import aggregate
+from keywords import KeywordStats, top_words_by_group
+
+def load_cleaned_reviews(fname="cleaned_reviews", columns=None, apps=None, start=None, end=None, text=False):
+    # reads cleaned_reviews.parquet (falls back to .csv) as a compact frame
+    # (storage.REVIEW_DTYPES); only the requested columns, apps and
+    # [start, end) date range are loaded, and the text columns only with
+    # text=True or text=["clean_content"]
+    return load_reviews(PROCESSED_DATA, fname, columns=columns, text=text, apps=apps, start=start, end=end)
+
+def load_sentiment_results(fname="sentiment_results", columns=None, apps=None, start=None, end=None, text=False):
+    return load_reviews(PROCESSED_DATA, fname, columns=columns, text=text, apps=apps, start=start, end=end)
+
+def merge_sentiment_and_cleaned(cleaned_df, sentiment_df, on_cols=None, columns=None):
+    # preferred: integer join on the review_id assigned in preprocessing;
+    # columns cleaned_df already has are the same review's values, so only
+    # the new ones (compound, sentiment, ...) are brought over; ``columns``
+    # narrows that to the ones the caller needs
+    if on_cols is None and "review_id" in cleaned_df.columns and "review_id" in sentiment_df.columns:
+        on_cols = ["review_id"]
+    elif on_cols is None:
+        # datasets written before review_id existed: content + date (not ideal but works)
+        on_cols = ["clean_content", "at"] if "at" in cleaned_df.columns else ["clean_content"]
+    extra = [c for c in (columns or sentiment_df.columns) if c not in cleaned_df.columns and c not in on_cols]
+    right = sentiment_df[list(on_cols) + extra]
+    if right.duplicated(on_cols).any():
+        right = right.drop_duplicates(on_cols)
+    return cleaned_df.join(right.set_index(on_cols), on=on_cols, how="left")
+
+_plotting = None
+
+def plotting():
+    """
+    Import matplotlib/seaborn on first use (and apply the seaborn theme once),
+    so callers that only need loaders or top_n_words never pay for them.
+    """
+    global _plotting
+    if _plotting is None:
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+        sns.set(style="whitegrid")
+        _plotting = (plt, sns)
+    return _plotting
+
+def save_plot(fig, path, dpi=150, metadata=None):
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    fig.savefig(path, bbox_inches="tight", dpi=dpi)
+    fig.savefig(path, bbox_inches="tight", dpi=dpi, metadata=metadata)
+
+def _aggregated(df, view):
+    # plot helpers take either raw reviews or the matching eda_queries view
+    return df if "review_count" in df.columns else aggregate(df, view)
 
 def plot_reviews_per_app(df, save_path=None):
+    plt, sns = plotting()
+    counts = _aggregated(df, "reviews_per_app")
     fig, ax = plt.subplots(figsize=(7,4))
-    order = df['app'].value_counts().index
-    sns.countplot(data=df, x='app', order=order, ax=ax)
+    sns.barplot(data=counts, x='app', y='review_count', order=counts['app'], ax=ax)
     ax.set_title("Number of Reviews per App")
     ax.set_xlabel("App")
     ax.set_ylabel("Review Count")
@@ -57,10 +76,12 @@ def plot_reviews_per_app(df, save_path=None):
     return fig
 
 def plot_rating_distribution(df, save_path=None):
-    fig, axes = plt.subplots(1,3, figsize=(14,4), sharey=True)
-    apps = df['app'].unique()
+    plt, sns = plotting()
+    counts = _aggregated(df, "rating_distribution")
+    apps = counts['app'].unique()
+    fig, axes = plt.subplots(1, max(len(apps), 3), figsize=(14,4), sharey=True)
     for i, app in enumerate(apps):
-        sns.countplot(data=df[df['app']==app], x='score', ax=axes[i])
+        sns.barplot(data=counts[counts['app']==app], x='score', y='review_count', ax=axes[i])
         axes[i].set_title(f"{app} - Rating Distribution")
         axes[i].set_xlabel("Rating")
         axes[i].set_ylabel("Count")
@@ -70,9 +91,16 @@ def plot_rating_distribution(df, save_path=None):
     return fig
 
 def plot_avg_rating_over_time(df, time_col="at", save_path=None, freq="M"):
-    df = df.copy()
-    df[time_col] = pd.to_datetime(df[time_col])
-    monthly = df.groupby([pd.Grouper(key=time_col, freq=freq), "app"])['score'].mean().reset_index()
+    plt, sns = plotting()
+    if "review_count" in df.columns:
+        monthly = df
+    elif freq == "M" and time_col == "at":
+        monthly = aggregate(df, "avg_rating_over_time")
+    else:
+        if not pd.api.types.is_datetime64_any_dtype(df[time_col]):
+            # compact frames (load_reviews) arrive parsed; only convert raw ones
+            df = df.assign(**{time_col: pd.to_datetime(df[time_col])})
+        monthly = df.groupby([pd.Grouper(key=time_col, freq=freq), "app"], observed=True)['score'].mean().reset_index()
     fig, ax = plt.subplots(figsize=(10,5))
     sns.lineplot(data=monthly, x=time_col, y='score', hue='app', marker="o", ax=ax)
     ax.set_title("Average Rating Over Time (monthly)")
@@ -82,8 +110,14 @@ def plot_avg_rating_over_time(df, time_col="at", save_path=None, freq="M"):
     return fig
 
 def plot_sentiment_distribution(df, sentiment_col="sentiment", save_path=None):
+    plt, sns = plotting()
+    if "review_count" in df.columns:
+        counts = df
+    else:
+        counts = aggregate(df.rename(columns={sentiment_col: "sentiment"}), "sentiment_distribution")
+        sentiment_col = "sentiment"
     fig, ax = plt.subplots(figsize=(7,4))
-    sns.countplot(data=df, x=sentiment_col, hue='app', dodge=True, ax=ax)
+    sns.barplot(data=counts, x=sentiment_col, y='review_count', hue='app', dodge=True, ax=ax)
     ax.set_title("Sentiment Distribution by App")
     ax.set_ylabel("Count")
     if save_path:
@@ -91,18 +125,39 @@ def plot_sentiment_distribution(df, sentiment_col="sentiment", save_path=None):
     return fig
 
 def top_n_words(series, n=30, stopwords=None):
-    stopwords = stopwords or set()
-    counter = Counter()
-    for text in series.dropna().astype(str):
-        for w in text.split():
-            w = w.strip()
-            if len(w) > 2 and w not in stopwords:
-                counter[w] += 1
-    return counter.most_common(n)
+    # same ranking as Counter.most_common over words longer than 2 chars;
+    # for many groups at once use keywords.KeywordStats directly
+    return top_words_by_group(series.dropna().astype(str), n=n, stopwords=stopwords).get(None, [])
 
-def plot_wordcloud_from_text(series, save_path=None):
-    text = " ".join(series.dropna().astype(str).tolist())
-    wc = WordCloud(width=1200, height=600, background_color="white", collocations=False).generate(text)
+WORDCLOUD_WORDS = 200  # WordCloud's default max_words
+
+# bank names and generic app words left out of the Task 4 drivers/pain points
+# (task4_run.py and the insights API)
+TASK4_STOPWORDS = frozenset([
+    "app","bank","payment","payments","service","mobile","update","please",
+    "cbe","bankofabyssinia","boa","amole"
+])
+
+def wordcloud_stopwords(extra=None):
+    # the stopwords WordCloud.generate() would have removed, plus ``extra``
+    from wordcloud import STOPWORDS
+    return set(STOPWORDS) | set(extra or ())
+
+def word_frequencies(series, n=WORDCLOUD_WORDS, stopwords=None, batch_size=100_000):
+    # term counts for a word cloud, tokenized a batch at a time so memory
+    # follows the vocabulary, not the corpus; the keyword bars use the same
+    # KeywordStats, see KeywordStats.frequencies to reuse one pass for both
+    stats = KeywordStats()
+    for start in range(0, len(series), batch_size):
+        stats.add(series.iloc[start:start + batch_size].dropna().astype(str))
+    return stats.frequencies(n=n, stopwords=wordcloud_stopwords() if stopwords is None else stopwords)
+
+def plot_wordcloud(frequencies, save_path=None):
+    # frequencies: {word: count} or (word, count) pairs
+    plt, sns = plotting()
+    from wordcloud import WordCloud
+    wc = WordCloud(width=1200, height=600, background_color="white", max_words=WORDCLOUD_WORDS,
+                   collocations=False).generate_from_frequencies(dict(frequencies))
     fig, ax = plt.subplots(figsize=(12,6))
     ax.imshow(wc, interpolation="bilinear")
     ax.axis("off")
@@ -110,7 +165,11 @@ def plot_wordcloud_from_text(series, save_path=None):
         save_plot(fig, save_path)
     return fig
 
+def plot_wordcloud_from_text(series, save_path=None):
+    return plot_wordcloud(word_frequencies(series), save_path=save_path)
+
 def plot_top_keywords_bar(counter_pairs, title="Top keywords", save_path=None, top_n=20):
+    plt, sns = plotting()
     words, counts = zip(*counter_pairs[:top_n])
     fig, ax = plt.subplots(figsize=(10,5))
     sns.barplot(x=list(counts), y=list(words), ax=ax)
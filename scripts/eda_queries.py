@@ -0,0 +1,298 @@
+# scripts/eda_queries.py
+"""
+Aggregation backends for the EDA plots.
+
+Each plot only needs a small aggregate (counts per app, per rating, per
+sentiment, average rating per month), so instead of loading every review the
+aggregate is computed where the data lives:
+
+- ``parquet``: streams the processed Parquet dataset batch by batch (only
+  the needed columns, row groups pruned by filters) and combines per-batch
+  partial aggregates, so memory stays flat however large the dataset is.
+  Falls back to chunked CSV reads when no Parquet file exists.
+- ``postgres``: queries the review_daily_rollup tables (see create_tables.py).
+- FrameBackend: aggregates DataFrames already in memory (notebooks).
+
+All backends return the same small frames, which the plot_* helpers in
+eda_helpers.py accept directly.
+"""
+import os
+import sys
+import pandas as pd
+
+# the scripts import each other flat (from config import ...); this keeps that
+# working when the module is imported as scripts.<name> (notebooks, python -m)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import PROCESSED_DATA, EDA_BACKEND
+from storage import parquet_path, csv_path, build_filters, coerce_types, filter_frame
+from keywords import KeywordStats
+
+CLEANED_NAME = "cleaned_reviews"
+SENTIMENT_NAME = "sentiment_results"
+BATCH_ROWS = 256_000
+
+def _month_end(at):
+    # same labels as pd.Grouper(freq="M"): last day of the month, midnight
+    return at.dt.to_period("M").dt.to_timestamp() + pd.offsets.MonthEnd(0)
+
+def _count_by(df, keys):
+    return df.groupby(keys, observed=True).size().rename("review_count").reset_index()
+
+def _monthly_partial(df):
+    df = df.dropna(subset=["at", "score"])
+    score = df["score"].astype("float64")
+    grouped = score.groupby([_month_end(df["at"]).rename("at"), df["app"]], observed=True)
+    return pd.DataFrame({"score_sum": grouped.sum(), "review_count": grouped.count()}).reset_index()
+
+# view -> (columns read, per-batch partial aggregate, group keys)
+VIEWS = {
+    "reviews_per_app": (["app"], lambda df: _count_by(df, ["app"]), ["app"]),
+    "rating_distribution": (["app", "score"], lambda df: _count_by(df, ["app", "score"]), ["app", "score"]),
+    "avg_rating_over_time": (["app", "score", "at"], _monthly_partial, ["at", "app"]),
+    "sentiment_distribution": (["app", "sentiment"], lambda df: _count_by(df, ["app", "sentiment"]),
+                               ["app", "sentiment"]),
+}
+
+def combine_partials(partials, view):
+    """Merge per-batch partial aggregates of ``view`` into the final frame."""
+    keys = VIEWS[view][2]
+    partials = [p for p in partials if not p.empty]
+    if not partials:
+        out = pd.DataFrame(columns=keys + ["review_count"])
+    else:
+        out = pd.concat(partials, ignore_index=True)
+        for key in keys:
+            if isinstance(out[key].dtype, pd.CategoricalDtype):
+                out[key] = out[key].astype(str)
+        out = out.groupby(keys, sort=True).sum().reset_index()
+    if view == "avg_rating_over_time":
+        out["score"] = out.pop("score_sum") / out["review_count"] if len(out) else pd.Series(dtype=float)
+    if view == "reviews_per_app":
+        out = out.sort_values("review_count", ascending=False, kind="stable").reset_index(drop=True)
+    return out
+
+def aggregate(df, view):
+    """Compute ``view`` from an in-memory frame of reviews."""
+    return combine_partials([VIEWS[view][1](coerce_types(df[VIEWS[view][0]]))], view)
+
+# group columns for keyword_stats -> (processed dataset column, rollup SQL column)
+KEYWORD_GROUPS = {"app": "b.app_name", "sentiment": "r.sentiment_label"}
+
+def _group_keys(df, by):
+    columns = [df[c].astype(object) for c in by]
+    return zip(*columns) if len(by) > 1 else columns[0]
+
+
+class FrameBackend:
+    """Aggregates computed from DataFrames already in memory."""
+
+    def __init__(self, cleaned, sentiment=None):
+        self.cleaned = cleaned
+        self.sentiment = sentiment if sentiment is not None else cleaned
+
+    def view(self, name):
+        df = self.sentiment if name == "sentiment_distribution" else self.cleaned
+        return aggregate(df, name)
+
+    def texts(self, app=None, sentiment=None):
+        df = self.sentiment
+        mask = pd.Series(True, index=df.index)
+        if app is not None:
+            mask &= df["app"] == app
+        if sentiment is not None:
+            mask &= df["sentiment"] == sentiment
+        return df.loc[mask, "clean_content"]
+
+    def top_words(self, n=30, app=None, sentiment=None, stopwords=None):
+        return KeywordStats().add(self.texts(app, sentiment)).top_terms(n, stopwords).get(None, [])
+
+    def keyword_stats(self, by=("app", "sentiment"), ngrams=1):
+        df = self.sentiment
+        return KeywordStats(ngrams=ngrams).add(df["clean_content"], _group_keys(df, list(by)))
+
+    def apps(self):
+        return [str(a) for a in self.cleaned["app"].dropna().unique()]
+
+
+class ParquetBackend:
+    """
+    Aggregates streamed from the processed datasets; only one batch of the
+    needed columns is in memory at a time.
+    """
+
+    def __init__(self, directory=PROCESSED_DATA, batch_rows=BATCH_ROWS):
+        self.directory = directory
+        self.batch_rows = batch_rows
+
+    def batches(self, name, columns, apps=None, start=None, end=None, filters=None):
+        """Yield DataFrames of ``columns`` from dataset ``name``, batch by batch."""
+        ppath = parquet_path(self.directory, name)
+        if os.path.exists(ppath):
+            import pyarrow.dataset as ds
+            import pyarrow.parquet as pq
+            flt = build_filters(apps, start, end, filters)
+            dataset = ds.dataset(ppath, format="parquet")
+            for batch in dataset.to_batches(columns=columns, batch_size=self.batch_rows,
+                                            filter=pq.filters_to_expression(flt) if flt else None):
+                yield batch.to_pandas()
+            return
+        cpath = csv_path(self.directory, name)
+        if not os.path.exists(cpath):
+            raise FileNotFoundError(f"Missing file: {ppath} (or {cpath})")
+        if filters:
+            raise ValueError("Extra pyarrow filters need the Parquet dataset; re-save it first.")
+        usecols = list(dict.fromkeys(list(columns) + ["app", "at"]))
+        for chunk in pd.read_csv(cpath, usecols=lambda c: c in usecols, chunksize=self.batch_rows):
+            chunk = filter_frame(coerce_types(chunk), apps, start, end)
+            yield chunk[columns]
+
+    def view(self, name, apps=None, start=None, end=None):
+        columns, partial, _ = VIEWS[name]
+        dataset = SENTIMENT_NAME if name == "sentiment_distribution" else CLEANED_NAME
+        partials = [partial(df) for df in self.batches(dataset, columns, apps, start, end)]
+        return combine_partials(partials, name)
+
+    def _text_filters(self, app, sentiment):
+        filters = []
+        if app is not None:
+            filters.append(("app", "==", app))
+        if sentiment is not None:
+            filters.append(("sentiment", "==", sentiment))
+        return filters
+
+    def texts(self, app=None, sentiment=None):
+        parts = [df["clean_content"] for df in self.batches(
+            SENTIMENT_NAME, ["clean_content"], filters=self._text_filters(app, sentiment))]
+        return pd.concat(parts, ignore_index=True) if parts else pd.Series(dtype=object)
+
+    def top_words(self, n=30, app=None, sentiment=None, stopwords=None):
+        stats = KeywordStats()
+        for df in self.batches(SENTIMENT_NAME, ["clean_content"],
+                               filters=self._text_filters(app, sentiment)):
+            stats.add(df["clean_content"])
+        return stats.top_terms(n, stopwords).get(None, [])
+
+    def keyword_stats(self, by=("app", "sentiment"), ngrams=1):
+        """KeywordStats grouped by ``by`` columns, built in one streaming pass."""
+        by = list(by)
+        stats = KeywordStats(ngrams=ngrams)
+        for df in self.batches(SENTIMENT_NAME, ["clean_content"] + by):
+            stats.add(df["clean_content"], _group_keys(df, by))
+        return stats
+
+    def apps(self):
+        return self.view("reviews_per_app")["app"].tolist()
+
+
+ROLLUP_SQL = {
+    "reviews_per_app": """
+        SELECT b.app_name AS app, sum(r.review_count) AS review_count
+        FROM review_daily_rollup r JOIN banks b USING (bank_id)
+        GROUP BY b.app_name ORDER BY review_count DESC
+    """,
+    "rating_distribution": """
+        SELECT b.app_name AS app, r.rating AS score, sum(r.review_count) AS review_count
+        FROM review_daily_rollup r JOIN banks b USING (bank_id)
+        WHERE r.rating > 0
+        GROUP BY b.app_name, r.rating ORDER BY 1, 2
+    """,
+    "avg_rating_over_time": """
+        SELECT (r.month + INTERVAL '1 month' - INTERVAL '1 day')::timestamp AS at, b.app_name AS app,
+               sum(r.review_count) AS review_count,
+               sum(r.rating * r.review_count)::float / sum(r.review_count) AS score
+        FROM review_monthly_rollup r JOIN banks b USING (bank_id)
+        WHERE r.rating > 0
+        GROUP BY r.month, b.app_name ORDER BY 1, 2
+    """,
+    "sentiment_distribution": """
+        SELECT b.app_name AS app, r.sentiment_label AS sentiment, sum(r.review_count) AS review_count
+        FROM review_daily_rollup r JOIN banks b USING (bank_id)
+        WHERE r.sentiment_label <> 'unscored'
+        GROUP BY b.app_name, r.sentiment_label ORDER BY 1, 2
+    """,
+}
+
+TOP_WORDS_SQL = """
+    SELECT w.word, count(*) AS n
+    FROM reviews r
+    JOIN banks b USING (bank_id)
+    CROSS JOIN LATERAL regexp_split_to_table(r.review_text, '\\s+') AS w(word)
+    WHERE length(w.word) > 2 AND NOT (w.word = ANY(%(stopwords)s))
+      AND (%(app)s IS NULL OR b.app_name = %(app)s)
+      AND (%(sentiment)s IS NULL OR r.sentiment_label = %(sentiment)s)
+    GROUP BY w.word
+    ORDER BY n DESC, w.word
+    LIMIT %(n)s
+"""
+
+
+class PostgresBackend:
+    """Aggregates read from the rollup tables maintained by insert_data.py."""
+
+    def __init__(self, conn=None):
+        if conn is None:
+            import psycopg2
+            from db_config import get_db_params
+            conn = psycopg2.connect(**get_db_params())
+        self.conn = conn
+
+    def _query(self, query, params=None):
+        with self.conn.cursor() as cur:
+            cur.execute(query, params)
+            columns = [d[0] for d in cur.description]
+            rows = cur.fetchall()
+        self.conn.rollback()  # read-only; don't hold a transaction open
+        return pd.DataFrame(rows, columns=columns)
+
+    def view(self, name):
+        df = self._query(ROLLUP_SQL[name])
+        df["review_count"] = df["review_count"].astype("int64")
+        if name == "avg_rating_over_time":
+            df["at"] = pd.to_datetime(df["at"])
+        return df
+
+    def texts(self, app=None, sentiment=None):
+        return self._query(
+            """
+            SELECT r.review_text AS clean_content FROM reviews r JOIN banks b USING (bank_id)
+            WHERE (%(app)s IS NULL OR b.app_name = %(app)s)
+              AND (%(sentiment)s IS NULL OR r.sentiment_label = %(sentiment)s)
+            """,
+            {"app": app, "sentiment": sentiment},
+        )["clean_content"]
+
+    def top_words(self, n=30, app=None, sentiment=None, stopwords=None):
+        df = self._query(TOP_WORDS_SQL, {"app": app, "sentiment": sentiment, "n": n,
+                                         "stopwords": sorted(stopwords or [])})
+        return [(w, int(c)) for w, c in zip(df["word"], df["n"])]
+
+    def keyword_stats(self, by=("app", "sentiment"), ngrams=1, itersize=50_000):
+        """KeywordStats grouped by ``by``, streamed through a server-side cursor."""
+        columns = ", ".join(KEYWORD_GROUPS[c] for c in by)
+        stats = KeywordStats(ngrams=ngrams)
+        with self.conn.cursor(name="keyword_stats") as cur:
+            cur.itersize = itersize
+            cur.execute(f"SELECT r.review_text, {columns} FROM reviews r JOIN banks b USING (bank_id) "
+                        "ORDER BY r.review_id")
+            while True:
+                rows = cur.fetchmany(itersize)
+                if not rows:
+                    break
+                keys = [row[1:] if len(by) > 1 else row[1] for row in rows]
+                stats.add([row[0] for row in rows], keys)
+        self.conn.rollback()
+        return stats
+
+    def apps(self):
+        return self.view("reviews_per_app")["app"].tolist()
+
+
+BACKENDS = {"parquet": ParquetBackend, "postgres": PostgresBackend}
+
+def get_backend(name=None, **kwargs):
+    """Backend by name (default: CX_EDA_BACKEND, else parquet)."""
+    name = name or EDA_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown EDA backend {name!r}; choose from {sorted(BACKENDS)}")
+    return BACKENDS[name](**kwargs)
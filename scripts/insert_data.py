@@ -1,16 +1,63 @@
 # scripts/insert_data.py
+import io
 import os
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
 import psycopg2
+from psycopg2 import sql
 from psycopg2.extras import execute_values
-from datetime import datetime
+from psycopg2.pool import ThreadedConnectionPool
 from db_config import get_db_params
+from config import PROCESSED_DATA, load_app_registry
+from storage import dataset_exists, dataset_columns, load_dataset, filter_frame, parquet_path
+from create_tables import is_partitioned, ensure_partitions, has_rollups, refresh_rollups
+from metrics import stage
 
-# Adjust filename if needed
-ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-CLEANED_PATH = os.path.join(ROOT, "data", "processed", "cleaned_reviews.csv")
+# Processed dataset to load (cleaned_reviews.parquet, or .csv as fallback)
+CLEANED_NAME = "cleaned_reviews"
 
 BATCH_SIZE = 1000  # adjust to memory
+COPY_CHUNK_ROWS = 100_000  # rows serialized per COPY buffer
+LOAD_CHUNK_ROWS = 200_000  # rows per committed chunk in the pooled loader
+
+REVIEW_COLUMNS = ["bank_id", "review_text", "rating", "review_date",
+                  "sentiment_label", "sentiment_score", "source", "review_key", "cluster_key"]
+
+STAGING_TABLE = "reviews_staging"
+
+# Unlogged: staging rows are transient, so skip WAL for the COPY
+STAGING_DDL = """
+CREATE UNLOGGED TABLE IF NOT EXISTS {staging} (
+    bank_id INTEGER,
+    review_text TEXT,
+    rating SMALLINT,
+    review_date TIMESTAMP,
+    sentiment_label TEXT,
+    sentiment_score FLOAT,
+    source TEXT,
+    review_key BIGINT,
+    cluster_key BIGINT
+);
+ALTER TABLE {staging} ADD COLUMN IF NOT EXISTS review_key BIGINT;
+ALTER TABLE {staging} ADD COLUMN IF NOT EXISTS cluster_key BIGINT;
+"""
+
+# rows inserted per (bank, day) actually touched, for the rollup refresh
+MERGE_SQL = """
+WITH inserted AS (
+    INSERT INTO reviews (bank_id, review_text, rating, review_date, sentiment_label, sentiment_score, source,
+                         review_key, cluster_key)
+    SELECT bank_id, review_text, rating, review_date, sentiment_label, sentiment_score, source, review_key,
+           cluster_key
+    FROM {staging}
+    WHERE review_text IS NOT NULL
+    ON CONFLICT (bank_id, review_hash, review_date) DO NOTHING
+    RETURNING bank_id, review_date::date AS day
+)
+SELECT bank_id, day, count(*) FROM inserted GROUP BY 1, 2 ORDER BY 1, 2
+"""
 
 def connect():
     params = get_db_params()
@@ -42,33 +89,50 @@ def upsert_banks(conn, bank_names_map):
     conn.commit()
     return result
 
-def parse_date(x):
-    try:
-        return pd.to_datetime(x)
-    except Exception:
-        return None
+def _first_column(df, names):
+    """First of ``names`` present in df, as a Series (all-NA if none are)."""
+    for name in names:
+        if name in df.columns:
+            return df[name]
+    return pd.Series(pd.NA, index=df.index, dtype=object)
+
+def _first_non_empty(df, names):
+    # like `a or b or c` per row: empty strings and NaN fall through
+    out = pd.Series(pd.NA, index=df.index, dtype=object)
+    for name in reversed(names):
+        if name in df.columns:
+            col = df[name].astype(object)
+            out = col.where(col.notna() & (col.astype(str) != ""), out)
+    return out
+
+def prepare_frame(df, bank_id):
+    """
+    Vectorized prepare_rows: returns a DataFrame with REVIEW_COLUMNS, dates
+    parsed once for the whole column and NULLs as NA.
+    """
+    frame = pd.DataFrame(index=df.index)
+    frame["bank_id"] = bank_id
+    frame["review_text"] = _first_non_empty(df, ["clean_content", "content"]).fillna("")
+    frame["rating"] = pd.to_numeric(_first_column(df, ["score"]), errors="coerce").astype("Int16")
+    dates = _first_non_empty(df, ["at", "date", "review_date"])
+    frame["review_date"] = pd.to_datetime(dates, errors="coerce")
+    frame["sentiment_label"] = _first_non_empty(df, ["sentiment", "sentiment_label"])
+    frame["sentiment_score"] = pd.to_numeric(_first_column(df, ["compound", "sentiment_score"]), errors="coerce")
+    frame["source"] = df["source"] if "source" in df.columns else "Google Play"
+    # stable 64-bit key from preprocessing (absent in datasets written before it)
+    frame["review_key"] = df["review_id"].astype("Int64") if "review_id" in df.columns else pd.NA
+    frame["review_key"] = frame["review_key"].astype("Int64")
+    # near-duplicate cluster (dedup.py): the review_key of the cluster's oldest review
+    frame["cluster_key"] = df["cluster_id"].astype("Int64") if "cluster_id" in df.columns else pd.NA
+    frame["cluster_key"] = frame["cluster_key"].astype("Int64")
+    return frame.reset_index(drop=True)
 
 def prepare_rows(df, bank_id):
-    # returns list of tuples matching (bank_id, review_text, rating, review_date, sentiment_label, sentiment_score, source)
-    rows = []
-    for _, r in df.iterrows():
-        text = r.get("clean_content") or r.get("content") or ""
-        rating = int(r.get("score")) if pd.notna(r.get("score")) else None
-        date_raw = r.get("at") or r.get("date") or r.get("review_date")
-        review_date = parse_date(date_raw)
-        sentiment_label = r.get("sentiment") or r.get("sentiment_label") or None
-        sentiment_score = r.get("compound") if "compound" in r else r.get("sentiment_score") if "sentiment_score" in r else None
-        source = r.get("source") if "source" in r else "Google Play"
-        rows.append((
-            bank_id,
-            text,
-            rating,
-            review_date.to_pydatetime() if pd.notna(review_date) else None,
-            sentiment_label,
-            float(sentiment_score) if pd.notna(sentiment_score) else None,
-            source
-        ))
-    return rows
+    # returns list of tuples matching (bank_id, review_text, rating, review_date, sentiment_label, sentiment_score, source, review_key, cluster_key)
+    frame = prepare_frame(df, bank_id).astype(object)
+    frame = frame.where(frame.notna(), None)
+    frame["review_date"] = [d.to_pydatetime() if d is not None else None for d in frame["review_date"]]
+    return list(frame.itertuples(index=False, name=None))
 
 def batch_insert_reviews(conn, rows):
     """
@@ -77,41 +141,271 @@ def batch_insert_reviews(conn, rows):
     if not rows:
         return 0
     with conn.cursor() as cur:
-        sql = """
-            INSERT INTO reviews (bank_id, review_text, rating, review_date, sentiment_label, sentiment_score, source)
+        insert_sql = """
+            INSERT INTO reviews (bank_id, review_text, rating, review_date, sentiment_label, sentiment_score, source,
+                                 review_key, cluster_key)
             VALUES %s
-            ON CONFLICT (bank_id, md5(review_text), review_date) DO NOTHING
+            ON CONFLICT (bank_id, review_hash, review_date) DO NOTHING
         """
-        execute_values(cur, sql, rows, page_size=1000)
+        execute_values(cur, insert_sql, rows, page_size=1000)
     conn.commit()
     return len(rows)
 
-def main():
-    if not os.path.exists(CLEANED_PATH):
-        print("Cleaned CSV not found at:", CLEANED_PATH)
+def copy_frame(cur, frame, table, chunk_rows=COPY_CHUNK_ROWS):
+    """Stream a prepared frame into ``table`` with COPY FROM STDIN (CSV)."""
+    # unquoted empty fields are NULL in COPY csv, but an empty review_text is
+    # an empty review (pandas writes "" unquoted), not a missing one
+    copy_sql = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL (review_text))").format(
+        sql.Identifier(table), sql.SQL(", ").join(map(sql.Identifier, REVIEW_COLUMNS))
+    )
+    for start in range(0, len(frame), chunk_rows):
+        buf = io.StringIO()
+        frame.iloc[start:start + chunk_rows].to_csv(
+            buf, header=False, index=False, date_format="%Y-%m-%d %H:%M:%S.%f"
+        )
+        buf.seek(0)
+        cur.copy_expert(copy_sql.as_string(cur), buf)
+
+def stage_and_merge(cur, frame, staging=STAGING_TABLE):
+    """
+    COPY ``frame`` into ``staging`` and merge it into reviews; no commit.
+    Returns (rows inserted, rows left out for having no review_text).
+    """
+    staging_id = sql.Identifier(staging)
+    cur.execute(sql.SQL(STAGING_DDL).format(staging=staging_id))
+    cur.execute(sql.SQL("TRUNCATE {}").format(staging_id))
+    copy_frame(cur, frame, staging)
+    cur.execute(sql.SQL("SELECT count(*) FROM {} WHERE review_text IS NULL").format(staging_id))
+    no_text = cur.fetchone()[0]
+    cur.execute(sql.SQL(MERGE_SQL).format(staging=staging_id))
+    touched = cur.fetchall()
+    inserted = sum(n for _, _, n in touched)
+    if inserted and has_rollups(cur):
+        # recompute only the rollup days that got new reviews, per bank
+        days = {}
+        for bank_id, day, _ in touched:
+            if day is not None:
+                days.setdefault(bank_id, []).append(day)
+        for bank_id in sorted(days):
+            refresh_rollups(cur, bank_id, days=days[bank_id])
+    cur.execute(sql.SQL("TRUNCATE {}").format(staging_id))
+    return inserted, no_text
+
+def prepare_partitions(conn, frame):
+    """
+    Create the monthly partitions ``frame``'s dates need (so rows do not land
+    in the default one) in a short transaction of its own: the merges that
+    follow never hold partition locks while other loaders run. Commits.
+    """
+    with conn.cursor() as cur:
+        dates = frame["review_date"].dropna()
+        if not dates.empty and is_partitioned(cur):
+            ensure_partitions(cur, dates.min().to_pydatetime(), dates.max().to_pydatetime())
+    conn.commit()
+
+def bulk_load_reviews(conn, frame, staging=STAGING_TABLE):
+    """
+    COPY a prepared frame into an unlogged staging table, then merge it into
+    ``reviews`` with one INSERT ... SELECT ... ON CONFLICT DO NOTHING.
+    Runs in a single transaction (after prepare_partitions). Returns
+    (inserted, skipped_duplicates, no_text).
+    """
+    if frame.empty:
+        return 0, 0, 0
+    prepare_partitions(conn, frame)
+    with conn.cursor() as cur:
+        inserted, no_text = stage_and_merge(cur, frame, staging)
+    conn.commit()
+    return inserted, len(frame) - inserted - no_text, no_text
+
+# review_keys of a bank (COPied into KEYS_TABLE) that reviews does not have yet
+MISSING_KEYS_SQL = """
+SELECT k.review_key FROM {keys} k
+WHERE NOT EXISTS (SELECT 1 FROM reviews r WHERE r.review_key = k.review_key AND r.bank_id = %s)
+"""
+KEYS_TABLE = "load_keys"
+
+def get_high_water(conn, bank_id):
+    """Latest review_date already loaded for a bank (None if never loaded)."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT high_water_date FROM load_state WHERE bank_id = %s", (bank_id,))
+        row = cur.fetchone()
+    return pd.Timestamp(row[0]) if row and row[0] is not None else None
+
+def set_high_water(cur, bank_id, high_water, rows):
+    cur.execute(
+        """
+        INSERT INTO load_state (bank_id, high_water_date, rows_loaded, updated_at)
+        VALUES (%s, %s, %s, NOW())
+        ON CONFLICT (bank_id) DO UPDATE SET
+            high_water_date = GREATEST(load_state.high_water_date, EXCLUDED.high_water_date),
+            rows_loaded = load_state.rows_loaded + EXCLUDED.rows_loaded,
+            updated_at = NOW()
+        """,
+        (bank_id, high_water.to_pydatetime() if pd.notna(high_water) else None, rows)
+    )
+
+def load_missed_rows(conn, app_tag, bank_id, high_water):
+    """
+    A bank's rows dated before its high-water mark, or undated, whose
+    review_id is not in reviews yet (e.g. a backfill scraped after newer
+    reviews were loaded). Only review_id and at are read for the anti-join;
+    full rows are read for the missing ids alone. Commits.
+    """
+    if "review_id" not in dataset_columns(PROCESSED_DATA, CLEANED_NAME):
+        return None  # no stable key to compare: datasets written before review_id
+    keys = load_dataset(PROCESSED_DATA, CLEANED_NAME, columns=["review_id", "at"], apps=[app_tag])
+    keys = keys.loc[~(keys["at"] >= high_water), "review_id"].dropna().astype("int64")
+    if keys.empty:
+        return None
+    keys_id = sql.Identifier(KEYS_TABLE)
+    with conn.cursor() as cur:
+        cur.execute(sql.SQL("CREATE TEMP TABLE IF NOT EXISTS {} (review_key BIGINT) ON COMMIT DROP").format(keys_id))
+        buf = io.StringIO()
+        keys.to_csv(buf, header=False, index=False)
+        buf.seek(0)
+        cur.copy_expert(sql.SQL("COPY {} (review_key) FROM STDIN WITH (FORMAT csv)").format(keys_id)
+                        .as_string(cur), buf)
+        cur.execute(sql.SQL(MISSING_KEYS_SQL).format(keys=keys_id), (bank_id,))
+        missing = [row[0] for row in cur.fetchall()]
+    conn.commit()
+    if not missing:
+        return None
+    if os.path.exists(parquet_path(PROCESSED_DATA, CLEANED_NAME)):
+        return load_dataset(PROCESSED_DATA, CLEANED_NAME, apps=[app_tag], filters=[("review_id", "in", missing)])
+    df = filter_frame(load_dataset(PROCESSED_DATA, CLEANED_NAME), apps=[app_tag])
+    return df[df["review_id"].isin(missing)]
+
+def reset_load_state(conn, bank_ids):
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM load_state WHERE bank_id = ANY(%s)", (list(bank_ids),))
+    conn.commit()
+
+def load_bank_partition(pool, app_tag, bank_id, chunk_rows=LOAD_CHUNK_ROWS):
+    """
+    Load one bank's rows newer than its high-water mark on a pooled connection,
+    plus older or undated rows whose review_id is not loaded yet (load_missed_rows).
+
+    Only this bank's partition is read from the processed dataset (row groups
+    for other apps and older dates are skipped). Rows are sent in date order,
+    chunk by chunk; each chunk's merge and its high-water update commit
+    together, so an interrupted run resumes after the last committed chunk.
+    """
+    start = time.perf_counter()
+    conn = pool.getconn()
+    try:
+        # runs on a worker thread, so the stage is given its full name
+        with stage(f"insert_data.load.{app_tag}") as st:
+            with stage("read") as read:
+                high_water = get_high_water(conn, bank_id)
+                df = load_dataset(PROCESSED_DATA, CLEANED_NAME, apps=[app_tag], start=high_water)
+                missed = load_missed_rows(conn, app_tag, bank_id, high_water) if high_water is not None else None
+                backfill = 0 if missed is None else len(missed)
+                if backfill:
+                    df = pd.concat([missed, df], ignore_index=True)
+                del missed
+                frame = prepare_frame(df, bank_id)
+                del df
+                frame = frame.sort_values("review_date", kind="stable", na_position="first").reset_index(drop=True)
+                read.rows = len(frame)
+
+            prepare_partitions(conn, frame)
+            staging = f"{STAGING_TABLE}_{bank_id}"
+            inserted = no_text = 0
+            for i in range(0, len(frame), chunk_rows):
+                chunk = frame.iloc[i:i + chunk_rows]
+                with stage("copy_merge", rows=len(chunk)):
+                    with conn.cursor() as cur:
+                        chunk_inserted, chunk_no_text = stage_and_merge(cur, chunk, staging)
+                        set_high_water(cur, bank_id, chunk["review_date"].max(), chunk_inserted)
+                    conn.commit()
+                inserted += chunk_inserted
+                no_text += chunk_no_text
+            st.rows = len(frame)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
+    return {
+        "app": app_tag, "bank_id": bank_id, "since": high_water, "backfill": backfill, "sent": len(frame),
+        "inserted": inserted, "skipped": len(frame) - inserted - no_text, "no_text": no_text,
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+
+def load_all_banks(bank_id_map, workers=4, full=False, chunk_rows=LOAD_CHUNK_ROWS):
+    """Load every bank's partition in parallel, one pooled connection per bank."""
+    pool = ThreadedConnectionPool(1, max(1, workers), **get_db_params())
+    try:
+        if full:
+            conn = pool.getconn()
+            try:
+                reset_load_state(conn, bank_id_map.values())
+            finally:
+                pool.putconn(conn)
+        results = []
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(load_bank_partition, pool, app_tag, bank_id, chunk_rows): app_tag
+                for app_tag, bank_id in bank_id_map.items()
+            }
+            for fut in as_completed(futures):
+                app_tag = futures[fut]
+                try:
+                    res = fut.result()
+                except Exception as e:
+                    res = {"app": app_tag, "bank_id": bank_id_map[app_tag], "error": repr(e)}
+                    print(f"{app_tag}: load failed: {e}")
+                else:
+                    since = res["since"] if res["since"] is not None else "start"
+                    if res["backfill"]:
+                        since = f"{since}, plus {res['backfill']} older or undated"
+                    print(f"{app_tag}: {res['inserted']} rows inserted, {res['skipped']} skipped "
+                          f"as duplicates, {res['no_text']} without text (since {since}, {res['seconds']}s)")
+                results.append(res)
+    finally:
+        pool.closeall()
+    return results
+
+def run_load(args):
+    if not dataset_exists(PROCESSED_DATA, CLEANED_NAME):
+        print("Cleaned dataset not found in:", PROCESSED_DATA)
+        return
+
+    # Mapping app_tag -> full bank name, from apps.csv
+    bank_names_map = {row["app_name"]: row.get("bank_name") for row in load_app_registry()}
+
+    if args.method == "pooled":
+        # each worker reads only its own bank's partition
+        conn = connect()
+        try:
+            bank_id_map = upsert_banks(conn, bank_names_map)
+        finally:
+            conn.close()
+        print("Bank id map:", bank_id_map)
+        results = load_all_banks(bank_id_map, workers=args.workers, full=args.full)
+        ok = [r for r in results if "error" not in r]
+        print(f"Total rows inserted: {sum(r['inserted'] for r in ok)}, "
+              f"skipped as duplicates: {sum(r['skipped'] for r in ok)}, "
+              f"without text: {sum(r['no_text'] for r in ok)}, "
+              f"failed banks: {len(results) - len(ok)}")
         return
 
-    df_all = pd.read_csv(CLEANED_PATH)
+    df_all = load_dataset(PROCESSED_DATA, CLEANED_NAME)
     print("Loaded cleaned reviews rows:", len(df_all))
 
     # Ensure an 'app' column exists
     if 'app' not in df_all.columns:
         raise ValueError("cleaned CSV must include 'app' column (app tag: CBE/BOA/Amole).")
 
-    # Provide mapping app_tag -> full bank name (if you have full names)
-    # Update values if needed
-    bank_names_map = {
-        "CBE": "Commercial Bank of Ethiopia",
-        "BOA": "Bank of Abyssinia",
-        "Amole": "Amole"
-    }
-
     conn = connect()
     try:
         bank_id_map = upsert_banks(conn, bank_names_map)
         print("Bank id map:", bank_id_map)
 
         total_inserted = 0
+        total_skipped = 0
+        total_no_text = 0
         # Process per app to reduce memory usage
         for app_tag, bank_id in bank_id_map.items():
             df_app = df_all[df_all['app'] == app_tag]
@@ -119,21 +413,56 @@ def main():
                 print(f"No rows for {app_tag}")
                 continue
 
+            if args.method == "copy":
+                with stage(f"copy.{app_tag}", rows=len(df_app)):
+                    inserted, skipped, no_text = bulk_load_reviews(conn, prepare_frame(df_app, bank_id))
+                total_inserted += inserted
+                total_skipped += skipped
+                total_no_text += no_text
+                print(f"{app_tag}: {inserted} rows inserted, {skipped} skipped as duplicates, "
+                      f"{no_text} without text")
+                continue
+
             # Optionally shuffle or sort by date
             rows = prepare_rows(df_app, bank_id)
 
             # Insert in batches
-            for i in range(0, len(rows), BATCH_SIZE):
-                batch = rows[i:i+BATCH_SIZE]
-                inserted = batch_insert_reviews(conn, batch)
-                total_inserted += inserted
-                print(f"Inserted batch {i//BATCH_SIZE + 1}: {inserted} rows for {app_tag}")
+            with stage(f"execute_values.{app_tag}", rows=len(rows)):
+                for i in range(0, len(rows), BATCH_SIZE):
+                    batch = rows[i:i+BATCH_SIZE]
+                    inserted = batch_insert_reviews(conn, batch)
+                    total_inserted += inserted
+                    print(f"Inserted batch {i//BATCH_SIZE + 1}: {inserted} rows for {app_tag}")
 
-        print("Total rows processed (attempted inserts):", total_inserted)
+        if args.method == "values":
+            with conn.cursor() as cur:
+                if has_rollups(cur):
+                    for bank_id in bank_id_map.values():
+                        refresh_rollups(cur, bank_id)
+            conn.commit()
+
+        if args.method == "copy":
+            print(f"Total rows inserted: {total_inserted}, skipped as duplicates: {total_skipped}, "
+                  f"without text: {total_no_text}")
+        else:
+            print("Total rows processed (attempted inserts):", total_inserted)
     except Exception as e:
         print("Error during insertion:", e)
     finally:
         conn.close()
 
+def main():
+    parser = argparse.ArgumentParser(description="Load cleaned reviews into PostgreSQL.")
+    parser.add_argument("--method", choices=["pooled", "copy", "values"], default="pooled",
+                        help="parallel resumable COPY per bank (default), serial COPY + staging "
+                             "merge, or batched INSERT ... VALUES")
+    parser.add_argument("--workers", type=int, default=4, help="pooled connections (pooled method)")
+    parser.add_argument("--full", action="store_true",
+                        help="ignore the load_state high-water marks and resend every row")
+    args = parser.parse_args()
+
+    with stage("insert_data"):
+        run_load(args)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,315 @@
+# scripts/insights_api.py
+"""
+Local read-only HTTP API over the Task 4 insights and EDA aggregates.
+
+    GET /version                  data version the responses belong to
+    GET /banks                    apps and their review counts
+    GET /insights[?app=CBE]       top drivers (positive) and pain points (negative)
+    GET /sentiment[?app=CBE]      sentiment distribution
+    GET /ratings[?app=CBE]        rating distribution
+    GET /ratings/trend[?app=CBE]  average rating per month
+    GET /spikes                   keyword spikes of the latest window (trends.py)
+    GET /plots                    rendered plots
+    GET /plots/<set>/<name>.png   one plot (set: eda or task4)
+
+Aggregates come from the eda_queries backend (CX_EDA_BACKEND: the Parquet
+files or the PostgreSQL rollups). Each response is rendered once and kept in
+an in-process LRU cache for the current data version: a fingerprint of the
+processed files, plots and trends (size and mtime), plus the rollup totals
+with the postgres backend. The fingerprint is re-read at most every
+VERSION_TTL seconds and the cache is emptied when it changes. Responses carry
+an ETag (hash of the body); a request whose If-None-Match matches gets a 304.
+"""
+import os
+import sys
+import glob
+import json
+import time
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl
+
+# the scripts import each other flat (from config import ...); this keeps that
+# working when the module is imported as scripts.<name> (notebooks, python -m)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import PROCESSED_DATA, EDA_PLOTS, TASK4_PLOTS
+from eda_helpers import TASK4_STOPWORDS
+from eda_queries import get_backend, PostgresBackend, CLEANED_NAME, SENTIMENT_NAME
+
+HOST = "127.0.0.1"
+PORT = 8050
+CACHE_ENTRIES = 256
+VERSION_TTL = 1.0  # seconds between data fingerprint checks
+TOP_TERMS = 10
+
+PLOT_DIRS = {"eda": EDA_PLOTS, "task4": TASK4_PLOTS}
+DATA_FILES = [f"{name}.{ext}" for name in (CLEANED_NAME, SENTIMENT_NAME, "topic_results")
+              for ext in ("parquet", "csv")] + ["task4_insights_summary.csv", "task4_keyword_trends.csv"]
+
+ROLLUP_VERSION_SQL = "SELECT count(*), sum(review_count), sum(score_sum) FROM review_daily_rollup"
+
+
+class NotFound(Exception):
+    pass
+
+
+class LRUCache:
+    """Thread-safe LRU of rendered responses for one data version."""
+
+    def __init__(self, maxsize=CACHE_ENTRIES):
+        self.maxsize = maxsize
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def reset(self, version):
+        """Start ``version``: drop every entry unless it is already the current one."""
+        with self._lock:
+            if version != self.version:
+                self._entries.clear()
+                self.version = version
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key) if version == self.version else None
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return entry
+
+    def put(self, key, version, entry):
+        with self._lock:
+            if version != self.version or self.maxsize <= 0:
+                return
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _records(df):
+    return json.loads(df.to_json(orient="records", date_format="iso"))
+
+def _for_app(df, app):
+    if app is None:
+        return df
+    if app not in set(df["app"].astype(str)):
+        raise NotFound(f"unknown app {app!r}")
+    return df[df["app"].astype(str) == app]
+
+
+class InsightsService:
+    """Renders API responses from a backend, through the version-keyed cache."""
+
+    def __init__(self, backend=None, cache_entries=CACHE_ENTRIES, version_ttl=VERSION_TTL):
+        self.backend = backend or get_backend()
+        self.cache = LRUCache(cache_entries)
+        self.version_ttl = version_ttl
+        self._version = None
+        self._checked = 0.0
+        self._version_lock = threading.Lock()
+        # backends (one psycopg2 connection) are not shared between threads:
+        # misses render one at a time, which also stops duplicate renders
+        self._render_lock = threading.Lock()
+        # path -> fn(query, version); renders must not call version() (lock order)
+        self.routes = {
+            "/version": lambda q, v: {"version": v},
+            "/banks": lambda q, v: _records(self.backend.view("reviews_per_app")),
+            "/insights": self.insights,
+            "/sentiment": lambda q, v: _records(_for_app(self.backend.view("sentiment_distribution"), q.get("app"))),
+            "/ratings": lambda q, v: _records(_for_app(self.backend.view("rating_distribution"), q.get("app"))),
+            "/ratings/trend": lambda q, v: _records(_for_app(self.backend.view("avg_rating_over_time"),
+                                                             q.get("app"))),
+            "/spikes": lambda q, v: self.spikes(),
+            "/plots": lambda q, v: self.plots(),
+        }
+
+    # -----------------------------
+    # Data version
+    # -----------------------------
+    def _fingerprint(self):
+        h = hashlib.blake2b(digest_size=8)
+        paths = [os.path.join(PROCESSED_DATA, f) for f in DATA_FILES]
+        paths += sorted(p for d in PLOT_DIRS.values() for p in glob.glob(os.path.join(d, "*.png")))
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            h.update(f"{path}:{st.st_size}:{st.st_mtime_ns}\n".encode())
+        if isinstance(self.backend, PostgresBackend):
+            # the connection is busy while a miss renders: keep the old version
+            # rather than stall every request behind it
+            if not self._render_lock.acquire(blocking=False):
+                return None
+            try:
+                with self.backend.conn.cursor() as cur:
+                    cur.execute(ROLLUP_VERSION_SQL)
+                    h.update(repr(cur.fetchone()).encode())
+                self.backend.conn.rollback()
+            finally:
+                self._render_lock.release()
+        return h.hexdigest()
+
+    def version(self):
+        """Current data version, re-checked at most every ``version_ttl`` seconds."""
+        with self._version_lock:
+            now = time.monotonic()
+            if self._version is None or now - self._checked >= self.version_ttl:
+                version = self._fingerprint()
+                if version is not None or self._version is None:
+                    self._version = version or "unknown"
+                    self._checked = now
+                    self.cache.reset(self._version)
+            return self._version
+
+    # -----------------------------
+    # Responses
+    # -----------------------------
+    def _keyword_stats(self, version):
+        # one tokenization pass serves /insights for every app; cached like a response
+        key = ("keyword_stats",)
+        stats = self.cache.get(key, version)
+        if stats is None:
+            stats = self.backend.keyword_stats(by=("app", "sentiment"))
+            self.cache.put(key, version, stats)
+        return stats
+
+    def insights(self, query, version):
+        app = query.get("app")
+        apps = self.backend.apps()
+        if app is not None and app not in apps:
+            raise NotFound(f"unknown app {app!r}")
+        top = self._keyword_stats(version).top_terms(n=TOP_TERMS * 2, stopwords=set(TASK4_STOPWORDS))
+        terms = lambda key: [{"term": w, "count": int(c)} for w, c in top.get(key, [])[:TOP_TERMS]]
+        return {bank: {"drivers": terms((bank, "positive")), "pain_points": terms((bank, "negative"))}
+                for bank in ([app] if app else apps)}
+
+    def spikes(self):
+        import pandas as pd
+        from trends import TRENDS_PATH, latest_spikes
+        if not os.path.exists(TRENDS_PATH):
+            raise NotFound("no keyword trends yet; run task4_run.py or trends.py")
+        trends = pd.read_csv(TRENDS_PATH, parse_dates=["window_start"])
+        return _records(latest_spikes(trends))
+
+    def plots(self):
+        return {name: sorted(os.path.basename(p) for p in glob.glob(os.path.join(d, "*.png")))
+                for name, d in PLOT_DIRS.items()}
+
+    def plot(self, path):
+        _, _, plot_set, name = path.split("/", 3)
+        directory = PLOT_DIRS.get(plot_set)
+        if directory is None or "/" in name or not name.endswith(".png"):
+            raise NotFound(path)
+        try:
+            with open(os.path.join(directory, name), "rb") as f:
+                return f.read()
+        except OSError:
+            raise NotFound(path)
+
+    def render(self, path, query, version):
+        """(content type, body) of one request; raises NotFound."""
+        if path.startswith("/plots/") and path.count("/") == 3:
+            return "image/png", self.plot(path)
+        route = self.routes.get(path.rstrip("/") or "/")
+        if route is None:
+            raise NotFound(path)
+        return "application/json", json.dumps(route(query, version)).encode()
+
+    def respond(self, path, query):
+        """Cached (content type, body, etag, cache status) of a request."""
+        version = self.version()
+        key = (path, tuple(sorted(query.items())))
+        entry = self.cache.get(key, version)
+        status = "hit"
+        if entry is None:
+            with self._render_lock:
+                entry = self.cache.get(key, version)  # rendered while we waited
+                if entry is None:
+                    status = "miss"
+                    content_type, body = self.render(path, query, version)
+                    etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+                    entry = (content_type, body, etag)
+                    self.cache.put(key, version, entry)
+        return entry + (status,)
+
+
+class InsightsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive for pollers
+    disable_nagle_algorithm = True  # headers and body are separate writes
+    quiet = False
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = dict(parse_qsl(url.query))
+        try:
+            content_type, body, etag, status = self.server.service.respond(url.path, query)
+        except NotFound as e:
+            return self._send(404, "application/json", json.dumps({"error": str(e)}).encode())
+        except Exception as e:
+            return self._send(500, "application/json", json.dumps({"error": repr(e)}).encode())
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "X-Cache": status}
+        if etag in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")] or \
+                self.headers.get("If-None-Match", "").strip() == "*":
+            return self._send(304, None, b"", headers)
+        self._send(200, content_type, body, headers)
+
+    def _send(self, code, content_type, body, headers=None):
+        self.send_response(code)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+def make_server(host=HOST, port=PORT, backend=None, cache_entries=CACHE_ENTRIES, version_ttl=VERSION_TTL,
+                quiet=False):
+    handler = type("Handler", (InsightsHandler,), {"quiet": quiet})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.service = InsightsService(get_backend(backend), cache_entries, version_ttl)
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve insights, aggregates and plots over HTTP.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--backend", choices=["parquet", "postgres"], default=None,
+                        help="where aggregates are computed (default: CX_EDA_BACKEND or parquet)")
+    parser.add_argument("--cache-size", type=int, default=CACHE_ENTRIES, help="cached responses (0: no cache)")
+    parser.add_argument("--version-ttl", type=float, default=VERSION_TTL,
+                        help="seconds between data version checks")
+    parser.add_argument("--quiet", action="store_true", help="no per-request log lines")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.backend, args.cache_size, args.version_ttl, args.quiet)
+    print(f"Serving insights on http://{args.host}:{server.server_address[1]} "
+          f"(data version {server.service.version()})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+# scripts/keywords.py
+"""
+Grouped keyword statistics in one tokenization pass.
+
+KeywordStats tokenizes each batch of texts once (words longer than two
+characters, optionally plus bigrams of consecutive kept words) and reduces
+the token stream straight into a sparse group x term count matrix, where a
+group is e.g. (app, sentiment). Batches can be added one at a time, so the
+corpus never has to be in memory; only the group x term totals are kept.
+
+Top-N terms for every group then come from that one reduction, with stopwords
+masked at query time. Ties are broken by first appearance, so a single group's
+ranking equals ``Counter.most_common`` over the same words, which is what
+eda_helpers.top_n_words returned before. ``rank="tfidf"`` ranks terms that
+are distinctive for a group relative to the other groups instead.
+"""
+import argparse
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+MIN_LEN = 3  # same as top_n_words: words of length > 2
+BOUNDARY = "\x01"  # document separator; never part of cleaned text
+
+
+class KeywordStats:
+    """
+    Accumulated (group, term) counts over added batches, kept in order of
+    first appearance (which is the tie-break for equal counts).
+    """
+
+    def __init__(self, ngrams=1, min_len=MIN_LEN):
+        self.ngrams = ngrams
+        self.min_len = min_len
+        self.vocab = {}
+        self.groups = {}
+        self.docs = 0
+        # one entry per (group, term): key = group << 32 | term
+        self._keys = np.empty(0, dtype=np.int64)
+        self._counts = np.empty(0, dtype=np.int64)
+
+    def _term_ids(self, uniques, mask=None):
+        """Global vocabulary ids for ``uniques`` (-1 where ``mask`` is False)."""
+        setdefault = self.vocab.setdefault
+        if mask is None:
+            mask = np.ones(len(uniques), dtype=bool)
+        return np.fromiter((setdefault(u, len(self.vocab)) if m else -1 for u, m in zip(uniques, mask)),
+                           dtype=np.int64, count=len(uniques))
+
+    def _tokens(self, texts):
+        """
+        (document index, term id) arrays for a batch, in reading order. The
+        batch is split in one call by joining documents around a boundary
+        token, and words are looked up once per distinct word, not per occurrence.
+        """
+        texts = [t if isinstance(t, str) else "" for t in texts]
+        words = np.array(f" {BOUNDARY} ".join(texts).split(), dtype=object)
+        codes, uniques = pd.factorize(words)
+        boundary = [i for i, u in enumerate(uniques) if u == BOUNDARY]
+        is_boundary = np.isin(codes, boundary)
+        doc = np.cumsum(is_boundary)
+        long_enough = np.fromiter((len(u) >= self.min_len for u in uniques), dtype=bool, count=len(uniques))
+        keep = long_enough[codes] & ~is_boundary
+        doc, codes = doc[keep], codes[keep]
+        term_ids = self._term_ids(uniques, long_enough)[codes]
+        if self.ngrams < 2 or len(codes) < 2:
+            return doc, term_ids
+
+        pairs = np.flatnonzero(doc[1:] == doc[:-1])
+        bigrams = uniques[codes[pairs]] + " " + uniques[codes[pairs + 1]]
+        bi_codes, bi_uniques = pd.factorize(bigrams)
+        bi_ids = self._term_ids(bi_uniques)[bi_codes]
+        # interleave so each bigram follows its first word
+        rank = np.concatenate([np.arange(len(codes)) * 2, pairs * 2 + 1])
+        order = np.argsort(rank, kind="stable")
+        return np.concatenate([doc, doc[pairs]])[order], np.concatenate([term_ids, bi_ids])[order]
+
+    def add(self, texts, keys=None):
+        """
+        Add a batch of ``texts``; ``keys`` gives each text's group (any
+        hashable, e.g. an (app, sentiment) tuple). Without keys every text is
+        in group ``None``.
+        """
+        texts = list(texts)
+        keys = [None] * len(texts) if keys is None else list(keys)
+        self.docs += len(texts)
+        doc, term_ids = self._tokens(texts)
+        if not len(term_ids):
+            return self
+        # group keys may be tuples or None, which factorize would turn into NaN
+        setdefault = self.groups.setdefault
+        doc_groups = np.fromiter((setdefault(k, len(self.groups)) for k in keys),
+                                 dtype=np.int64, count=len(keys))
+        batch_keys = (doc_groups[doc] << 32) | term_ids
+
+        # merge into the running totals; factorize keeps first-appearance
+        # order, and existing keys come first
+        codes, self._keys = pd.factorize(np.concatenate([self._keys, batch_keys]))
+        weights = np.concatenate([self._counts, np.ones(len(batch_keys), dtype=np.int64)])
+        self._counts = np.bincount(codes, weights=weights).astype(np.int64)
+        return self
+
+    def terms(self):
+        """Vocabulary as an array of term strings indexed by term id."""
+        out = np.empty(len(self.vocab), dtype=object)
+        for term, i in self.vocab.items():
+            out[i] = term
+        return out
+
+    def matrix(self):
+        """(group keys, group x term CSR count matrix)."""
+        rows = self._keys >> 32
+        cols = self._keys & 0xFFFFFFFF
+        counts = sp.csr_matrix((self._counts, (rows, cols)), shape=(len(self.groups), len(self.vocab)))
+        return list(self.groups), counts
+
+    def _allowed(self, stopwords):
+        terms = self.terms()
+        if not stopwords:
+            return terms, np.ones(len(terms), dtype=bool)
+        stopwords = set(stopwords)
+        allowed = np.fromiter((not any(w in stopwords for w in t.split(" ")) for t in terms),
+                              dtype=bool, count=len(terms))
+        return terms, allowed
+
+    def frequencies(self, groups=None, n=None, stopwords=None):
+        """
+        ``{term: count}`` summed over ``groups`` (default: all groups), most
+        frequent first and at most ``n`` terms, e.g. for a word cloud. Size
+        depends on the vocabulary only, never on how many texts were added.
+        """
+        terms, allowed = self._allowed(stopwords)
+        group_ids = self._keys >> 32
+        term_ids = self._keys & 0xFFFFFFFF
+        keep = allowed[term_ids]
+        if groups is not None:
+            wanted = [self.groups[g] for g in groups if g in self.groups]
+            keep &= np.isin(group_ids, wanted)
+        totals = np.bincount(term_ids[keep], weights=self._counts[keep], minlength=len(terms)).astype(np.int64)
+        # term ids are in first-appearance order, so a stable sort keeps that tie-break
+        order = np.argsort(-totals, kind="stable")
+        order = order[totals[order] > 0][:n]
+        return {terms[t]: int(totals[t]) for t in order}
+
+    def top_terms(self, n=30, stopwords=None, rank="count", min_count=1):
+        """
+        ``{group: [(term, value), ...]}`` with the ``n`` best terms per group.
+        ``rank="count"`` ranks by frequency (value = count); ``rank="tfidf"``
+        weighs each group's counts against how many groups use the term
+        (value = tf-idf score). Terms containing a stopword are skipped.
+        """
+        terms, allowed = self._allowed(stopwords)
+        group_ids = self._keys >> 32
+        term_ids = self._keys & 0xFFFFFFFF
+        first = np.arange(len(self._keys))  # keys are in first-appearance order
+        keep = allowed[term_ids] & (self._counts >= min_count)
+        group_ids, term_ids = group_ids[keep], term_ids[keep]
+        counts, first = self._counts[keep], first[keep]
+
+        if rank == "tfidf":
+            from sklearn.feature_extraction.text import TfidfTransformer
+            matrix = sp.csr_matrix((counts, (group_ids, term_ids)),
+                                   shape=(len(self.groups), len(self.vocab)))
+            scores = TfidfTransformer(sublinear_tf=True).fit_transform(matrix)
+            values = np.asarray(scores[group_ids, term_ids]).ravel()
+        elif rank == "count":
+            values = counts
+        else:
+            raise ValueError(f"Unknown rank {rank!r}; use 'count' or 'tfidf'")
+
+        order = np.lexsort((first, -values, group_ids))
+        group_ids, term_ids, values = group_ids[order], term_ids[order], values[order]
+        starts = np.flatnonzero(np.r_[True, group_ids[1:] != group_ids[:-1]]) if len(order) else []
+        ends = list(starts[1:]) + [len(order)]
+        keys = list(self.groups)
+        cast = int if rank == "count" else float
+        out = {k: [] for k in keys}
+        for s, e in zip(starts, ends):
+            e = min(e, s + n)
+            out[keys[group_ids[s]]] = [(terms[t], cast(v)) for t, v in zip(term_ids[s:e], values[s:e])]
+        return out
+
+
+def top_words_by_group(texts, keys=None, n=30, stopwords=None, ngrams=1, rank="count"):
+    """One-shot helper: build KeywordStats over ``texts`` and return top_terms."""
+    return KeywordStats(ngrams=ngrams).add(texts, keys).top_terms(n, stopwords, rank)
+
+
+def main():
+    from eda_queries import get_backend
+
+    parser = argparse.ArgumentParser(description="Top terms per (app, sentiment) group.")
+    parser.add_argument("--backend", default=None, help="parquet or postgres (default: CX_EDA_BACKEND)")
+    parser.add_argument("--n", type=int, default=10)
+    parser.add_argument("--ngrams", type=int, choices=[1, 2], default=1)
+    parser.add_argument("--rank", choices=["count", "tfidf"], default="count")
+    parser.add_argument("--min-count", type=int, default=1)
+    args = parser.parse_args()
+
+    stats = get_backend(args.backend).keyword_stats(ngrams=args.ngrams)
+    top = stats.top_terms(args.n, rank=args.rank, min_count=args.min_count)
+    for group in sorted(top, key=str):
+        terms = ", ".join(f"{t} ({v:.3g})" if args.rank == "tfidf" else f"{t} ({v})" for t, v in top[group])
+        print(f"{group}: {terms}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+# scripts/metrics.py
+"""
+Stage-level instrumentation shared by the pipeline scripts.
+
+    with stage("sentiment") as s:
+        with stage("score", rows=len(texts)):   # recorded as sentiment.score
+            ...
+        s.rows = len(df)
+
+Every stage records wall time, CPU time (process-wide, so worker threads
+count), rows, rows/sec and peak RSS. On Linux the peak is the stage's own:
+the kernel's high-water mark (VmHWM) is reset when a stage starts, after
+every running stage has banked it; elsewhere it is the process peak so far.
+Names nest per thread; stages started on worker threads should be given
+their full name.
+
+Each finished stage is appended to <METRICS_DIR>/metrics.jsonl, and after
+each top-level stage <METRICS_DIR>/<script>.prom is rewritten in the
+Prometheus textfile format (node_exporter's textfile collector), with
+repeated stages summed. Top-level stages also print a one-line summary.
+
+Profiling is opt-in per stage: CX_PROFILE is a comma-separated list of
+stage-name patterns (fnmatch, e.g. "sentiment.score,topics.*"); matching
+stages run under cProfile (a .prof file for pstats/snakeviz) or, with
+CX_PROFILER=py-spy, under ``py-spy record`` attached to this process (a
+speedscope file). Profiles go to <METRICS_DIR>/profiles.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import signal
+import fnmatch
+import functools
+import threading
+import subprocess
+
+# the scripts import each other flat (from config import ...); this keeps that
+# working when the module is imported as scripts.<name> (notebooks, python -m)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import METRICS_DIR, METRICS_ENABLED, ensure_dir
+
+PROFILE = [p.strip() for p in os.getenv("CX_PROFILE", "").split(",") if p.strip()]
+PROFILER = os.getenv("CX_PROFILER", "cprofile")
+
+RUN_ID = uuid.uuid4().hex[:12]
+SCRIPT = os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0] or "python"
+
+_local = threading.local()
+_lock = threading.Lock()
+_records = []
+_active = []  # running stages on any thread; each keeps its peak across resets
+_banked = 0.0  # process peak before the last reset
+
+
+def _stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+def _proc_status_mb(field):
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def peak_rss_mb():
+    """Peak RSS since the last reset (Linux) or since process start."""
+    peak = _proc_status_mb("VmHWM")
+    if peak is None:
+        import resource
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak = maxrss / (2**20 if sys.platform == "darwin" else 2**10)
+    return peak
+
+def process_peak_rss_mb():
+    """Peak RSS of the whole process (since exec), across stage resets."""
+    return max(_banked, peak_rss_mb())
+
+def _reset_peak():
+    global _banked
+    _banked = process_peak_rss_mb()
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+class _Profile:
+    """cProfile or py-spy around one stage; a no-op if neither can start."""
+
+    def __init__(self, name):
+        self.name = name
+        self.path = os.path.join(METRICS_DIR, "profiles", f"{name}-{time.strftime('%Y%m%d-%H%M%S')}")
+        self.profile = None
+        self.proc = None
+
+    def start(self):
+        ensure_dir(os.path.dirname(self.path))
+        if PROFILER == "py-spy":
+            self.path += ".speedscope.json"
+            try:
+                self.proc = subprocess.Popen(["py-spy", "record", "--pid", str(os.getpid()),
+                                              "--format", "speedscope", "--output", self.path],
+                                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            except OSError as e:
+                print(f"⚠️ py-spy not available ({e}); {self.name} not profiled")
+            return
+        import cProfile
+        self.path += ".prof"
+        self.profile = cProfile.Profile()
+        try:
+            self.profile.enable()
+        except ValueError:  # another profiler is active (e.g. an enclosing stage)
+            self.profile = None
+
+    def stop(self):
+        if self.proc is not None:
+            self.proc.send_signal(signal.SIGINT)  # py-spy writes its output on SIGINT
+            self.proc.wait()
+        elif self.profile is not None:
+            self.profile.disable()
+            self.profile.dump_stats(self.path)
+        else:
+            return
+        print(f"Profile of {self.name} → {self.path}")
+
+
+class Stage:
+    """One timed stage; use through ``stage()``. Set ``rows`` any time before it ends."""
+
+    def __init__(self, name, rows=None):
+        self.name = name
+        self.rows = rows
+        self.record = None
+
+    def __enter__(self):
+        stack = _stack()
+        self.parent = stack[-1] if stack else None
+        if self.parent is not None:
+            self.name = f"{self.parent.name}.{self.name}"
+        stack.append(self)
+        with _lock:
+            # the high-water mark is process-wide: bank it for every running
+            # stage before resetting it for this one
+            peak = peak_rss_mb()
+            for other in _active:
+                other._peak = max(other._peak, peak)
+            _reset_peak()
+            self._peak = 0.0
+            _active.append(self)
+        self._profile = None
+        if any(fnmatch.fnmatch(self.name, p) for p in PROFILE):
+            self._profile = _Profile(self.name)
+            self._profile.start()
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        if self._profile is not None:
+            self._profile.stop()
+        with _lock:
+            peak = max(self._peak, peak_rss_mb())
+            _active.remove(self)
+        _stack().pop()
+        self.record = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "run_id": RUN_ID,
+            "script": SCRIPT,
+            "stage": self.name,
+            "status": "ok" if exc_type is None else "error",
+            "wall_s": round(wall, 4),
+            "cpu_s": round(cpu, 4),
+            "rows": self.rows,
+            "rows_per_s": round(self.rows / wall, 1) if self.rows is not None and wall > 0 else None,
+            "peak_rss_mb": round(peak, 1),
+        }
+        _emit(self.record, top_level=self.parent is None)
+        return False
+
+
+def stage(name, rows=None):
+    """Context manager timing ``name`` (nested under the enclosing stage)."""
+    return Stage(name, rows)
+
+def instrumented(name=None):
+    """Decorator: run every call of the function as a stage."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with Stage(name or fn.__name__):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+def records():
+    """Stages finished so far in this process."""
+    with _lock:
+        return list(_records)
+
+def _emit(record, top_level):
+    with _lock:
+        _records.append(record)
+        if METRICS_ENABLED:
+            ensure_dir(METRICS_DIR)
+            with open(os.path.join(METRICS_DIR, "metrics.jsonl"), "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+            if top_level:
+                write_textfile(_records)
+    if top_level:
+        rate = f" ({record['rows_per_s']:.0f}/s)" if record["rows_per_s"] else ""
+        rows = f", {record['rows']} rows{rate}" if record["rows"] is not None else ""
+        print(f"⏱ {record['stage']}: {record['wall_s']:.2f}s wall, {record['cpu_s']:.2f}s CPU{rows}, "
+              f"peak {record['peak_rss_mb']:.0f} MB")
+
+PROM_METRICS = [
+    ("cx_stage_wall_seconds", "Wall time of the stage in the last run.", "wall_s"),
+    ("cx_stage_cpu_seconds", "CPU time of the process during the stage in the last run.", "cpu_s"),
+    ("cx_stage_rows", "Rows processed by the stage in the last run.", "rows"),
+    ("cx_stage_rows_per_second", "Rows per wall-clock second in the last run.", "rows_per_s"),
+    ("cx_stage_peak_rss_bytes", "Peak resident memory during the stage in the last run.", "peak_rss_mb"),
+    ("cx_stage_runs", "Times the stage ran in the last run of the script.", "runs"),
+    ("cx_stage_failures", "Times the stage raised in the last run of the script.", "failures"),
+    ("cx_stage_last_run_timestamp_seconds", "When the script last finished the stage.", "finished"),
+]
+
+def _summarize(recs):
+    out = {}
+    for r in recs:
+        s = out.setdefault(r["stage"], {"wall_s": 0.0, "cpu_s": 0.0, "rows": None, "peak_rss_mb": 0.0,
+                                        "runs": 0, "failures": 0})
+        s["wall_s"] += r["wall_s"]
+        s["cpu_s"] += r["cpu_s"]
+        if r["rows"] is not None:
+            s["rows"] = (s["rows"] or 0) + r["rows"]
+        s["peak_rss_mb"] = max(s["peak_rss_mb"], r["peak_rss_mb"])
+        s["runs"] += 1
+        s["failures"] += r["status"] != "ok"
+        s["finished"] = time.time()
+    for s in out.values():
+        s["rows_per_s"] = s["rows"] / s["wall_s"] if s["rows"] is not None and s["wall_s"] > 0 else None
+        s["peak_rss_mb"] *= 2**20
+    return out
+
+def write_textfile(recs, path=None):
+    """Write ``recs`` (summed per stage) as a Prometheus textfile, atomically."""
+    path = path or os.path.join(METRICS_DIR, f"{SCRIPT}.prom")
+    summary = _summarize(recs)
+    lines = []
+    for metric, help_text, field in PROM_METRICS:
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"]
+        for name, s in summary.items():
+            if s.get(field) is not None:
+                lines.append(f'{metric}{{script="{SCRIPT}",stage="{name}"}} {s[field]:.6g}')
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(path + ".tmp", path)
+    return path
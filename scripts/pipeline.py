@@ -0,0 +1,288 @@
+# scripts/pipeline.py
+"""
+Run the review pipeline as a DAG of stages.
+
+Each stage is one of the existing scripts, with the artifacts (files or globs
+under the project root, or under the config data folders, which CX_DATA_DIR
+may move) it reads and writes; a stage depends on the stages
+that write its inputs. A stage's key hashes its command, the relevant
+environment settings, the source of its script and every local module that
+script imports, and the content of its inputs. When the key and the content
+of its outputs match the last successful run, the stage is skipped; because
+keys use content, a stage that rewrites identical outputs does not invalidate
+the stages after it. Stages whose inputs are ready run in parallel (e.g.
+sentiment and topics).
+
+State (keys, output hashes and a size/mtime memo so unchanged files are not
+re-hashed) is kept in data/processed/pipeline_state.json.
+
+--since passes only new rows downstream: it is forwarded to the stages that
+accept it (sentiment scores only reviews dated from then on and merges them
+into its results). topics --online and the database load are incremental on
+their own, by review_id and by load_state high-water mark.
+"""
+import os
+import ast
+import sys
+import glob
+import json
+import time
+import hashlib
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# the scripts import each other flat (from config import ...); this keeps that
+# working when the module is imported as scripts.<name> (notebooks, python -m)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import BASE_DIR, RAW_DATA, PROCESSED_DATA, APPS_FILE, EDA_PLOTS, TASK4_PLOTS, ensure_dir
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+STATE_PATH = os.path.join(PROCESSED_DATA, "pipeline_state.json")
+
+# environment settings that change what stages read or write
+ENV_PARAMS = ["CX_EXPORT_CSV", "CX_EDA_BACKEND", "CX_DATA_DIR"]
+
+def artifact(directory, pattern):
+    """``pattern`` in a config folder, relative to the project root when it lies inside it."""
+    path = os.path.join(directory, pattern)
+    rel = os.path.relpath(path, BASE_DIR)
+    return path if rel.startswith(os.pardir) else rel
+
+APPS = artifact(os.path.dirname(APPS_FILE), os.path.basename(APPS_FILE))
+RAW = artifact(RAW_DATA, "*_reviews.csv")
+CLEANED = artifact(PROCESSED_DATA, "cleaned_reviews.parquet")
+SENTIMENT = artifact(PROCESSED_DATA, "sentiment_results.parquet")
+TOPICS = artifact(PROCESSED_DATA, "topic_results.parquet")
+INSIGHTS = artifact(PROCESSED_DATA, "task4_insights_summary.csv")
+EDA_PNGS = artifact(EDA_PLOTS, "*.png")
+TASK4_PNGS = artifact(TASK4_PLOTS, "*.png")
+
+
+class Stage:
+    """
+    One pipeline step: ``command`` (arguments after ``python``, run from the
+    project root) reading ``inputs`` and writing ``outputs``. Stages with
+    ``default=False`` (network or database access) only run when named.
+    ``always`` stages have no reproducible inputs and run every time.
+    ``since`` stages accept ``--since``.
+    """
+
+    def __init__(self, name, command, inputs=(), outputs=(), default=True, always=False, since=False):
+        self.name = name
+        self.command = list(command)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.default = default
+        self.always = always
+        self.since = since
+
+    def script(self):
+        if self.command[0] == "-m":
+            return os.path.join(BASE_DIR, *self.command[1].split(".")) + ".py"
+        return os.path.join(BASE_DIR, self.command[0])
+
+
+STAGES = [
+    Stage("scrape", ["scripts/scraper.py", "--incremental"], inputs=[APPS],
+          outputs=[RAW], default=False, always=True),
+    Stage("preprocess", ["scripts/preprocessing.py"], inputs=[APPS, RAW], outputs=[CLEANED]),
+    Stage("sentiment", ["scripts/sentiment.py"], inputs=[CLEANED], outputs=[SENTIMENT], since=True),
+    Stage("topics", ["scripts/topics.py", "--online"], inputs=[CLEANED], outputs=[TOPICS]),
+    Stage("load", ["scripts/insert_data.py"], inputs=[CLEANED], default=False),
+    Stage("eda", ["scripts/run_eda.py"], inputs=[CLEANED, SENTIMENT], outputs=[EDA_PNGS]),
+    Stage("task4", ["scripts/task4_run.py"], inputs=[SENTIMENT],
+          outputs=[TASK4_PNGS, INSIGHTS]),
+]
+
+
+def upstream(stage, stages=STAGES):
+    """Stages that write one of ``stage``'s inputs."""
+    return [s for s in stages if s is not stage and set(s.outputs) & set(stage.inputs)]
+
+def select(targets=None, stages=STAGES):
+    """``targets`` (default: every default stage) plus everything they need, in DAG order."""
+    by_name = {s.name: s for s in stages}
+    unknown = [t for t in targets or [] if t not in by_name]
+    if unknown:
+        raise ValueError(f"Unknown stage(s) {unknown}; choose from {list(by_name)}")
+    wanted = [by_name[t] for t in targets] if targets else [s for s in stages if s.default]
+    chosen = set()
+    while wanted:
+        stage = wanted.pop()
+        if stage.name not in chosen:
+            chosen.add(stage.name)
+            # explicitly named non-default stages (scrape, load) are not pulled in
+            wanted.extend(u for u in upstream(stage, stages) if u.default or u.name in (targets or []))
+    return [s for s in stages if s.name in chosen]
+
+def local_modules(path, seen=None):
+    """``path`` plus the scripts/ modules it imports, recursively."""
+    seen = set() if seen is None else seen
+    if path in seen or not os.path.exists(path):
+        return seen
+    seen.add(path)
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [a.name for a in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            names = [node.module] + [f"{node.module}.{a.name}" for a in node.names]
+        else:
+            continue
+        for name in names:
+            parts = name.split(".")
+            if parts[0] == "scripts":
+                parts = parts[1:]
+            if len(parts) == 1:
+                local_modules(os.path.join(SCRIPTS_DIR, parts[0] + ".py"), seen)
+    return seen
+
+def file_hash(path, memo):
+    """Content hash of ``path``; re-read only when its size or mtime changed."""
+    st = os.stat(path)
+    sig = [st.st_size, st.st_mtime_ns]
+    rel = os.path.relpath(path, BASE_DIR)
+    entry = memo.get(rel)
+    if entry and entry[:2] == sig:
+        return entry[2]
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    memo[rel] = sig + [h.hexdigest()]
+    return memo[rel][2]
+
+def artifact_hash(pattern, memo):
+    """Hash over every file matching ``pattern`` (None if nothing matches)."""
+    paths = sorted(glob.glob(os.path.join(BASE_DIR, pattern)))
+    if not paths:
+        return None
+    h = hashlib.blake2b(digest_size=16)
+    for path in paths:
+        h.update(os.path.relpath(path, BASE_DIR).encode())
+        h.update(file_hash(path, memo).encode())
+    return h.hexdigest()
+
+def stage_key(stage, memo):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps(stage.command).encode())
+    h.update(json.dumps({k: os.getenv(k) for k in ENV_PARAMS}).encode())
+    for path in sorted(local_modules(stage.script())):
+        h.update(os.path.relpath(path, BASE_DIR).encode())
+        h.update(file_hash(path, memo).encode())
+    for pattern in stage.inputs:
+        h.update(pattern.encode())
+        h.update(str(artifact_hash(pattern, memo)).encode())
+    return h.hexdigest()
+
+def output_hashes(stage, memo):
+    return {pattern: artifact_hash(pattern, memo) for pattern in stage.outputs}
+
+def up_to_date(stage, key, state, memo):
+    last = state["stages"].get(stage.name)
+    if stage.always or last is None or last["key"] != key:
+        return False
+    outputs = output_hashes(stage, memo)
+    return None not in outputs.values() and outputs == last["outputs"]
+
+def load_state(path=STATE_PATH):
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return {"stages": {}, "files": {}}
+
+def save_state(state, path=STATE_PATH):
+    ensure_dir(os.path.dirname(path))
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+def run_stage(stage, since=None):
+    """Run one stage as a subprocess; returns (returncode, output, seconds)."""
+    cmd = [sys.executable] + stage.command
+    if since is not None and stage.since:
+        cmd += ["--since", since]
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=BASE_DIR, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    return proc.returncode, proc.stdout, time.perf_counter() - start
+
+def run_pipeline(targets=None, jobs=2, since=None, force=(), dry_run=False):
+    """
+    Run the selected stages, skipping up-to-date ones. Returns
+    ``{stage name: status}`` with status ran, skipped, failed, blocked (an
+    upstream stage failed) or, for ``dry_run``, stale.
+    """
+    stages = select(targets)
+    deps = {s.name: [u.name for u in upstream(s, stages)] for s in stages}
+    state = load_state()
+    memo = state["files"]
+    status, seconds = {}, {}
+    pending, running = list(stages), {}
+
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as pool:
+        while pending or running:
+            for stage in list(pending):
+                before = [status.get(d) for d in deps[stage.name]]
+                if any(b in ("failed", "blocked") for b in before):
+                    status[stage.name] = "blocked"
+                elif "stale" in before and dry_run:
+                    status[stage.name] = "stale"
+                elif all(b in ("ran", "skipped") for b in before):
+                    # keyed only now, so it sees what upstream stages just wrote
+                    key = stage_key(stage, memo)
+                    if stage.name not in force and up_to_date(stage, key, state, memo):
+                        status[stage.name] = "skipped"
+                    elif dry_run:
+                        status[stage.name] = "stale"
+                    else:
+                        print(f"▶ {stage.name}: {' '.join(stage.command)}")
+                        running[pool.submit(run_stage, stage, since)] = (stage, key)
+                        status[stage.name] = "running"
+                else:
+                    continue
+                pending.remove(stage)
+
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, key = running.pop(future)
+                code, output, secs = future.result()
+                seconds[stage.name] = secs
+                print(f"--- {stage.name} ({secs:.1f}s) ---\n{output.rstrip()}")
+                if code == 0:
+                    status[stage.name] = "ran"
+                    state["stages"][stage.name] = {"key": key, "outputs": output_hashes(stage, memo),
+                                                   "finished_at": time.strftime("%Y-%m-%d %H:%M:%S")}
+                    save_state(state)
+                else:
+                    status[stage.name] = "failed"
+                    print(f"⚠️ {stage.name} exited with code {code}")
+
+    print("\n--- Pipeline ---\n")
+    for stage in stages:
+        print(f"{stage.name:<12}{status[stage.name]:<9}{seconds.get(stage.name, 0.0):>7.1f}s")
+    return status
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the review pipeline, skipping up-to-date stages.")
+    parser.add_argument("targets", nargs="*",
+                        help=f"stages to bring up to date, with what they need "
+                             f"(default: all but scrape and load; stages: {', '.join(s.name for s in STAGES)})")
+    parser.add_argument("--jobs", type=int, default=2, help="stages run at the same time")
+    parser.add_argument("--since", default=None,
+                        help="only pass reviews dated from this timestamp downstream ('last': since the last run)")
+    parser.add_argument("--force", nargs="*", default=None, metavar="STAGE",
+                        help="re-run these stages (all selected stages if none given) anyway")
+    parser.add_argument("--dry-run", action="store_true", help="only report which stages are stale")
+    args = parser.parse_args()
+
+    force = {s.name for s in STAGES} if args.force == [] else set(args.force or [])
+    status = run_pipeline(args.targets, jobs=args.jobs, since=args.since, force=force, dry_run=args.dry_run)
+    raise SystemExit(1 if any(s in ("failed", "blocked") for s in status.values()) else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# scripts/plot_render.py
+"""
+Headless, parallel, cached rendering of the EDA plots.
+
+A plot job names a plot function in eda_helpers, the (small) data it takes
+and the PNG to write. Each job's fingerprint hashes its data, arguments,
+the function's name and the source of eda_helpers and every local module it
+imports (pipeline.local_modules); it is stored in the PNG's metadata, so a job
+whose fingerprint matches the existing file is skipped. The remaining jobs
+are rendered with the Agg backend in a process pool, and every figure is
+closed as soon as it is saved. render_plots prints a per-plot summary.
+"""
+import os
+import sys
+import time
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+
+# the scripts import each other flat (from config import ...); this keeps that
+# working when the module is imported as scripts.<name> (notebooks, python -m)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import PLOT_WORKERS
+
+FINGERPRINT_KEY = "cx-fingerprint"
+
+
+class PlotJob:
+    """One plot: ``eda_helpers.<func>(*args, **kwargs)`` saved to ``path``."""
+
+    def __init__(self, path, func, *args, **kwargs):
+        self.path = path
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    @property
+    def name(self):
+        return os.path.basename(self.path)
+
+
+def _plot_function(name):
+    import eda_helpers
+    return getattr(eda_helpers, name)
+
+def _feed(h, value):
+    if isinstance(value, pd.DataFrame):
+        h.update(repr(list(zip(value.columns, value.dtypes))).encode())
+        h.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, pd.Series):
+        h.update(repr((value.name, value.dtype)).encode())
+        h.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, dict):
+        for k in sorted(value, key=repr):
+            h.update(repr(k).encode())
+            _feed(h, value[k])
+    elif isinstance(value, (list, tuple)):
+        h.update(f"{type(value).__name__}{len(value)}".encode())
+        for v in value:
+            _feed(h, v)
+    elif isinstance(value, (set, frozenset)):
+        h.update(repr(sorted(value, key=repr)).encode())
+    else:
+        h.update(repr(value).encode())
+
+_sources_digest = None
+
+def sources_digest():
+    """Hash of eda_helpers.py and the scripts/ modules it imports, once per process."""
+    global _sources_digest
+    if _sources_digest is None:
+        import eda_helpers
+        from pipeline import local_modules
+        h = hashlib.blake2b(digest_size=16)
+        for path in sorted(local_modules(os.path.abspath(eda_helpers.__file__))):
+            h.update(os.path.basename(path).encode())
+            with open(path, "rb") as f:
+                h.update(f.read())
+        _sources_digest = h.hexdigest()
+    return _sources_digest
+
+def fingerprint(job):
+    """Hash of the plot code (sources_digest), the job's function, data and arguments."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(sources_digest().encode())
+    h.update(job.func.encode())
+    _feed(h, job.args)
+    _feed(h, job.kwargs)
+    return h.hexdigest()
+
+def saved_fingerprint(path):
+    """Fingerprint stored in an existing PNG, or None."""
+    if not os.path.exists(path):
+        return None
+    try:
+        from PIL import Image
+        with Image.open(path) as img:
+            return img.info.get(FINGERPRINT_KEY)
+    except Exception:
+        return None
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use("Agg")
+
+def _render(job, fp):
+    start = time.perf_counter()
+    from eda_helpers import plotting, save_plot
+    plt, _ = plotting()
+    fig = _plot_function(job.func)(*job.args, **job.kwargs)
+    try:
+        save_plot(fig, job.path, metadata={FINGERPRINT_KEY: fp})
+    finally:
+        plt.close(fig)
+    return time.perf_counter() - start
+
+def render_plots(jobs, workers=None, force=False):
+    """
+    Render ``jobs`` (PlotJob list), skipping unchanged ones unless ``force``.
+    Returns a DataFrame with one row per plot: status and seconds.
+    """
+    start = time.perf_counter()
+    rows = []
+    todo = []
+    for job in jobs:
+        fp = fingerprint(job)
+        if not force and saved_fingerprint(job.path) == fp:
+            rows.append({"plot": job.name, "status": "skipped", "seconds": 0.0})
+        else:
+            todo.append((job, fp))
+
+    workers = min(workers or PLOT_WORKERS or os.cpu_count() or 1, len(todo))
+    if workers <= 1:
+        _init_worker()
+        results = []
+        for job, fp in todo:
+            try:
+                results.append(_render(job, fp))
+            except Exception as e:
+                results.append(e)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = [pool.submit(_render, job, fp) for job, fp in todo]
+            results = []
+            for fut in futures:
+                try:
+                    results.append(fut.result())
+                except Exception as e:
+                    results.append(e)
+
+    for (job, _), result in zip(todo, results):
+        if isinstance(result, Exception):
+            rows.append({"plot": job.name, "status": f"failed: {result!r}", "seconds": 0.0})
+        else:
+            rows.append({"plot": job.name, "status": "rendered", "seconds": round(result, 2)})
+
+    summary = pd.DataFrame(rows, columns=["plot", "status", "seconds"])
+    rendered = int((summary["status"] == "rendered").sum())
+    skipped = int((summary["status"] == "skipped").sum())
+    print("\n--- Plot rendering ---\n")
+    print(summary.to_string(index=False))
+    print(f"\n{rendered} rendered, {skipped} unchanged, {len(summary) - rendered - skipped} failed "
+          f"in {time.perf_counter() - start:.1f}s ({max(workers, 1)} worker(s))")
+    return summary
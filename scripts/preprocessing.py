@@ -1,58 +1,208 @@
 import os
+import argparse
 import pandas as pd
 import re
-from config import RAW_DATA, PROCESSED_DATA, APPS
+from config import RAW_DATA, PROCESSED_DATA, APPS, EXPORT_CSV
+from storage import save_dataset, parquet_path, ChunkedDatasetWriter
+from score_cache import text_hashes
+from metrics import stage
+from dedup import cluster_ids, add_clusters, cluster_report
+
+# Compiled once at import; clean_text runs once per review
+LINK_RE = re.compile(r"http\S+")
+NON_ALNUM_RE = re.compile(r"[^a-z0-9\s]")
+SPACES_RE = re.compile(r"\s+")
+
+KEEP_COLS = ["content", "score", "at", "app"]
+# read from the raw files when present; older scrapes may lack reviewId
+RAW_COLS = ["reviewId"] + KEEP_COLS[:-1]
+CHUNKSIZE = 50_000
+# a review scraped twice is kept once; an edited one (new date) keeps each version.
+# Batch and streaming mode drop repeats on the same key.
+DEDUP_KEYS = ["review_id", "at"]
 
 def clean_text(text):
     if not isinstance(text, str):
         return ""
     text = text.lower()
-    text = re.sub(r"http\S+", "", text)          # remove links
-    text = re.sub(r"[^a-z0-9\s]", " ", text)     # keep letters/numbers
-    text = re.sub(r"\s+", " ", text).strip()
+    text = LINK_RE.sub("", text)          # remove links
+    text = NON_ALNUM_RE.sub(" ", text)    # keep letters/numbers
+    text = SPACES_RE.sub(" ", text).strip()
     return text
 
+def _clean_fused(text):
+    # Same result as clean_text. After NON_ALNUM_RE only [a-z0-9] and
+    # whitespace remain, and str.split() splits on exactly the characters
+    # \s matches, so split/join replaces the collapse-and-strip regex.
+    if not isinstance(text, str):
+        return ""
+    return " ".join(NON_ALNUM_RE.sub(" ", LINK_RE.sub("", text.lower())).split())
+
+def clean_series(series):
+    """Clean a whole column at once; byte-for-byte equal to series.apply(clean_text)."""
+    return pd.Series([_clean_fused(t) for t in series.astype(object)],
+                     index=series.index, dtype=object)
+
+def review_keys(df):
+    """
+    Deterministic 64-bit review_id for each row: a hash of the app and the
+    store's reviewId, or of app, text and timestamp when there is no reviewId.
+    """
+    app = df["app"].astype(str)
+    fallback = app + "\x1f" + df["content"].astype(str) + "\x1f" + df["at"].astype(str)
+    if "reviewId" in df.columns:
+        source_id = df["reviewId"]
+        keys = (app + "\x1e" + source_id.astype(str)).where(source_id.notna(), fallback)
+    else:
+        keys = fallback
+    return text_hashes(keys)
+
+def with_review_ids(df):
+    """Add review_id in front of the kept columns (raw reviewId is dropped)."""
+    out = df[KEEP_COLS].copy()
+    out.insert(0, "review_id", review_keys(df))
+    return out
+
 def load_reviews(app_name):
     file_path = os.path.join(RAW_DATA, f"{app_name}_reviews.csv")
     if not os.path.exists(file_path):
         print(f"⚠️ Missing file: {file_path}")
         return None
-    
+
     df = pd.read_csv(file_path)
     df["app"] = app_name
     return df
 
-def preprocess_app_reviews():
+def preprocess_app_reviews(dedup=True):
     all_data = []
 
-    for app in APPS:
-        df = load_reviews(app)
-        if df is None:
-            continue
-        
-        # Keep only important columns
-        keep_cols = ["content", "score", "at", "app"]
-        df = df[keep_cols]
+    with stage("preprocess") as st:
+        for app in APPS:
+            with stage("read_csv") as read:
+                df = load_reviews(app)
+                read.rows = 0 if df is None else len(df)
+            if df is None:
+                continue
+
+            with stage("clean", rows=len(df)):
+                # Keep only important columns, keyed by a stable review_id
+                df = with_review_ids(df)
+
+                # Clean text
+                df["clean_content"] = clean_series(df["content"])
 
-        # Clean text
-        df["clean_content"] = df["content"].apply(clean_text)
+                # Drop empty rows
+                df = df[df["clean_content"].str.len() > 0]
 
-        # Drop empty rows
-        df = df[df["clean_content"].str.len() > 0]
+            all_data.append(df)
 
-        all_data.append(df)
+        # Merge all apps; the same review scraped twice is kept once
+        final_df = pd.concat(all_data, ignore_index=True)
+        final_df = final_df.drop_duplicates(DEDUP_KEYS, ignore_index=True)
 
-    # Merge all apps
-    final_df = pd.concat(all_data, ignore_index=True)
+        if dedup:
+            # near-duplicates share a cluster_id; downstream scoring runs once per cluster
+            with stage("dedup", rows=len(final_df)):
+                final_df["cluster_id"] = cluster_ids(final_df)
 
-    output_path = os.path.join(PROCESSED_DATA, "cleaned_reviews.csv")
-    final_df.to_csv(output_path, index=False)
+        with stage("save", rows=len(final_df)):
+            output_path = save_dataset(final_df, PROCESSED_DATA, "cleaned_reviews", csv=EXPORT_CSV)
+        st.rows = len(final_df)
 
     print(f"Processed file saved → {output_path}")
+    if dedup:
+        cluster_report(final_df, n=5)
     return final_df
 
+def iter_review_chunks(app_name, chunksize=CHUNKSIZE):
+    """Yield raw reviews for one app in DataFrames of at most ``chunksize`` rows."""
+    file_path = os.path.join(RAW_DATA, f"{app_name}_reviews.csv")
+    if not os.path.exists(file_path):
+        print(f"⚠️ Missing file: {file_path}")
+        return
+    for chunk in pd.read_csv(file_path, usecols=lambda c: c in RAW_COLS, chunksize=chunksize):
+        chunk["app"] = app_name
+        yield chunk
+
+def preprocess_app_reviews_streaming(chunksize=CHUNKSIZE, output_dir=None, dedup=True):
+    """
+    Streaming variant of preprocess_app_reviews.
+
+    Reads each raw CSV ``chunksize`` rows at a time and appends every cleaned
+    chunk to the output dataset, so memory is bounded by the chunk size rather
+    than the number of reviews. The writer merge-sorts the chunks on close, so
+    the output is in the batch mode's (app, date) order, and drops reviews
+    repeated across chunks (same DEDUP_KEYS, e.g. from overlapping scrapes)
+    as it merges, so no set of seen ids grows with the corpus. The rows kept
+    are the ones batch mode keeps. Near-duplicate clusters are
+    added in a second pass over the written file (dedup.add_clusters).
+    Returns the number of rows written.
+    """
+    output_dir = output_dir or PROCESSED_DATA
+    with stage("preprocess") as st:
+        with ChunkedDatasetWriter(output_dir, "cleaned_reviews", csv=EXPORT_CSV, unique="review_id") as writer:
+            for app in APPS:
+                for chunk in iter_review_chunks(app, chunksize):
+                    chunk = with_review_ids(chunk)
+                    chunk["clean_content"] = clean_series(chunk["content"])
+                    chunk = chunk[chunk["clean_content"].str.len() > 0]
+                    # repeats within the chunk; the writer drops those across chunks
+                    writer.write(chunk[~chunk.duplicated(DEDUP_KEYS)])
+        st.rows = writer.rows  # counted once the runs are merged
+
+    if writer.rows == 0:
+        raise ValueError("No raw reviews found to preprocess.")
+    if dedup:
+        with stage("dedup", rows=writer.rows):
+            add_clusters(output_dir, csv=EXPORT_CSV)
+    output_path = parquet_path(output_dir, "cleaned_reviews")
+    print(f"Processed file saved → {output_path} ({writer.rows} rows)")
+    return writer.rows
+
+PARITY_SAMPLES = [
+    None, float("nan"), 5, "", "   ", "Good App!!", "Check https://x.co/a?b=1 now",
+    "ÇBE  app\t\tis\nGREAT", "İstanbul ß ǅ", "tabs nbsp em　ideographic",
+    "\x1c\x1d\x1e\x1funit separators", "emoji 👍👍 ok", "http", "httpfoo bar", "a b c",
+]
+
+def check_parity(apps=None):
+    """
+    Compare clean_series against the reference clean_text row by row, on the
+    built-in edge cases plus every raw review file. Returns the mismatch count.
+    """
+    series = [pd.Series(PARITY_SAMPLES, dtype=object)]
+    for app in apps or APPS:
+        series.extend(chunk["content"] for chunk in iter_review_chunks(app))
+
+    checked = mismatches = 0
+    for s in series:
+        expected = [clean_text(t) for t in s.astype(object)]
+        got = clean_series(s).tolist()
+        for exp, out in zip(expected, got):
+            checked += 1
+            if exp.encode("utf-8") != out.encode("utf-8"):
+                mismatches += 1
+                print(f"Mismatch: {exp!r} != {out!r}")
+    print(f"Parity check: {checked} texts, {mismatches} mismatches")
+    return mismatches
+
 def main():
-    preprocess_app_reviews()
+    parser = argparse.ArgumentParser(description="Clean raw reviews.")
+    parser.add_argument("--stream", action="store_true",
+                        help="process raw files in chunks with bounded memory")
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE)
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="skip near-duplicate clustering (no cluster_id column)")
+    parser.add_argument("--check-parity", action="store_true",
+                        help="verify the vectorized cleaner against clean_text and exit")
+    args = parser.parse_args()
+
+    if args.check_parity:
+        raise SystemExit(1 if check_parity() else 0)
+    if args.stream:
+        preprocess_app_reviews_streaming(chunksize=args.chunksize, dedup=not args.no_dedup)
+    else:
+        preprocess_app_reviews(dedup=not args.no_dedup)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,110 @@
+# scripts/review_sources.py
+"""
+Pluggable review fetch layer for scraper.py.
+
+A review source is any object with a
+``fetch(app_id, count, continuation_token=None) -> (rows, next_token)`` method.
+``rows`` is a list of review dicts in google_play_scraper's shape (newest
+first) and ``next_token`` is a JSON-serializable string, or None once the
+source is exhausted, so it can be stored in a scrape checkpoint. Sources also
+expose a ``host`` attribute that the scrape scheduler rate-limits on.
+"""
+import random
+from datetime import datetime, timedelta
+
+LANG = "en"
+COUNTRY = "et"
+
+
+class GooglePlaySource:
+    """Fetch pages of newest-first reviews from Google Play."""
+
+    host = "play.google.com"
+
+    def __init__(self, lang=LANG, country=COUNTRY):
+        self.lang = lang
+        self.country = country
+
+    def fetch(self, app_id, count, continuation_token=None):
+        from google_play_scraper import Sort, reviews
+        from google_play_scraper.features.reviews import _ContinuationToken
+
+        token = None
+        if continuation_token is not None:
+            token = _ContinuationToken(
+                continuation_token, self.lang, self.country,
+                Sort.NEWEST.value, count, None, None
+            )
+        result, next_token = reviews(
+            app_id,
+            lang=self.lang,
+            country=self.country,
+            sort=Sort.NEWEST,
+            count=count,
+            continuation_token=token,
+        )
+        return result, next_token.token
+
+
+FAKE_PHRASES = [
+    "good app", "very good", "best banking app", "nice and easy to use",
+    "app keeps crashing after update", "cannot login otp not received",
+    "transfer failed but money deducted", "slow and not working",
+    "please fix the bug", "excellent service thank you",
+    "worst app ever", "it is not opening on my phone",
+]
+
+
+class FakeReviewSource:
+    """
+    Deterministic offline review source for tests and benchmarks.
+
+    Holds ``total`` synthetic reviews per app, newest first. The continuation
+    token is the sequence number of the next (older) review to return, so it
+    stays valid as ``add_reviews`` simulates new reviews arriving between runs.
+    """
+
+    host = "fake"
+
+    def __init__(self, total=1000, seed=42, start=None):
+        self.seed = seed
+        self.start = start or datetime(2024, 1, 1)
+        self._totals = {}
+        self._default_total = total
+        self.calls = 0
+
+    def _total(self, app_id):
+        return self._totals.setdefault(app_id, self._default_total)
+
+    def add_reviews(self, app_id, n):
+        self._totals[app_id] = self._total(app_id) + n
+
+    def _review(self, app_id, seq):
+        # seq 0 is the oldest review; the review is a pure function of
+        # (seed, app_id, seq) so it is stable as newer reviews are added.
+        rng = random.Random(f"{self.seed}:{app_id}:{seq}")
+        at = self.start + timedelta(minutes=10 * seq)
+        return {
+            "reviewId": f"{app_id}-{seq:09d}",
+            "userName": f"user{rng.randrange(100000)}",
+            "userImage": "",
+            "content": rng.choice(FAKE_PHRASES),
+            "score": rng.randint(1, 5),
+            "thumbsUpCount": rng.randrange(20),
+            "reviewCreatedVersion": "1.0",
+            "at": at,
+            "replyContent": None,
+            "repliedAt": None,
+            "appVersion": "1.0",
+        }
+
+    def fetch(self, app_id, count, continuation_token=None):
+        self.calls += 1
+        if continuation_token is None:
+            top = self._total(app_id) - 1
+        else:
+            top = int(continuation_token)
+        bottom = max(top - count, -1)
+        rows = [self._review(app_id, seq) for seq in range(top, bottom, -1)]
+        next_token = str(bottom) if bottom >= 0 else None
+        return rows, next_token
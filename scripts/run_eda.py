@@ -1,52 +1,59 @@
 # scripts/run_eda.py
 import os
-from eda_helpers import (
-    load_cleaned_reviews,
-    load_sentiment_results,
-    merge_sentiment_and_cleaned,
-    plot_reviews_per_app,
-    plot_rating_distribution,
-    plot_avg_rating_over_time,
-    plot_sentiment_distribution,
-    plot_wordcloud_from_text,
-    top_n_words,
-    plot_top_keywords_bar,
-    save_plot
-)
-
-OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "reports", "plots")
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+import argparse
+from config import EDA_PLOTS
+from eda_helpers import WORDCLOUD_WORDS, wordcloud_stopwords
+from eda_queries import BACKENDS, get_backend
+from plot_render import PlotJob, render_plots
+from metrics import stage
 
-def main():
-    cleaned = load_cleaned_reviews()
-    sentiment = load_sentiment_results()
-
-    merged = merge_sentiment_and_cleaned(cleaned, sentiment)
-
-    # 1 - reviews per app
-    plot_reviews_per_app(cleaned, save_path=os.path.join(OUTPUT_DIR, "reviews_per_app.png"))
-
-    # 2 - rating distribution
-    plot_rating_distribution(cleaned, save_path=os.path.join(OUTPUT_DIR, "rating_distribution.png"))
+OUTPUT_DIR = EDA_PLOTS
 
-    # 3 - avg rating over time
-    plot_avg_rating_over_time(cleaned, save_path=os.path.join(OUTPUT_DIR, "avg_rating_over_time.png"))
-
-    # 4 - sentiment distribution
-    plot_sentiment_distribution(merged, save_path=os.path.join(OUTPUT_DIR, "sentiment_distribution.png"))
-
-    # 5 - wordcloud for negative reviews
-    negative = merged[merged['sentiment']=="negative"]
-    if not negative.empty:
-        plot_wordcloud_from_text(negative["clean_content"], save_path=os.path.join(OUTPUT_DIR, "wordcloud_negative.png"))
-
-    # 6 - top keywords per app (negative)
-    stopwords = set(["app","bank","payment","payments","service","mobile","update","please"])
-    for app in cleaned['app'].unique():
-        neg = merged[(merged['app']==app) & (merged['sentiment']=="negative")]
-        pairs = top_n_words(neg['clean_content'], n=40, stopwords=stopwords)
-        if pairs:
-            plot_top_keywords_bar(pairs, title=f"Top negative keywords - {app}", save_path=os.path.join(OUTPUT_DIR, f"top_keywords_negative_{app}.png"))
+def main():
+    parser = argparse.ArgumentParser(description="Generate the EDA plots.")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=None,
+                        help="where aggregates are computed (default: CX_EDA_BACKEND or parquet)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="plot rendering processes (default: CX_PLOT_WORKERS or one per CPU)")
+    parser.add_argument("--force", action="store_true", help="re-render plots even if their data is unchanged")
+    args = parser.parse_args()
+
+    with stage("run_eda"):
+        # every plot gets a small aggregate; reviews are never all in memory
+        backend = get_backend(args.backend)
+        out = lambda name: os.path.join(OUTPUT_DIR, name)
+
+        with stage("views"):
+            jobs = [
+                PlotJob(out("reviews_per_app.png"), "plot_reviews_per_app", backend.view("reviews_per_app")),
+                PlotJob(out("rating_distribution.png"), "plot_rating_distribution", backend.view("rating_distribution")),
+                PlotJob(out("avg_rating_over_time.png"), "plot_avg_rating_over_time", backend.view("avg_rating_over_time")),
+                PlotJob(out("sentiment_distribution.png"), "plot_sentiment_distribution", backend.view("sentiment_distribution")),
+            ]
+
+        # one tokenization pass feeds both the keyword bars and the word cloud
+        with stage("keywords") as kw:
+            stopwords = set(["app","bank","payment","payments","service","mobile","update","please"])
+            keyword_stats = backend.keyword_stats(by=("app", "sentiment"))
+            top_words = keyword_stats.top_terms(n=40, stopwords=stopwords)
+            kw.rows = keyword_stats.docs
+
+        # wordcloud for negative reviews (all apps)
+        negative = [g for g in keyword_stats.groups if g[1] == "negative"]
+        cloud = keyword_stats.frequencies(negative, n=WORDCLOUD_WORDS, stopwords=wordcloud_stopwords())
+        if cloud:
+            jobs.append(PlotJob(out("wordcloud_negative.png"), "plot_wordcloud", cloud))
+
+        # top keywords per app (negative)
+        for app in backend.apps():
+            pairs = top_words.get((app, "negative"), [])
+            if pairs:
+                jobs.append(PlotJob(out(f"top_keywords_negative_{app}.png"), "plot_top_keywords_bar",
+                                    pairs, title=f"Top negative keywords - {app}"))
+
+        # unchanged plots are skipped, the rest render in parallel
+        with stage("render", rows=len(jobs)):
+            render_plots(jobs, workers=args.workers, force=args.force)
 
     print("EDA run complete. Plots saved to:", OUTPUT_DIR)
 
@@ -0,0 +1,68 @@
+# scripts/score_cache.py
+"""
+On-disk cache of per-text scores keyed by a 64-bit hash of the text.
+
+Used by sentiment.py so that re-runs only score new or changed reviews. Each
+cache is one Parquet file of (text_hash int64, <value columns>) rows; the file
+name carries the model/version tag, so changing the scorer starts a fresh cache.
+"""
+import os
+import hashlib
+import numpy as np
+import pandas as pd
+
+def text_hash(text):
+    digest = hashlib.blake2b(str(text).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+def text_hashes(series):
+    """64-bit hashes for a column of texts, as an int64 array."""
+    return np.fromiter((text_hash(t) for t in series), dtype=np.int64, count=len(series))
+
+
+class ScoreCache:
+    """Hash -> score table loaded from and saved back to one Parquet file."""
+
+    def __init__(self, directory, name, columns):
+        self.path = os.path.join(directory, f"{name}.parquet")
+        self.columns = list(columns)
+        self.hits = 0
+        self.misses = 0
+        self._new = []
+        if os.path.exists(self.path):
+            self._table = pd.read_parquet(self.path).set_index("text_hash")
+        else:
+            self._table = pd.DataFrame(columns=self.columns,
+                                       index=pd.Index([], dtype=np.int64, name="text_hash"))
+
+    def __len__(self):
+        return len(self._table)
+
+    def lookup(self, hashes):
+        """
+        Return a DataFrame of cached values aligned to ``hashes`` (NaN where
+        missing) and a boolean mask of the misses. Updates hit/miss counts.
+        """
+        found = self._table.reindex(hashes)
+        missing = found[self.columns[0]].isna().to_numpy()
+        self.misses += int(missing.sum())
+        self.hits += int(len(hashes) - missing.sum())
+        return found.reset_index(drop=True), missing
+
+    def update(self, hashes, values):
+        """Add freshly computed ``values`` (DataFrame with self.columns) for ``hashes``."""
+        new = pd.DataFrame(values, columns=self.columns)
+        new.index = pd.Index(hashes, dtype=np.int64, name="text_hash")
+        self._new.append(new[~new.index.duplicated()])
+
+    def save(self):
+        if not self._new:
+            return
+        parts = [self._table] if len(self._table) else []
+        table = pd.concat(parts + self._new)
+        table = table[~table.index.duplicated(keep="last")]
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        table.reset_index().to_parquet(self.path + ".tmp", index=False)
+        os.replace(self.path + ".tmp", self.path)
+        self._table = table
+        self._new = []
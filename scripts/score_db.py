@@ -0,0 +1,198 @@
+# scripts/score_db.py
+"""
+Score reviews inside PostgreSQL.
+
+Rows of ``reviews`` with no sentiment, or scored by another model than the
+current one (reviews.sentiment_model vs sentiment.CACHE_NAMES), are streamed
+out through a named (server-side) cursor, scored with sentiment.py's engines
+on a process pool and written back in bulk: each fetched batch is COPied into
+a temporary table and applied with one UPDATE ... FROM.
+
+Work is claimed a chunk at a time. Each transaction declares its cursor over
+the next ``claim_rows`` candidates (in review_id order) FOR UPDATE SKIP
+LOCKED, so any number of workers can run at once, each passing over the rows
+another one holds. A chunk's updates and the refresh of the rollup days they
+touched commit together; an interrupted worker only loses its open chunk,
+which the next run picks up.
+"""
+import os
+import io
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import psycopg2
+from psycopg2 import sql
+from db_config import get_db_params
+from create_tables import REVIEW_KEY_DDL, has_rollups, refresh_rollups
+from sentiment import CACHE_DIR, CACHE_NAMES, BATCH_SIZE, label_sentiment, score_texts, scoring_pool
+from score_cache import ScoreCache, text_hashes
+from metrics import stage
+
+CLAIM_ROWS = 100_000  # rows locked per transaction
+FETCH_ROWS = 10_000   # rows per cursor fetch and per UPDATE
+SCORED_TABLE = "reviews_scored"
+
+# the cursor locks rows as they are fetched; rows locked by other workers are skipped
+CLAIM_SQL = """
+SELECT review_id, bank_id, review_text, review_date
+FROM reviews
+WHERE sentiment_model IS DISTINCT FROM %(model)s AND review_id > %(after)s
+ORDER BY review_id
+LIMIT %(limit)s
+FOR UPDATE SKIP LOCKED
+"""
+
+SCORED_DDL = """
+CREATE TEMP TABLE IF NOT EXISTS {scored} (
+    review_id BIGINT,
+    sentiment_label TEXT,
+    sentiment_score FLOAT
+);
+"""
+
+# the id range lets the planner probe the review_id index instead of scanning reviews
+UPDATE_SQL = """
+UPDATE reviews r
+SET sentiment_label = s.sentiment_label, sentiment_score = s.sentiment_score, sentiment_model = %(model)s
+FROM {scored} s
+WHERE r.review_id = s.review_id AND r.review_id BETWEEN %(lo)s AND %(hi)s
+"""
+
+def connect():
+    return psycopg2.connect(**get_db_params())
+
+def score_rows(texts, engine, workers=None, pool=None, cache=None, batch_size=BATCH_SIZE):
+    """Compound scores for ``texts``: cached ones looked up, each distinct new text scored once."""
+    texts = pd.Series(texts, dtype=object).astype(str)
+    hashes = text_hashes(texts)
+    if cache is not None:
+        cached, missing = cache.lookup(hashes)
+        compound = cached["compound"].to_numpy(dtype=float)
+    else:
+        compound = np.full(len(texts), np.nan)
+        missing = np.ones(len(texts), dtype=bool)
+    miss = pd.Series(texts.to_numpy()[missing], index=hashes[missing])
+    miss = miss[~miss.index.duplicated()]
+    scores = pd.Series(score_texts(miss.tolist(), workers, batch_size, engine, pool),
+                       index=miss.index, dtype=float)
+    compound[missing] = scores.reindex(hashes[missing]).to_numpy()
+    if cache is not None:
+        cache.update(scores.index.to_numpy(), {"compound": scores.to_numpy()})
+    return compound
+
+def write_scores(cur, ids, compound, model, scored=SCORED_TABLE):
+    """COPY one batch of scores into the temp table and apply them with a single UPDATE ... FROM."""
+    frame = pd.DataFrame({"review_id": ids, "sentiment_label": label_sentiment(compound),
+                          "sentiment_score": compound})
+    buf = io.StringIO()
+    frame.to_csv(buf, header=False, index=False)
+    buf.seek(0)
+    scored_id = sql.Identifier(scored)
+    cur.copy_expert(sql.SQL("COPY {} (review_id, sentiment_label, sentiment_score) FROM STDIN WITH (FORMAT csv)")
+                    .format(scored_id).as_string(cur), buf)
+    cur.execute(sql.SQL(UPDATE_SQL).format(scored=scored_id),
+                {"model": model, "lo": int(min(ids)), "hi": int(max(ids))})
+    updated = cur.rowcount
+    cur.execute(sql.SQL("TRUNCATE {}").format(scored_id))
+    return updated
+
+def score_chunk(conn, model, engine, after, claim_rows, fetch_rows, workers=None, pool=None, cache=None):
+    """
+    Claim, score and update up to ``claim_rows`` reviews with review_id >
+    ``after`` in one transaction. Returns (rows claimed, last review_id).
+    """
+    claimed, last = 0, after
+    touched = {}  # bank_id -> set of review days updated
+    with conn.cursor(name="score_db_claim") as claim, conn.cursor() as cur:
+        cur.execute(sql.SQL(SCORED_DDL).format(scored=sql.Identifier(SCORED_TABLE)))
+        claim.execute(CLAIM_SQL, {"model": model, "after": after, "limit": claim_rows})
+        while True:
+            with stage("fetch") as fetch:
+                rows = claim.fetchmany(fetch_rows)
+                fetch.rows = len(rows)
+            if not rows:
+                break
+            batch = pd.DataFrame(rows, columns=["review_id", "bank_id", "review_text", "review_date"])
+            with stage("score", rows=len(batch)):
+                compound = score_rows(batch["review_text"], engine, workers, pool, cache)
+            with stage("write", rows=len(batch)):
+                write_scores(cur, batch["review_id"].to_numpy(), compound, model)
+            for bank_id, dates in batch.dropna(subset=["review_date"]).groupby("bank_id")["review_date"]:
+                touched.setdefault(bank_id, set()).update(pd.DatetimeIndex(dates).normalize().date)
+            claimed += len(batch)
+            last = int(batch["review_id"].max())
+        if touched and has_rollups(cur):
+            with stage("rollups"):
+                # one bank at a time, in a fixed order, so workers cannot deadlock
+                for bank_id in sorted(touched):
+                    refresh_rollups(cur, int(bank_id), days=sorted(touched[bank_id]))
+    conn.commit()
+    return claimed, last
+
+def run_worker(engine="vader", workers=None, claim_rows=CLAIM_ROWS, fetch_rows=FETCH_ROWS, limit=None,
+               use_cache=True):
+    """
+    Score every review that lacks a current ``engine`` score, chunk by chunk,
+    until none is left unclaimed (or ``limit`` rows are done). Returns the
+    number of reviews scored by this worker.
+    """
+    model = CACHE_NAMES[engine]
+    cache = ScoreCache(CACHE_DIR, model, ["compound"]) if use_cache else None
+    # one pool for the whole run rather than one per batch
+    pool = scoring_pool(workers) if engine == "vader" and (workers or os.cpu_count() or 1) > 1 else None
+    conn = connect()
+    total, after = 0, 0
+    start = time.perf_counter()
+    try:
+        with conn.cursor() as cur:
+            # tables created before sentiment_model existed; ALTER TABLE would
+            # otherwise queue behind (and block) the other workers' chunks
+            cur.execute("SELECT 1 FROM information_schema.columns "
+                        "WHERE table_name = 'reviews' AND column_name = 'sentiment_model'")
+            if cur.fetchone() is None:
+                cur.execute(REVIEW_KEY_DDL)
+        conn.commit()
+        with stage("score_db") as st:
+            while limit is None or total < limit:
+                want = claim_rows if limit is None else min(claim_rows, limit - total)
+                with stage("chunk") as ch:
+                    claimed, after = score_chunk(conn, model, engine, after, want, fetch_rows, workers, pool, cache)
+                    ch.rows = claimed
+                total += claimed
+                if claimed:
+                    elapsed = time.perf_counter() - start
+                    print(f"{total} reviews scored with {model} "
+                          f"({total / elapsed if elapsed else 0:.0f}/s, up to review_id {after})")
+                if claimed < want:
+                    break  # nothing left that another worker does not hold
+            st.rows = total
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+        if pool is not None:
+            pool.shutdown()
+        if cache is not None:
+            cache.save()
+    if cache is not None:
+        print(f"Cache: {cache.hits} hits, {cache.misses} misses")
+    print(f"Done: {total} reviews scored in {time.perf_counter() - start:.1f}s")
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description="Score unscored or stale reviews in PostgreSQL "
+                                                 "(safe to run several at once).")
+    parser.add_argument("--engine", choices=sorted(CACHE_NAMES), default="vader",
+                        help="scorer; rows tagged with another model are rescored")
+    parser.add_argument("--workers", type=int, default=None, help="scoring processes (default: all cores)")
+    parser.add_argument("--claim-rows", type=int, default=CLAIM_ROWS, help="rows locked per transaction")
+    parser.add_argument("--fetch-rows", type=int, default=FETCH_ROWS, help="rows per fetch and UPDATE")
+    parser.add_argument("--limit", type=int, default=None, help="stop after this many reviews")
+    parser.add_argument("--no-cache", action="store_true", help="score every text, ignoring the score cache")
+    args = parser.parse_args()
+    run_worker(args.engine, args.workers, args.claim_rows, args.fetch_rows, args.limit, not args.no_cache)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+# scripts/scrape_scheduler.py
+"""
+Concurrent multi-app scrape scheduler.
+
+Scrapes every app in the registry (apps.csv by default) on a thread pool using
+scraper.scrape_incremental. Requests are throttled by a token bucket per source
+host, failed page fetches are retried with exponential backoff, and a per-app
+status/throughput report is printed (and saved) at the end of the run.
+"""
+import os
+import time
+import random
+import argparse
+import threading
+import http.client
+from urllib.error import URLError
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pandas as pd
+from config import APPS_FILE, RAW_DATA, load_app_registry, ensure_dir
+from review_sources import GooglePlaySource
+from scraper import scrape_incremental, PAGE_SIZE, FIRST_RUN_PAGES
+
+REPORT_PATH = os.path.join(RAW_DATA, "scrape_report.csv")
+REPORT_COLUMNS = ["app_name", "app_id", "status", "rows", "requests", "retries", "seconds",
+                  "rows_per_sec", "error"]
+
+
+def is_transient(exc):
+    """
+    True for fetch errors worth retrying: network failures and timeouts, HTTP
+    429 and 5xx. google_play_scraper re-raises HTTP errors as its own
+    exceptions, so the chained cause is checked too.
+    """
+    while exc is not None:
+        status = getattr(exc, "code", None) or getattr(exc, "status", None)
+        if isinstance(status, int):
+            return status == 429 or 500 <= status < 600
+        if isinstance(exc, (ConnectionError, TimeoutError, URLError, http.client.HTTPException)):
+            return True
+        if "PlayGatewayError" in str(exc):  # Play's rate-limit response
+            return True
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+class TokenBucket:
+    """Thread-safe token bucket: ``rate`` tokens/sec, bursts up to ``capacity``."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class ThrottledSource:
+    """
+    Wrap a review source with a shared per-host bucket and retry/backoff of
+    transient errors (see is_transient); anything else fails at once.
+
+    Also counts requests and retries so the scheduler can report them per app.
+    """
+
+    def __init__(self, source, bucket, retries=3, backoff=1.0):
+        self.source = source
+        self.host = source.host
+        self.bucket = bucket
+        self.retries = retries
+        self.backoff = backoff
+        self.requests = 0
+        self.retried = 0
+
+    def fetch(self, app_id, count, continuation_token=None):
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            self.requests += 1
+            try:
+                return self.source.fetch(app_id, count, continuation_token)
+            except Exception as e:
+                if attempt >= self.retries or not is_transient(e):
+                    raise
+                # exponential backoff with jitter so workers don't retry in lockstep
+                delay = self.backoff * (2 ** attempt) * (0.5 + random.random())
+                attempt += 1
+                self.retried += 1
+                time.sleep(delay)
+
+
+def _scrape_one(app, source, bucket, retries, backoff, page_size, max_pages, backfill_pages, data_dir):
+    throttled = ThrottledSource(source, bucket, retries=retries, backoff=backoff)
+    status = {"app_name": app["app_name"], "app_id": app["app_id"], "status": "ok",
+              "rows": 0, "requests": 0, "retries": 0, "seconds": 0.0,
+              "rows_per_sec": 0.0, "error": ""}
+    start = time.perf_counter()
+    try:
+        status["rows"] = scrape_incremental(
+            app["app_name"], app["app_id"], source=throttled, page_size=page_size,
+            max_pages=max_pages, backfill_pages=backfill_pages, data_dir=data_dir
+        )
+    except Exception as e:
+        status["status"] = "failed"
+        status["error"] = repr(e)
+    elapsed = time.perf_counter() - start
+    status["requests"] = throttled.requests
+    status["retries"] = throttled.retried
+    status["seconds"] = round(elapsed, 3)
+    status["rows_per_sec"] = round(status["rows"] / elapsed, 1) if elapsed > 0 else 0.0
+    return status
+
+
+def run_scheduler(apps=None, source_factory=GooglePlaySource, workers=8, rate=2.0,
+                  burst=None, retries=3, backoff=1.0, page_size=PAGE_SIZE,
+                  max_pages=None, backfill_pages=0, data_dir=RAW_DATA, report_path=REPORT_PATH):
+    """
+    Scrape ``apps`` (registry rows, default: apps.csv) concurrently.
+
+    ``source_factory`` builds one review source per app; apps whose sources
+    share a ``host`` share one token bucket of ``rate`` requests/sec.
+    Returns the per-app report as a DataFrame.
+    """
+    apps = apps if apps is not None else load_app_registry()
+    buckets = {}
+    jobs = []
+    for app in apps:
+        source = source_factory()
+        bucket = buckets.setdefault(source.host, TokenBucket(rate, burst))
+        jobs.append((app, source, bucket))
+
+    start = time.perf_counter()
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_scrape_one, app, source, bucket, retries, backoff,
+                        page_size, max_pages, backfill_pages, data_dir)
+            for app, source, bucket in jobs
+        ]
+        for fut in as_completed(futures):
+            results.append(fut.result())
+    elapsed = time.perf_counter() - start
+
+    report = pd.DataFrame(results, columns=REPORT_COLUMNS).sort_values("app_name").reset_index(drop=True)
+    if report_path:
+        ensure_dir(os.path.dirname(report_path))
+        report.to_csv(report_path, index=False)
+
+    total_rows = int(report["rows"].sum())
+    failed = int((report["status"] == "failed").sum())
+    print("\n--- Scrape report ---\n")
+    if report.empty:
+        print("No apps to scrape.")
+    else:
+        print(report.drop(columns=["error"]).to_string(index=False))
+    print(f"\n{len(apps)} apps, {failed} failed, {total_rows} rows in {elapsed:.1f}s "
+          f"({total_rows / elapsed if elapsed else 0:.1f} rows/s)")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape many apps concurrently.")
+    parser.add_argument("--apps-file", default=APPS_FILE)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=2.0, help="requests/sec per host")
+    parser.add_argument("--burst", type=float, default=None, help="token bucket capacity")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--backoff", type=float, default=1.0, help="initial backoff seconds")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    parser.add_argument("--max-pages", type=int, default=None,
+                        help=f"pages per app and run (default: {FIRST_RUN_PAGES} on an app's first run, "
+                             "no limit after; 0: no limit)")
+    parser.add_argument("--backfill-pages", type=int, default=0)
+    args = parser.parse_args()
+
+    run_scheduler(
+        apps=load_app_registry(args.apps_file), workers=args.workers, rate=args.rate,
+        burst=args.burst, retries=args.retries, backoff=args.backoff,
+        page_size=args.page_size, max_pages=args.max_pages, backfill_pages=args.backfill_pages
+    )
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,190 @@
 import os
+import json
+import argparse
 import pandas as pd
-from google_play_scraper import Sort, reviews
-
-APPS = {
-    "CBE": "com.combanketh.mobilebanking",
-    "BOA": "com.boa.boaMobileBanking",
-    "Amole": "com.dashen.dashensuperapp",
-}
-
-# Build correct save path
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_DIR = os.path.join(BASE_DIR, "..", "data", "raw")
-os.makedirs(DATA_DIR, exist_ok=True)
-def scrape_reviews(app_name, app_id, count=400):
+from review_sources import GooglePlaySource
+from config import RAW_DATA, load_app_registry, ensure_dir
+
+# app_name -> Google Play app id, from apps.csv
+APPS = {row["app_name"]: row["app_id"] for row in load_app_registry()}
+
+# Raw review CSVs (data/raw, or under CX_DATA_DIR)
+DATA_DIR = RAW_DATA
+
+PAGE_SIZE = 200
+FIRST_RUN_PAGES = 2  # an app's first incremental run fetches this many pages (the old count=400)
+
+def raw_path(app_name, data_dir=DATA_DIR):
+    return os.path.join(data_dir, f"{app_name}_reviews.csv")
+
+def checkpoint_path(app_name, data_dir=DATA_DIR):
+    return os.path.join(data_dir, f"{app_name}_checkpoint.json")
+
+def load_checkpoint(app_name, data_dir=DATA_DIR):
+    """Return the saved scrape state for an app, or None on first run."""
+    path = checkpoint_path(app_name, data_dir)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_checkpoint(app_name, state, data_dir=DATA_DIR):
+    # write-then-rename so an interrupted run never leaves a half-written file
+    ensure_dir(data_dir)
+    path = checkpoint_path(app_name, data_dir)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+def append_raw(app_name, rows, data_dir=DATA_DIR):
+    if not rows:
+        return 0
+    ensure_dir(data_dir)
+    path = raw_path(app_name, data_dir)
+    df = pd.DataFrame(rows)
+    df.to_csv(path, mode="a", header=not os.path.exists(path), index=False, encoding="utf-8")
+    return len(df)
+
+def scrape_reviews(app_name, app_id, count=400, source=None, data_dir=DATA_DIR):
     print(f"\nScraping reviews for {app_name}...")
 
-    result, _ = reviews(
-        app_id,
-        lang="en",
-        country="et",
-        sort=Sort.NEWEST,
-        count=count,
-    )
+    source = source or GooglePlaySource()
+    result, _ = source.fetch(app_id, count)
 
     df = pd.DataFrame(result)
-    file_path = os.path.join(DATA_DIR, f"{app_name}_reviews.csv")
+    ensure_dir(data_dir)
+    file_path = raw_path(app_name, data_dir)
     df.to_csv(file_path, index=False, encoding="utf-8")
     print(f"Saved → {file_path}")
 
+def _state_from_raw(app_name, data_dir=DATA_DIR):
+    # a raw CSV written by a plain (non-incremental) scrape has no checkpoint
+    # yet; seed the newest-seen markers from it so it isn't appended twice
+    path = raw_path(app_name, data_dir)
+    if not os.path.exists(path):
+        return None
+    df = pd.read_csv(path, usecols=["reviewId", "at"], parse_dates=["at"])
+    if df.empty:
+        return None
+    newest = df.loc[df["at"].idxmax()]
+    return {
+        "newest_review_id": newest["reviewId"],
+        "newest_at": newest["at"].isoformat(),
+        "continuation_token": None,
+    }
+
+def _is_seen(review, state):
+    if review.get("reviewId") == state.get("newest_review_id"):
+        return True
+    newest_at = state.get("newest_at")
+    return newest_at is not None and pd.Timestamp(review["at"]) < pd.Timestamp(newest_at)
+
+def _fetch_new(source, app_id, page_size, token, state, max_pages):
+    """
+    Pull pages from ``token`` (None: the newest) until a review already in
+    ``state`` (None: no stop), the end of history or ``max_pages`` pages.
+    Returns (rows, next token, pages fetched, whether the pass finished).
+    """
+    rows, pages = [], 0
+    while True:
+        page, token = source.fetch(app_id, page_size, token)
+        pages += 1
+        for review in page:
+            if state is not None and _is_seen(review, state):
+                return rows, token, pages, True
+            rows.append(review)
+        if token is None:
+            return rows, token, pages, True
+        if max_pages and pages >= max_pages:
+            return rows, token, pages, False
+
+def _markers(review):
+    return {"newest_review_id": review["reviewId"], "newest_at": pd.Timestamp(review["at"]).isoformat()}
+
+def scrape_incremental(app_name, app_id, source=None, page_size=PAGE_SIZE,
+                       max_pages=None, backfill_pages=0, data_dir=DATA_DIR):
+    """
+    Fetch only reviews newer than the last run and append them to the raw CSV.
+
+    Pages are pulled newest first and fetching stops at the first review that
+    was already seen (matching ``newest_review_id`` or older than ``newest_at``).
+    A run fetches at most ``max_pages`` pages (default: FIRST_RUN_PAGES on an
+    app's first run and no limit after; 0 means no limit). When the limit cuts
+    a pass short of the seen reviews, the newest-seen markers stay put and the
+    pass resumes from its saved token on the next run, so the reviews in
+    between are not skipped.
+
+    The continuation token of the oldest page fetched so far is kept in the
+    checkpoint, so ``backfill_pages`` can walk further back into history on
+    later runs. Returns the number of rows appended.
+    """
+    source = source or GooglePlaySource()
+    state = load_checkpoint(app_name, data_dir) or _state_from_raw(app_name, data_dir)
+    first_run = state is None
+    state = state or {"newest_review_id": None, "newest_at": None, "continuation_token": None}
+    if max_pages is None and first_run:
+        max_pages = FIRST_RUN_PAGES
+
+    appended = pages = 0
+    resume = state.get("resume")
+    if resume:
+        # finish the pass an earlier run stopped above the seen reviews
+        rows, token, pages, done = _fetch_new(source, app_id, page_size, resume["token"], state, max_pages)
+        appended += append_raw(app_name, rows, data_dir)
+        if done:
+            state["newest_review_id"] = resume["newest_review_id"]
+            state["newest_at"] = resume["newest_at"]
+            del state["resume"]
+        else:
+            resume["token"] = token
+
+    if not state.get("resume") and not (max_pages and pages >= max_pages):
+        rows, token, n, done = _fetch_new(source, app_id, page_size, None, None if first_run else state,
+                                          max_pages and max_pages - pages)
+        pages += n
+        appended += append_raw(app_name, rows, data_dir)
+        if first_run:
+            # the forward pass walked down from the top, so its last token is
+            # where backfilling should resume
+            state["continuation_token"] = token
+        if rows and (done or first_run):
+            state.update(_markers(rows[0]))
+        elif rows:
+            state["resume"] = dict(_markers(rows[0]), token=token)
+
+    # Backfill older history from the saved continuation token
+    token = state.get("continuation_token")
+    for _ in range(backfill_pages):
+        if token is None:
+            break
+        page, token = source.fetch(app_id, page_size, token)
+        appended += append_raw(app_name, page, data_dir)
+    state["continuation_token"] = token
+
+    save_checkpoint(app_name, state, data_dir)
+    print(f"{app_name}: {appended} new rows in {pages} page(s) → {raw_path(app_name, data_dir)}"
+          + (" (more new reviews left for the next run)" if state.get("resume") else ""))
+    return appended
+
 def main():
+    parser = argparse.ArgumentParser(description="Scrape Google Play reviews.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="append only reviews newer than the last checkpoint")
+    parser.add_argument("--backfill-pages", type=int, default=0,
+                        help="older pages to fetch from the saved continuation token")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    parser.add_argument("--max-pages", type=int, default=None,
+                        help=f"pages per app and run (default: {FIRST_RUN_PAGES} on an app's first run, "
+                             "no limit after; 0: no limit)")
+    args = parser.parse_args()
+
     for app_name, app_id in APPS.items():
-        scrape_reviews(app_name, app_id)
+        if args.incremental:
+            scrape_incremental(app_name, app_id, page_size=args.page_size,
+                               max_pages=args.max_pages, backfill_pages=args.backfill_pages)
+        else:
+            scrape_reviews(app_name, app_id)
 
 if __name__ == "__main__":
     main()
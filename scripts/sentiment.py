@@ -1,24 +1,226 @@
+import os
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from config import PROCESSED_DATA, EXPORT_CSV, NLTK_DATA, ensure_dir
 import pandas as pd
-from nltk.sentiment import SentimentIntensityAnalyzer
-import nltk
-from config import PROCESSED_DATA, SENTIMENT_DATA, APPS
+from storage import load_dataset, save_dataset, dataset_exists, dataset_columns
+from score_cache import ScoreCache, text_hashes
+from dedup import representative_texts
+from metrics import stage
 
-nltk.download("vader_lexicon")
+CACHE_DIR = os.path.join(PROCESSED_DATA, "cache")
+# bump when a scorer changes so stale cached scores are not reused
+CACHE_NAMES = {"vader": "sentiment_vader_v1", "batch": "sentiment_batch_v1"}
+BATCH_SIZE = 2000
+# the batch engine scores whole slices of the corpus per matrix product
+ENGINE_BATCH_SIZE = 200_000
+CHECK_SAMPLE = 20_000  # fanned-out reviews rescored by check_fan_out
 
-def run_sentiment():
-    input_file = f"{PROCESSED_DATA}/cleaned_reviews.csv"
-    df = pd.read_csv(input_file)
+def label_sentiment(compound):
+    """Map compound scores to positive/negative/neutral (±0.05 thresholds)."""
+    compound = np.asarray(compound, dtype=float)
+    return np.select([compound > 0.05, compound < -0.05], ["positive", "negative"], "neutral")
 
-    sia = SentimentIntensityAnalyzer()
-    df["compound"] = df["clean_content"].apply(lambda x: sia.polarity_scores(str(x))["compound"])
+def ensure_vader_lexicon(download=True):
+    """
+    Make sure the VADER lexicon is available without touching the network
+    when it is already cached (in data/nltk_data or any NLTK data path).
+    Only if it is missing everywhere is it downloaded, once, into data/nltk_data.
+    """
+    import nltk
 
-    df["sentiment"] = df["compound"].apply(
-        lambda x: "positive" if x > 0.05 else ("negative" if x < -0.05 else "neutral")
-    )
+    if NLTK_DATA not in nltk.data.path:
+        nltk.data.path.insert(0, NLTK_DATA)
+    try:
+        nltk.data.find("sentiment/vader_lexicon.zip")
+    except LookupError:
+        if not download or not nltk.download("vader_lexicon", download_dir=ensure_dir(NLTK_DATA), quiet=True):
+            raise LookupError(
+                f"VADER lexicon not found; run nltk.download('vader_lexicon', download_dir={NLTK_DATA!r})"
+            )
 
-    df.to_csv(SENTIMENT_DATA, index=False)
-    print(f"Sentiment completed → {SENTIMENT_DATA}")
+def get_analyzer():
+    """Return a SentimentIntensityAnalyzer built from the locally cached lexicon."""
+    ensure_vader_lexicon()
+    from nltk.sentiment import SentimentIntensityAnalyzer
+    return SentimentIntensityAnalyzer()
+
+_sia = None
+
+def _init_worker():
+    global _sia
+    _sia = get_analyzer()
+
+def score_batch(texts):
+    if _sia is None:
+        _init_worker()
+    return [_sia.polarity_scores(str(t))["compound"] for t in texts]
+
+def scoring_pool(workers=None):
+    """A process pool of VADER workers to pass to score_texts across many calls."""
+    ensure_vader_lexicon()
+    return ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1, initializer=_init_worker)
+
+def score_texts(texts, workers=None, batch_size=BATCH_SIZE, engine="vader", pool=None):
+    """
+    Score a list of texts. ``engine="vader"`` runs exact VADER, spreading
+    batches over a process pool (``pool`` if given, else one started for this
+    call); ``engine="batch"`` uses the sparse-matrix lexicon engine in
+    sentiment_batch.py.
+    """
+    if not len(texts):
+        return []  # nothing missed the cache: don't pay for importing nltk
+    if engine == "batch":
+        from sentiment_batch import score_batch as score_matrix
+        return [c for i in range(0, len(texts), ENGINE_BATCH_SIZE)
+                for c in score_matrix(texts[i:i + ENGINE_BATCH_SIZE])]
+    ensure_vader_lexicon()  # once in the parent, so workers never download
+    workers = workers or os.cpu_count() or 1
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    if pool is not None and len(batches) > 1:
+        return [c for scores in pool.map(score_batch, batches) for c in scores]
+    if workers <= 1 or len(batches) <= 1:
+        return [c for batch in batches for c in score_batch(batch)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        return [c for scores in pool.map(score_batch, batches) for c in scores]
+
+def sentiment_keys(texts):
+    """
+    Hash of each text's VADER-relevant words, in order: lexicon terms,
+    negations, boosters and "but". Near-duplicates only share a score when
+    these match, so "not very good app" never takes "very good app"'s.
+    """
+    sia = get_analyzer()
+    c = sia.constants
+    vocab = set(sia.lexicon) | set(c.NEGATE) | set(c.BOOSTER_DICT) | {"but", "least", "never", "without"}
+    codes, distinct = pd.factorize(pd.Series(texts, dtype=object).astype(str))
+    words = [" ".join(w for w in t.split() if w in vocab or "n't" in w) for t in distinct]
+    return text_hashes(words)[codes] if len(words) else np.empty(0, dtype=np.int64)
+
+def check_fan_out(sample=CHECK_SAMPLE, engine="vader", seed=0):
+    """
+    How often copying a cluster representative's score changes a review's
+    label: a sample of the reviews that would take another review's score is
+    scored on its own text too, for plain clusters and for clusters split by
+    sentiment_keys (what run_sentiment uses). Returns the flip rate of the latter.
+    """
+    df = load_dataset(PROCESSED_DATA, "cleaned_reviews", columns=["review_id", "clean_content", "cluster_id"]) \
+        if "cluster_id" in dataset_columns(PROCESSED_DATA, "cleaned_reviews") else None
+    if df is None:
+        print("cleaned_reviews has no cluster_id column: every review is scored on its own")
+        return 0.0
+    own = df["clean_content"].astype(str)
+    rng = np.random.default_rng(seed)
+    rate = 0.0
+    for name, key in (("clusters", None), ("clusters split by sentiment words", sentiment_keys(own))):
+        texts = representative_texts(df, key=key).astype(str)
+        shared = np.flatnonzero((texts != own).to_numpy())
+        total = len(shared)
+        if total > sample:
+            shared = np.sort(rng.choice(shared, sample, replace=False))
+        labels = label_sentiment(score_texts(own.iloc[shared].tolist() + texts.iloc[shared].tolist(),
+                                             engine=engine))
+        flips = int((labels[:len(shared)] != labels[len(shared):]).sum())
+        rate = flips / len(shared) if len(shared) else 0.0
+        print(f"{name}: {total} of {len(df)} reviews take another review's score; "
+              f"{flips} of {len(shared)} checked ({rate:.2%}) would be labelled differently on their own")
+    return rate
+
+def run_sentiment(workers=None, batch_size=BATCH_SIZE, use_cache=True, engine="vader", since=None, dedup=True):
+    """
+    Score cleaned_reviews into sentiment_results. With ``since`` (a timestamp,
+    or "last" for the newest review already scored) only reviews dated at or
+    after it are read and scored, and they replace/extend the existing results
+    by review_id; reviews backfilled with older dates need a full run.
+    With ``dedup`` near-duplicates (same cluster_id, see dedup.py) with the
+    same sentiment words (sentiment_keys) get the score of one of them
+    instead of their own; check_fan_out measures how often that flips a label.
+    """
+    with stage("sentiment") as st:
+        previous = None
+        with stage("load") as load:
+            if since is not None and dataset_exists(PROCESSED_DATA, "sentiment_results"):
+                previous = load_dataset(PROCESSED_DATA, "sentiment_results")
+                if "review_id" not in previous.columns or previous.empty:
+                    previous = None
+                elif since == "last":
+                    since = previous["at"].max()
+            if previous is not None:
+                df = load_dataset(PROCESSED_DATA, "cleaned_reviews", start=since)
+                print(f"Scoring {len(df)} reviews dated from {since}")
+            else:
+                df = load_dataset(PROCESSED_DATA, "cleaned_reviews")
+            load.rows = len(df)
+        start = time.perf_counter()
+
+        with stage("cache_lookup", rows=len(df)):
+            if dedup and "cluster_id" in df.columns:
+                texts = representative_texts(df, key=sentiment_keys(df["clean_content"])).astype(str)
+            else:
+                texts = df["clean_content"].astype(str)
+            hashes = text_hashes(texts)
+            cache = ScoreCache(CACHE_DIR, CACHE_NAMES[engine], ["compound"]) if use_cache else None
+
+            if cache is not None:
+                cached, missing = cache.lookup(hashes)
+                compound = cached["compound"].to_numpy(dtype=float)
+            else:
+                compound = np.full(len(df), np.nan)
+                missing = np.ones(len(df), dtype=bool)
+
+        # score each distinct missing text once
+        miss_hashes, first_idx, inverse = np.unique(hashes[missing], return_index=True, return_inverse=True)
+        miss_texts = texts.to_numpy()[missing][first_idx].tolist()
+        with stage("score", rows=len(miss_texts)):
+            scores = np.asarray(score_texts(miss_texts, workers, batch_size, engine), dtype=float)
+        compound[missing] = scores[inverse] if len(scores) else compound[missing]
+
+        if cache is not None:
+            cache.update(miss_hashes, {"compound": scores})
+            cache.save()
+
+        df["compound"] = compound
+        df["sentiment"] = label_sentiment(compound)
+
+        elapsed = time.perf_counter() - start
+        out = df
+        if previous is not None:
+            kept = previous[~previous["review_id"].isin(df["review_id"])]
+            out = pd.concat([kept, df], ignore_index=True)
+        with stage("save", rows=len(out)):
+            output_path = save_dataset(out, PROCESSED_DATA, "sentiment_results", csv=EXPORT_CSV)
+        st.rows = len(df)
+    print(f"Sentiment completed → {output_path}")
+    if cache is not None:
+        print(f"Cache: {cache.hits} hits, {cache.misses} misses ({len(miss_texts)} texts scored)")
+    if dedup and "cluster_id" in df.columns:
+        print(f"Near-duplicates: {len(df)} reviews in {df['cluster_id'].nunique()} clusters, "
+              f"{texts.nunique()} distinct texts scored or looked up")
+    print(f"Scored {len(df)} reviews in {elapsed:.2f}s ({len(df) / elapsed if elapsed else 0:.0f} reviews/sec)")
+    return out
+
+def main():
+    parser = argparse.ArgumentParser(description="VADER sentiment scoring.")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--no-cache", action="store_true", help="rescore everything")
+    parser.add_argument("--engine", choices=sorted(CACHE_NAMES), default="vader",
+                        help="exact per-review VADER or the batch sparse-matrix engine")
+    parser.add_argument("--since", default=None,
+                        help="only score reviews dated from this timestamp ('last': newest already scored)")
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="score near-duplicates individually instead of once per cluster")
+    parser.add_argument("--check-fan-out", action="store_true",
+                        help="measure how often sharing a cluster's score flips a label and exit")
+    args = parser.parse_args()
+    if args.check_fan_out:
+        check_fan_out(engine=args.engine)
+        return
+    run_sentiment(workers=args.workers, batch_size=args.batch_size,
+                  use_cache=not args.no_cache, engine=args.engine, since=args.since, dedup=not args.no_dedup)
 
 
 if __name__ == "__main__":
-    run_sentiment()
\ No newline at end of file
+    main()
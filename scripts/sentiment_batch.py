@@ -0,0 +1,207 @@
+# scripts/sentiment_batch.py
+"""
+Batch lexicon sentiment engine (vectorized VADER approximation).
+
+Instead of calling ``polarity_scores`` once per review, the whole corpus is
+tokenized once into a sparse document-term matrix whose entries are the
+effective weight of each term occurrence after VADER's heuristics. The
+raw valence of every review is then a single matrix product with the VADER
+lexicon weights, normalized into ``compound`` exactly like VADER does.
+
+Heuristics reproduced (vectorized over all tokens at once): booster/dampener
+words with distance damping, negation within three words, "never so/this",
+"least", the "but" shift, booster words contributing zero and VADER's reuse
+of a token's first-occurrence context for its repeats. Text is assumed
+to be ``clean_content`` (lowercase, no punctuation), so VADER's ALL-CAPS and
+!/? emphasis never apply. Idiom special cases are not reproduced; run
+``python sentiment_batch.py --compare`` for agreement with exact VADER.
+"""
+import time
+import argparse
+from itertools import chain
+import numpy as np
+import scipy.sparse as sp
+from sentiment import get_analyzer
+
+ALPHA = 15  # VADER normalization constant
+SPECIAL = ["but", "least", "never", "so", "this", "at", "very", "kind", "of"]
+
+
+class BatchLexiconScorer:
+    """Holds the lexicon as dense per-term arrays indexed by vocabulary id."""
+
+    def __init__(self, sia=None):
+        sia = sia or get_analyzer()
+        c = sia.constants
+        self.n_scalar = c.N_SCALAR
+        words = set(sia.lexicon) | set(c.NEGATE) | set(c.BOOSTER_DICT) | set(SPECIAL)
+        # id 0 is every out-of-vocabulary token (no weight, no role)
+        self.vocab = {w: i for i, w in enumerate(sorted(words), start=1)}
+        size = len(self.vocab) + 1
+        self.weights = np.zeros(size)
+        self.in_lexicon = np.zeros(size, dtype=bool)
+        self.booster = np.zeros(size)
+        self.negator = np.zeros(size, dtype=bool)
+        for w, i in self.vocab.items():
+            if w in sia.lexicon:
+                self.weights[i] = sia.lexicon[w]
+                self.in_lexicon[i] = True
+            self.booster[i] = c.BOOSTER_DICT.get(w, 0.0)
+            self.negator[i] = w in c.NEGATE or "n't" in w
+        self.ids = {w: self.vocab[w] for w in SPECIAL}
+
+    def tokenize(self, texts):
+        """Return (token ids, CSR indptr) for the corpus; drops 1-char tokens like VADER."""
+        docs = [[w for w in str(t).split() if len(w) > 1] for t in texts]
+        lengths = np.fromiter((len(d) for d in docs), dtype=np.int64, count=len(docs))
+        indptr = np.concatenate([[0], np.cumsum(lengths)])
+        get = self.vocab.get
+        ids = np.fromiter((get(w, 0) for w in chain.from_iterable(docs)),
+                          dtype=np.int64, count=int(indptr[-1]))
+        return ids, indptr
+
+    def term_matrix(self, texts):
+        """
+        Sparse (docs x vocab) matrix of effective term weights: each entry is
+        the heuristic-adjusted valence of the occurrence divided by the term's
+        lexicon weight, summed over repeated occurrences.
+        """
+        ids, indptr = self.tokenize(texts)
+        n_docs = len(indptr) - 1
+        n_tok = len(ids)
+        lengths = np.diff(indptr)
+        doc = np.repeat(np.arange(n_docs), lengths)
+        pos = np.arange(n_tok) - indptr[:-1][doc]
+
+        def prev(k):
+            # id of the token k positions earlier in the same review (0 if none)
+            out = np.zeros(n_tok, dtype=np.int64)
+            if k < n_tok:
+                out[k:] = ids[:-k]
+            out[pos < k] = 0
+            return out
+
+        def nxt():
+            out = np.zeros(n_tok, dtype=np.int64)
+            out[:-1] = ids[1:]
+            out[pos == lengths[doc] - 1] = 0
+            return out
+
+        sid = self.ids
+        p1, p2, p3 = prev(1), prev(2), prev(3)
+        so_this = lambda a: (a == sid["so"]) | (a == sid["this"])
+
+        base = self.weights[ids]
+        is_booster_tok = (self.booster[ids] != 0) | ((ids == sid["kind"]) & (nxt() == sid["of"]))
+        active = self.in_lexicon[ids] & ~is_booster_tok
+        v = base.copy()
+
+        for k, p in enumerate((p1, p2, p3)):
+            cond = active & (pos > k) & ~self.in_lexicon[p]
+            s = self.booster[p] * np.where(v < 0, -1.0, 1.0)
+            s *= (1.0, 0.95, 0.9)[k]
+            v = np.where(cond, v + s, v)
+            if k == 0:
+                factor = np.where(self.negator[p1], self.n_scalar, 1.0)
+            elif k == 1:
+                factor = np.where((p2 == sid["never"]) & so_this(p1), 1.5,
+                                  np.where(self.negator[p2], self.n_scalar, 1.0))
+            else:
+                factor = np.where(((p3 == sid["never"]) & so_this(p2)) | so_this(p1), 1.25,
+                                  np.where(self.negator[p3], self.n_scalar, 1.0))
+            v = np.where(cond, v * factor, v)
+
+        # "least" flips the sign unless preceded by "at"/"very"
+        least = active & (p1 == sid["least"]) & ~self.in_lexicon[p1]
+        least &= (pos == 1) | ((pos > 1) & (p2 != sid["at"]) & (p2 != sid["very"]))
+        v = np.where(least, v * self.n_scalar, v)
+
+        # VADER scores every repeat of a token with the context of its first
+        # occurrence in the review; mirror that before the positional "but" rule
+        _, first, inverse = np.unique(doc * len(self.weights) + ids,
+                                      return_index=True, return_inverse=True)
+        v = v[first][inverse]
+        active = active[first][inverse]
+
+        # "but": halve everything before the first "but", boost everything after
+        but_pos = np.where(ids == sid["but"], pos, np.iinfo(np.int64).max)
+        first_but = np.full(n_docs, np.iinfo(np.int64).max)
+        nonempty = lengths > 0
+        if n_tok:
+            first_but[nonempty] = np.minimum.reduceat(but_pos, indptr[:-1][nonempty])
+        fb = first_but[doc]
+        v = np.where(pos < fb, np.where(fb < np.iinfo(np.int64).max, v * 0.5, v),
+                     np.where(pos > fb, v * 1.5, v))
+
+        v = np.where(active, v, 0.0)
+        coef = np.divide(v, base, out=np.zeros(n_tok), where=base != 0)
+        matrix = sp.csr_matrix((coef, ids, indptr), shape=(n_docs, len(self.weights)))
+        matrix.sum_duplicates()
+        return matrix
+
+    def compound(self, texts):
+        """VADER-style compound score for every text, from one sparse product."""
+        raw = self.term_matrix(texts) @ self.weights
+        scores = np.clip(raw / np.sqrt(raw * raw + ALPHA), -1.0, 1.0)
+        return np.round(scores, 4)
+
+
+_scorer = None
+
+def score_batch(texts):
+    global _scorer
+    if _scorer is None:
+        _scorer = BatchLexiconScorer()
+    return _scorer.compound(texts).tolist()
+
+def compare_with_vader(texts):
+    """Agreement and throughput of the batch engine against exact VADER."""
+    from sentiment import label_sentiment
+
+    texts = [str(t) for t in texts]
+    sia = get_analyzer()
+    start = time.perf_counter()
+    exact = np.array([sia.polarity_scores(t)["compound"] for t in texts])
+    vader_secs = time.perf_counter() - start
+
+    scorer = BatchLexiconScorer(sia)
+    start = time.perf_counter()
+    batch = scorer.compound(texts)
+    batch_secs = time.perf_counter() - start
+
+    exact_labels = label_sentiment(exact)
+    batch_labels = label_sentiment(batch)
+    report = {
+        "reviews": len(texts),
+        "label_accuracy": float((exact_labels == batch_labels).mean()) if texts else 1.0,
+        "compound_exact_match": float((np.abs(exact - batch) < 1e-4).mean()) if texts else 1.0,
+        "compound_mae": float(np.abs(exact - batch).mean()) if texts else 0.0,
+        "vader_reviews_per_sec": len(texts) / vader_secs if vader_secs else 0.0,
+        "batch_reviews_per_sec": len(texts) / batch_secs if batch_secs else 0.0,
+    }
+    for label in ("positive", "negative", "neutral"):
+        mask = exact_labels == label
+        report[f"recall_{label}"] = float((batch_labels[mask] == label).mean()) if mask.any() else None
+    return report
+
+def main():
+    from config import PROCESSED_DATA
+    from storage import load_dataset
+
+    parser = argparse.ArgumentParser(description="Batch lexicon sentiment engine report.")
+    parser.add_argument("--compare", action="store_true",
+                        help="accuracy and throughput vs exact VADER on cleaned_reviews")
+    parser.add_argument("--rows", type=int, default=None, help="limit to the first N reviews")
+    args = parser.parse_args()
+
+    if args.compare:
+        texts = load_dataset(PROCESSED_DATA, "cleaned_reviews", columns=["clean_content"])["clean_content"]
+        if args.rows:
+            texts = texts.head(args.rows)
+        report = compare_with_vader(texts.tolist())
+        print("\n--- Batch engine vs VADER ---\n")
+        for key, value in report.items():
+            print(f"{key:>24}: {value:.4f}" if isinstance(value, float) else f"{key:>24}: {value}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+# scripts/storage.py
+"""
+Columnar (Parquet/Arrow) storage for processed datasets.
+
+Every dataset under data/processed is written as ``<name>.parquet`` with an
+explicit schema (categorical ``app``/``sentiment``, int8 ``score``,
+timestamp ``at``) and rows sorted by app and date, so row-group statistics let
+readers skip everything outside the requested app(s) or date range. CSV stays
+available as an export format next to the Parquet file, and is used as a
+fallback when a dataset has not been written as Parquet yet.
+
+load_reviews reads a compact review frame: the columns follow REVIEW_DTYPES
+(categoricals, int8 score, float32 compound, parsed ``at``) and the free-text
+columns, which dominate memory, are only read when asked for.
+"""
+import os
+import numpy as np
+import pandas as pd
+
+ROW_GROUP_SIZE = 100_000
+MERGE_ROWS = 1_000_000  # rows buffered over all runs while ChunkedDatasetWriter merges
+
+# Fixed Arrow types for the known review columns; anything else is inferred.
+def _field_types():
+    import pyarrow as pa
+    return {
+        "review_id": pa.int64(),
+        "content": pa.string(),
+        "score": pa.int8(),
+        "at": pa.timestamp("us"),
+        "app": pa.dictionary(pa.int32(), pa.string()),  # registries of hundreds of apps
+        "clean_content": pa.string(),
+        "compound": pa.float64(),
+        "sentiment": pa.dictionary(pa.int32(), pa.string()),
+        "topic": pa.int16(),
+        "cluster_id": pa.int64(),
+    }
+
+# In-memory dtype contract of load_reviews (compound is stored as float64,
+# so the VADER thresholds see the exact value; float32 is plenty for analysis).
+REVIEW_DTYPES = {
+    "review_id": "int64",
+    "app": "category",
+    "score": "int8",
+    "at": "datetime64",
+    "compound": "float32",
+    "sentiment": "category",
+    "topic": "int16",
+    "cluster_id": "int64",
+}
+TEXT_COLUMNS = ["content", "clean_content"]
+
+def _base_name(name):
+    for ext in (".csv", ".parquet"):
+        if name.endswith(ext):
+            return name[: -len(ext)]
+    return name
+
+def parquet_path(directory, name):
+    return os.path.join(directory, _base_name(name) + ".parquet")
+
+def csv_path(directory, name):
+    return os.path.join(directory, _base_name(name) + ".csv")
+
+def coerce_types(df):
+    """Apply the dtype contract to a frame (e.g. one read back from CSV)."""
+    df = df.copy()
+    if "at" in df.columns:
+        df["at"] = pd.to_datetime(df["at"], errors="coerce")
+    if "score" in df.columns:
+        df["score"] = pd.to_numeric(df["score"], errors="coerce").astype("Int8")
+    for col in ("app", "sentiment"):
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    return df
+
+def compact_types(df):
+    """Apply REVIEW_DTYPES in place; integer columns with gaps stay nullable."""
+    for col, dtype in REVIEW_DTYPES.items():
+        if col not in df.columns or df[col].dtype == dtype:
+            continue
+        if col == "at":
+            # any resolution will do (Parquet gives us, CSV parsing ns)
+            if not pd.api.types.is_datetime64_any_dtype(df[col]):
+                df[col] = pd.to_datetime(df[col], errors="coerce")
+        elif dtype in ("int8", "int16"):
+            values = pd.to_numeric(df[col], errors="coerce")
+            df[col] = values.astype(dtype.capitalize() if values.isna().any() else dtype)
+        else:
+            df[col] = df[col].astype(dtype)
+    return df
+
+def schema_for(df):
+    import pyarrow as pa
+    types = _field_types()
+    inferred = pa.Schema.from_pandas(df, preserve_index=False)
+    return pa.schema([
+        pa.field(f.name, types.get(f.name, f.type)) for f in inferred
+    ])
+
+def to_table(df, schema=None):
+    import pyarrow as pa
+    df = coerce_types(df)
+    return pa.Table.from_pandas(df, schema=schema or schema_for(df), preserve_index=False)
+
+def _sort_for_stats(df):
+    keys = [c for c in ("app", "at") if c in df.columns]
+    if not keys:
+        return df
+    return df.sort_values(keys, kind="stable").reset_index(drop=True)
+
+def save_dataset(df, directory, name, csv=True, row_group_size=ROW_GROUP_SIZE):
+    """Write ``df`` as <name>.parquet (and <name>.csv when ``csv`` is set)."""
+    import pyarrow.parquet as pq
+    os.makedirs(directory, exist_ok=True)
+    path = parquet_path(directory, name)
+    table = to_table(_sort_for_stats(df))
+    pq.write_table(table, path + ".tmp", row_group_size=row_group_size)
+    os.replace(path + ".tmp", path)
+    if csv:
+        export_csv(df, directory, name)
+    return path
+
+def export_csv(df, directory, name):
+    path = csv_path(directory, name)
+    df.to_csv(path, index=False)
+    return path
+
+def build_filters(apps=None, start=None, end=None, filters=None):
+    """Return pyarrow filter tuples for an app list and [start, end) date range."""
+    out = list(filters or [])
+    if apps is not None:
+        out.append(("app", "in", list(apps)))
+    if start is not None:
+        out.append(("at", ">=", pd.Timestamp(start)))
+    if end is not None:
+        out.append(("at", "<", pd.Timestamp(end)))
+    return out or None
+
+def filter_frame(df, apps=None, start=None, end=None):
+    if apps is not None:
+        df = df[df["app"].isin(list(apps))]
+    if start is not None:
+        df = df[df["at"] >= pd.Timestamp(start)]
+    if end is not None:
+        df = df[df["at"] < pd.Timestamp(end)]
+    return df.reset_index(drop=True)
+
+def dataset_exists(directory, name):
+    return os.path.exists(parquet_path(directory, name)) or os.path.exists(csv_path(directory, name))
+
+def load_dataset(directory, name, columns=None, apps=None, start=None, end=None, filters=None):
+    """
+    Load a processed dataset, reading only ``columns`` and only the row groups
+    that can match ``apps`` / [``start``, ``end``) / extra pyarrow ``filters``.
+    Falls back to <name>.csv (filtered in memory) if no Parquet file exists.
+    """
+    ppath = parquet_path(directory, name)
+    if os.path.exists(ppath):
+        import pyarrow.parquet as pq
+        table = pq.read_table(ppath, columns=columns,
+                              filters=build_filters(apps, start, end, filters))
+        # free each Arrow column as it is converted instead of holding both copies
+        return table.to_pandas(split_blocks=True, self_destruct=True)
+
+    cpath = csv_path(directory, name)
+    if not os.path.exists(cpath):
+        raise FileNotFoundError(f"Missing file: {ppath} (or {cpath})")
+    usecols = None
+    if columns is not None:
+        # filter columns must be read even if they are not projected
+        usecols = list(dict.fromkeys(list(columns) + [
+            c for c, flag in (("app", apps), ("at", start if start is not None else end))
+            if flag is not None
+        ]))
+    # categoricals are built while parsing, not from a column of strings
+    dtype = {c: "category" for c in ("app", "sentiment")}
+    df = coerce_types(pd.read_csv(cpath, usecols=usecols, dtype=dtype))
+    if filters:
+        raise ValueError("Extra pyarrow filters need the Parquet dataset; re-save it first.")
+    df = filter_frame(df, apps, start, end)
+    return df[columns] if columns is not None else df
+
+def dataset_columns(directory, name):
+    """Column names of a processed dataset, without reading its rows."""
+    ppath = parquet_path(directory, name)
+    if os.path.exists(ppath):
+        import pyarrow.parquet as pq
+        return pq.read_schema(ppath).names
+    cpath = csv_path(directory, name)
+    if not os.path.exists(cpath):
+        raise FileNotFoundError(f"Missing file: {ppath} (or {cpath})")
+    return list(pd.read_csv(cpath, nrows=0).columns)
+
+def load_reviews(directory, name, columns=None, text=False, apps=None, start=None, end=None, filters=None):
+    """
+    Load a processed review dataset as a compact frame (REVIEW_DTYPES).
+    ``columns`` defaults to every non-text column; ``text`` adds the text
+    columns (True for all of them, or a list such as ["clean_content"]).
+    """
+    if columns is None:
+        wanted = TEXT_COLUMNS if text is True else list(text or [])
+        columns = [c for c in dataset_columns(directory, name) if c not in TEXT_COLUMNS or c in wanted]
+    df = compact_types(load_dataset(directory, name, columns=columns, apps=apps, start=start, end=end,
+                                    filters=filters))
+    # Parquet dictionaries hold every app/label in the file, not just the rows read
+    for col in df.select_dtypes("category").columns:
+        df[col] = df[col].cat.remove_unused_categories()
+    return df
+
+
+def _at_most(df, keys, bound):
+    """Rows of ``df`` whose ``keys`` tuple is <= ``bound`` (lexicographically)."""
+    le = np.ones(len(df), dtype=bool)
+    for col, value in zip(reversed(keys), reversed(bound)):
+        col = df[col].to_numpy()
+        le = (col < value) | ((col == value) & le)
+    return le
+
+class ChunkedDatasetWriter:
+    """
+    Append DataFrame chunks to one Parquet file (and optionally a CSV export)
+    without holding the full dataset in memory. Each chunk is sorted and
+    spilled as a run; close() merges the runs a block of each at a time, so
+    the file is sorted by app and date across chunks, like save_dataset's.
+    With ``unique`` (a column, e.g. "review_id") the merge is ordered by
+    (app, at, unique) and rows repeating the previous row's (app, at, unique)
+    are dropped (the first one written is kept). ``rows`` is the number of rows in the
+    file once closed. Files are written under a temp name and renamed on close.
+    """
+
+    def __init__(self, directory, name, csv=True, unique=None, merge_rows=MERGE_ROWS):
+        self.directory = directory
+        self.name = name
+        self.csv = csv
+        self.unique = unique
+        self.merge_rows = merge_rows
+        self.rows = 0
+        self._schema = None
+        self._runs = []
+        self._ppath = parquet_path(directory, name)
+        self._cpath = csv_path(directory, name)
+        self._run_dir = self._ppath + ".runs"
+        os.makedirs(directory, exist_ok=True)
+        self._cleanup()
+        for path in (self._ppath + ".tmp", self._cpath + ".tmp"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _cleanup(self):
+        import shutil
+        shutil.rmtree(self._run_dir, ignore_errors=True)
+
+    def _with_keys(self, df):
+        # sort keys as plain numpy values, identical for runs and the merge:
+        # missing apps and dates sort last, as in sort_values
+        app = df["app"].astype(object) if "app" in df.columns else pd.Series("", index=df.index)
+        keys = {"_k_app": app.where(app.notna(), "\U0010ffff").astype(str).to_numpy(dtype=object)}
+        if "at" in df.columns:
+            keys["_k_at"] = df["at"].to_numpy("datetime64[ns]").view("int64").copy()
+            keys["_k_at"][pd.isna(df["at"]).to_numpy()] = np.iinfo(np.int64).max
+        if self.unique:
+            keys["_k_unique"] = df[self.unique].to_numpy()
+        return df.assign(**keys)
+
+    def _key_columns(self, df):
+        return [c for c in ("_k_app", "_k_at", "_k_unique", "_k_seq") if c in df.columns]
+
+    def write(self, df):
+        import pyarrow.parquet as pq
+        if df.empty:
+            return
+        df = coerce_types(df)
+        if self._schema is None:
+            self._schema = schema_for(df)
+            os.makedirs(self._run_dir)
+        df = self._with_keys(df)
+        df = df.sort_values(self._key_columns(df), kind="stable")
+        path = os.path.join(self._run_dir, f"run-{len(self._runs):06d}.parquet")
+        pq.write_table(to_table(df.drop(columns=self._key_columns(df)), self._schema), path,
+                       row_group_size=ROW_GROUP_SIZE)
+        self._runs.append(path)
+
+    def _merge(self, emit):
+        """k-way merge of the sorted runs; ``emit`` gets sorted blocks in order."""
+        import pyarrow.parquet as pq
+        batch_rows = max(1_000, self.merge_rows // len(self._runs))
+        sources = [pq.ParquetFile(p).iter_batches(batch_size=batch_rows) for p in self._runs]
+        buffers = [None] * len(sources)
+        read = [0] * len(sources)
+        last = None  # (app, at, unique) of the last row emitted
+        while True:
+            for i, source in enumerate(sources):
+                if source is not None and (buffers[i] is None or buffers[i].empty):
+                    batch = next(source, None)
+                    if batch is None:
+                        sources[i], buffers[i] = None, None
+                        continue
+                    # (run, row) as the last key keeps equal keys in the order written
+                    seq = (i << 40) + read[i] + np.arange(batch.num_rows, dtype=np.int64)
+                    buffers[i] = self._with_keys(batch.to_pandas()).assign(_k_seq=seq)
+                    read[i] += batch.num_rows
+            active = [b for b in buffers if b is not None and not b.empty]
+            if not active:
+                break
+            keys = self._key_columns(active[0])
+            # every buffered row up to the smallest buffer tail can go out now
+            bound = min(tuple(b[keys].iloc[-1]) for b in active)
+            parts = []
+            for i, b in enumerate(buffers):
+                if b is None or b.empty:
+                    continue
+                n = int(_at_most(b, keys, bound).sum())  # a prefix: the buffer is sorted
+                parts.append(b.iloc[:n])
+                buffers[i] = b.iloc[n:]
+            block = pd.concat(parts, ignore_index=True).sort_values(keys, kind="stable")
+            if self.unique and len(block):
+                dup_keys = keys[:-1]  # all but _k_seq
+                repeat = np.ones(len(block), dtype=bool)
+                repeat[0] = last is not None
+                for j, col in enumerate(dup_keys):
+                    values = block[col].to_numpy()
+                    repeat[1:] &= values[1:] == values[:-1]
+                    repeat[0] &= last is not None and values[0] == last[j]
+                new_last = tuple(block[dup_keys].iloc[-1])
+                block = block[~repeat]
+                last = new_last
+            emit(block.drop(columns=keys))
+
+    def close(self):
+        import pyarrow.parquet as pq
+        if self._schema is None:
+            return
+        writer = pq.ParquetWriter(self._ppath + ".tmp", self._schema)
+        pending = []
+
+        def flush():
+            if not pending:
+                return
+            df = pd.concat(pending, ignore_index=True)
+            pending.clear()
+            writer.write_table(to_table(df, self._schema), row_group_size=ROW_GROUP_SIZE)
+            if self.csv:
+                df.to_csv(self._cpath + ".tmp", mode="a", header=(self.rows == 0), index=False)
+            self.rows += len(df)
+
+        def emit(block):
+            pending.append(block)
+            if sum(len(p) for p in pending) >= ROW_GROUP_SIZE:
+                flush()
+
+        try:
+            self._merge(emit)
+            flush()
+        finally:
+            writer.close()
+            self._cleanup()
+        os.replace(self._ppath + ".tmp", self._ppath)
+        if self.csv:
+            os.replace(self._cpath + ".tmp", self._cpath)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._cleanup()
@@ -8,100 +8,120 @@ sys.path.append(PROJECT_ROOT)
 
 import os
 import pandas as pd
-from scripts.config import PROCESSED_DATA
-from scripts.eda_helpers import (
-    merge_sentiment_and_cleaned,
-    top_n_words,
-    plot_reviews_per_app,
-    plot_rating_distribution,
-    plot_sentiment_distribution,
-    plot_wordcloud_from_text,
-    plot_top_keywords_bar,
-    save_plot
-)
-
-# -----------------------------
-# Step 1: Load Data
-# -----------------------------
-cleaned_path = os.path.join(PROCESSED_DATA, "cleaned_reviews.csv")
-sentiment_path = os.path.join(PROCESSED_DATA, "sentiment_results.csv")
-
-if not os.path.exists(cleaned_path) or not os.path.exists(sentiment_path):
-    raise FileNotFoundError("Cleaned reviews or sentiment file missing!")
-
-cleaned = pd.read_csv(cleaned_path)
-sentiment = pd.read_csv(sentiment_path)
-
-merged = merge_sentiment_and_cleaned(cleaned, sentiment)
-
-# -----------------------------
-# Step 2: Separate by sentiment
-# -----------------------------
-positive = merged[merged["sentiment"]=="positive"]
-negative = merged[merged["sentiment"]=="negative"]
-
-stopwords = set([
-    "app","bank","payment","payments","service","mobile","update","please",
-    "cbe","bankofabyssinia","boa","amole"
-])
-
-# -----------------------------
-# Step 3: Insights - Drivers & Pain Points
-# -----------------------------
-insights = {}
-for bank in merged['app'].unique():
-    pos_words = top_n_words(positive[positive['app']==bank]['clean_content'], n=10, stopwords=stopwords)
-    neg_words = top_n_words(negative[negative['app']==bank]['clean_content'], n=10, stopwords=stopwords)
-    insights[bank] = {"drivers": pos_words, "pain_points": neg_words}
-
-# -----------------------------
-# Step 4: Visualization
-# -----------------------------
-OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "reports", "task4_plots")
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-# 1. Sentiment distribution per bank
-plot_sentiment_distribution(merged, save_path=os.path.join(OUTPUT_DIR, "sentiment_distribution.png"))
-
-# 2. Rating distribution per bank
-plot_rating_distribution(merged, save_path=os.path.join(OUTPUT_DIR, "rating_distribution.png"))
-
-# 3. WordCloud & Top Keywords for Negative Reviews
-for bank in merged['app'].unique():
-    neg_reviews = negative[negative['app']==bank]
-    if not neg_reviews.empty:
-        # WordCloud
-        plot_wordcloud_from_text(neg_reviews["clean_content"], save_path=os.path.join(OUTPUT_DIR, f"wordcloud_negative_{bank}.png"))
-        # Top keywords bar chart
-        pairs = top_n_words(neg_reviews['clean_content'], n=20, stopwords=stopwords)
-        if pairs:
-            plot_top_keywords_bar(
-                pairs, 
-                title=f"Top negative keywords - {bank}",
-                save_path=os.path.join(OUTPUT_DIR, f"top_keywords_negative_{bank}.png")
-            )
-
-# -----------------------------
-# Step 5: Generate Summary Table
-# -----------------------------
-summary = []
-for bank, data in insights.items():
-    driver_list = [w for w, c in data['drivers'][:3]]
-    pain_list = [w for w, c in data['pain_points'][:3]]
-    summary.append({
-        "Bank": bank,
-        "Top Drivers (Positive)": ", ".join(driver_list),
-        "Top Pain Points (Negative)": ", ".join(pain_list)
-    })
-
-summary_df = pd.DataFrame(summary)
-summary_path = os.path.join(PROCESSED_DATA, "task4_insights_summary.csv")
-summary_df.to_csv(summary_path, index=False)
-
-# -----------------------------
-# Step 6: Print Summary for Report
-# -----------------------------
-print("\n--- Task 4 Insights Summary ---\n")
-print(summary_df.to_string(index=False))
-print(f"\nPlots saved in: {OUTPUT_DIR}")
-print(f"Summary CSV saved in: {summary_path}")
\ No newline at end of file
+from config import PROCESSED_DATA, TASK4_PLOTS
+from eda_helpers import WORDCLOUD_WORDS, TASK4_STOPWORDS, wordcloud_stopwords
+from eda_queries import get_backend
+from plot_render import PlotJob, render_plots
+from metrics import stage
+from storage import parquet_path
+from trends import run_trends, print_spikes, TRENDS_PATH
+
+OUTPUT_DIR = TASK4_PLOTS
+
+def main():
+    # -----------------------------
+    # Step 1: Data access
+    # -----------------------------
+    # Aggregates are pushed down to the backend (CX_EDA_BACKEND: parquet files or
+    # the postgres rollups), so reviews are never loaded all at once.
+    backend = get_backend()
+    apps = backend.apps()
+
+    # -----------------------------
+    # Step 2: Stopwords
+    # -----------------------------
+    stopwords = set(TASK4_STOPWORDS)
+
+    # -----------------------------
+    # Step 3: Insights - Drivers & Pain Points
+    # -----------------------------
+    # one tokenization pass over all reviews, counted per (app, sentiment)
+    with stage("task4.keywords") as kw:
+        keyword_stats = backend.keyword_stats(by=("app", "sentiment"))
+        top_words = keyword_stats.top_terms(n=20, stopwords=stopwords)
+        kw.rows = keyword_stats.docs
+
+    insights = {}
+    for bank in apps:
+        pos_words = top_words.get((bank, "positive"), [])[:10]
+        neg_words = top_words.get((bank, "negative"), [])[:10]
+        insights[bank] = {"drivers": pos_words, "pain_points": neg_words}
+
+    # -----------------------------
+    # Step 4: Visualization
+    # -----------------------------
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    # 1. Sentiment distribution per bank
+    # 2. Rating distribution per bank
+    with stage("task4.views"):
+        plot_jobs = [
+            PlotJob(os.path.join(OUTPUT_DIR, "sentiment_distribution.png"), "plot_sentiment_distribution",
+                    backend.view("sentiment_distribution")),
+            PlotJob(os.path.join(OUTPUT_DIR, "rating_distribution.png"), "plot_rating_distribution",
+                    backend.view("rating_distribution")),
+        ]
+
+    # 3. WordCloud & Top Keywords for Negative Reviews
+    # word clouds use the same keyword counts as the bar charts (no text is re-read)
+    cloud_stopwords = wordcloud_stopwords()
+    for bank in apps:
+        cloud = keyword_stats.frequencies([(bank, "negative")], n=WORDCLOUD_WORDS, stopwords=cloud_stopwords)
+        if cloud:
+            # WordCloud
+            plot_jobs.append(PlotJob(os.path.join(OUTPUT_DIR, f"wordcloud_negative_{bank}.png"),
+                                     "plot_wordcloud", cloud))
+            # Top keywords bar chart
+            pairs = top_words.get((bank, "negative"), [])
+            if pairs:
+                plot_jobs.append(PlotJob(
+                    os.path.join(OUTPUT_DIR, f"top_keywords_negative_{bank}.png"),
+                    "plot_top_keywords_bar",
+                    pairs,
+                    title=f"Top negative keywords - {bank}"
+                ))
+
+    # unchanged plots are skipped (fingerprint stored in each PNG), the rest
+    # render in parallel with the Agg backend; CX_PLOT_WORKERS sets the pool size
+    with stage("task4.render", rows=len(plot_jobs)):
+        render_plots(plot_jobs)
+
+    # -----------------------------
+    # Step 5: Generate Summary Table
+    # -----------------------------
+    summary = []
+    for bank, data in insights.items():
+        driver_list = [w for w, c in data['drivers'][:3]]
+        pain_list = [w for w, c in data['pain_points'][:3]]
+        summary.append({
+            "Bank": bank,
+            "Top Drivers (Positive)": ", ".join(driver_list),
+            "Top Pain Points (Negative)": ", ".join(pain_list)
+        })
+
+    summary_df = pd.DataFrame(summary)
+    summary_path = os.path.join(PROCESSED_DATA, "task4_insights_summary.csv")
+    summary_df.to_csv(summary_path, index=False)
+
+    # -----------------------------
+    # Step 6: Print Summary for Report
+    # -----------------------------
+    print("\n--- Task 4 Insights Summary ---\n")
+    print(summary_df.to_string(index=False))
+    print(f"\nPlots saved in: {OUTPUT_DIR}")
+    print(f"Summary CSV saved in: {summary_path}")
+
+    # -----------------------------
+    # Step 7: Keyword spikes in negative reviews
+    # -----------------------------
+    # streamed week by week from the Parquet dataset (fixed-size sketches per app),
+    # so it runs whichever backend served the aggregates above
+    if os.path.exists(parquet_path(PROCESSED_DATA, "sentiment_results")):
+        with stage("task4.trends") as tr:
+            trends = run_trends(apps, sentiment="negative", stopwords=stopwords)
+            tr.rows = len(trends)
+        print_spikes(trends)
+        print(f"Keyword trends saved in: {TRENDS_PATH}")
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,260 @@
 """
 topics.py
 Topic modeling using LDA for clean review text.
-"""
 
-import pandas as pd
+Batch mode (default) refits the vectorizer and LDA on the whole corpus.
+Online mode (--online) keeps the fitted vectorizer and an online-LDA model
+under data/processed/models and, on later runs, only transforms and
+partial_fits the reviews that are not in topic_results yet. Each update
+reports the new reviews' perplexity against the baseline measured at the
+last full fit, the share of their words outside the frozen vocabulary and
+the model's UMass coherence, and warns when a full refit (--refit) is due.
+
+Near-duplicate reviews (same cluster_id, see dedup.py) are modelled as one
+document and share its topic, unless --no-dedup is given.
+"""
+import os
+import json
+import time
+import argparse
+import numpy as np
 from sklearn.feature_extraction.text import CountVectorizer
 from sklearn.decomposition import LatentDirichletAllocation
-from config import PROCESSED_DATA, TOPIC_DATA
+from config import PROCESSED_DATA, EXPORT_CSV, ensure_dir
+from storage import load_dataset, save_dataset, dataset_exists
+from dedup import representative_texts, cluster_heads, fan_out
+from metrics import stage
 
-def run_topic_modeling(num_topics=5):
-    input_file = f"{PROCESSED_DATA}/cleaned_reviews.csv"
-    df = pd.read_csv(input_file)
+MODEL_DIR = os.path.join(PROCESSED_DATA, "models")
+MODEL_PATH = os.path.join(MODEL_DIR, "topic_model.joblib")
+STATE_PATH = os.path.join(MODEL_DIR, "topic_model.json")
 
-    text_data = df["clean_content"].astype(str)
+CHUNK_SIZE = 20_000       # reviews per partial_fit call
+EVAL_SAMPLE = 20_000      # reviews used for the baseline perplexity
+MAX_PERPLEXITY_RATIO = 1.25
+MAX_OOV_RATE = 0.20
 
-    vectorizer = CountVectorizer(
+def make_vectorizer():
+    return CountVectorizer(
         max_features=3000,
         stop_words="english"
     )
-    X = vectorizer.fit_transform(text_data)
 
+def run_topic_modeling(num_topics=5, n_jobs=None, dedup=True):
+    with stage("topics") as st:
+        with stage("load") as load:
+            df = load_dataset(PROCESSED_DATA, "cleaned_reviews")
+            load.rows = len(df)
+
+        # one document per near-duplicate cluster
+        heads = cluster_heads(df) if dedup else np.ones(len(df), dtype=bool)
+        text_data = (representative_texts(df) if dedup else df["clean_content"])[heads].astype(str)
+
+        with stage("vectorize", rows=len(text_data)):
+            vectorizer = make_vectorizer()
+            X = vectorizer.fit_transform(text_data)
+
+        lda = LatentDirichletAllocation(
+            n_components=num_topics,
+            learning_method="batch",
+            random_state=42,
+            n_jobs=n_jobs
+        )
+
+        with stage("fit", rows=len(text_data)):
+            lda_matrix = lda.fit_transform(X)
+        df["topic"] = fan_out(df, heads, lda_matrix.argmax(axis=1)) if dedup else lda_matrix.argmax(axis=1)
+
+        with stage("save", rows=len(df)):
+            output_path = save_dataset(df, PROCESSED_DATA, "topic_results", csv=EXPORT_CSV)
+        st.rows = len(df)
+    print(f"Topics extracted → {output_path}")
+
+def umass_coherence(lda, X, top_n=10):
+    """
+    UMass coherence of each topic's ``top_n`` words over documents ``X``,
+    averaged per word pair and over topics (closer to 0 is more coherent).
+    """
+    present = (X > 0).tocsc().astype(np.float64)
+    scores = []
+    for weights in lda.components_:
+        top = np.argsort(weights)[::-1][:top_n]
+        sub = present[:, top]
+        co = (sub.T @ sub).toarray()  # co[i, j] = docs containing both words
+        doc_freq = np.diag(co)
+        pairs = [(i, j) for i in range(1, len(top)) for j in range(i) if doc_freq[j] > 0]
+        if pairs:
+            scores.append(np.mean([np.log((co[i, j] + 1) / doc_freq[j]) for i, j in pairs]))
+    return float(np.mean(scores))
+
+def oov_rate(vectorizer, texts):
+    """Share of analyzed words (after stopwords) missing from the vocabulary."""
+    analyze = vectorizer.build_analyzer()
+    vocab = vectorizer.vocabulary_
+    total = missing = 0
+    for text in texts:
+        words = analyze(text)
+        total += len(words)
+        missing += sum(1 for w in words if w not in vocab)
+    return missing / total if total else 0.0
+
+def model_health(vectorizer, lda, texts, X=None):
+    X = vectorizer.transform(texts) if X is None else X
+    return {
+        "perplexity": float(lda.perplexity(X)),
+        "oov_rate": oov_rate(vectorizer, texts),
+        "coherence": umass_coherence(lda, X),
+    }
+
+def load_model(path=MODEL_PATH):
+    """Return (vectorizer, lda, state) or None if no model has been saved."""
+    if not os.path.exists(path):
+        return None
+    import joblib
+    bundle = joblib.load(path)
+    return bundle["vectorizer"], bundle["lda"], bundle["state"]
+
+def save_model(vectorizer, lda, state, path=MODEL_PATH):
+    import joblib
+    ensure_dir(os.path.dirname(path))
+    joblib.dump({"vectorizer": vectorizer, "lda": lda, "state": state}, path + ".tmp")
+    os.replace(path + ".tmp", path)
+    # readable copy of the fit/update history
+    with open(STATE_PATH, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+
+def fit_online_model(texts, num_topics=5, chunk_size=CHUNK_SIZE, n_jobs=None):
+    """Full fit: new vocabulary and an online-LDA model over all ``texts``."""
+    vectorizer = make_vectorizer()
+    X = vectorizer.fit_transform(texts)
     lda = LatentDirichletAllocation(
         n_components=num_topics,
-        learning_method="batch",
-        random_state=42
+        learning_method="online",
+        batch_size=min(chunk_size, max(X.shape[0], 1)),
+        total_samples=X.shape[0],
+        random_state=42,
+        n_jobs=n_jobs
     )
+    lda.fit(X)
+    sample = texts[:EVAL_SAMPLE]
+    health = model_health(vectorizer, lda, sample, X[:EVAL_SAMPLE])
+    state = {
+        "num_topics": num_topics,
+        "docs_seen": int(X.shape[0]),
+        "fitted_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "baseline": health,
+        "updates": [],
+    }
+    return vectorizer, lda, state, lda.transform(X).argmax(axis=1)
 
-    lda_matrix = lda.fit_transform(X)
-    df["topic"] = lda_matrix.argmax(axis=1)
+def update_online_model(vectorizer, lda, state, texts, chunk_size=CHUNK_SIZE, n_jobs=None):
+    """
+    partial_fit the model on new ``texts`` (vocabulary stays fixed) and return
+    their topics. The health of the new texts is measured before the update.
+    """
+    X = vectorizer.transform(texts)
+    health = model_health(vectorizer, lda, texts, X)
+    lda.n_jobs = n_jobs
+    lda.total_samples = state["docs_seen"] + X.shape[0]
+    for start in range(0, X.shape[0], chunk_size):
+        lda.partial_fit(X[start:start + chunk_size])
+    state["docs_seen"] += int(X.shape[0])
+    state["updates"].append({"at": time.strftime("%Y-%m-%d %H:%M:%S"), "docs": int(X.shape[0]), **health})
+    return lda.transform(X).argmax(axis=1), health
 
-    df.to_csv(TOPIC_DATA, index=False)
-    print(f"Topics extracted → {TOPIC_DATA}")
+def refit_reasons(state, health, max_ratio=MAX_PERPLEXITY_RATIO, max_oov=MAX_OOV_RATE):
+    reasons = []
+    ratio = health["perplexity"] / state["baseline"]["perplexity"]
+    if ratio > max_ratio:
+        reasons.append(f"perplexity {ratio:.2f}x the baseline")
+    if health["oov_rate"] > max_oov:
+        reasons.append(f"{health['oov_rate']:.0%} of words outside the vocabulary")
+    return reasons
 
+def run_online_topics(num_topics=5, refit=False, chunk_size=CHUNK_SIZE, n_jobs=None,
+                      max_ratio=MAX_PERPLEXITY_RATIO, max_oov=MAX_OOV_RATE, dedup=True):
+    """
+    Assign topics with the persisted online model, fitting it only on reviews
+    that have no topic yet (new near-duplicates of reviews that have one take
+    it over). Falls back to a full fit when there is no saved model, the
+    topic count changed, ``refit`` is set or topic_results has no review_id
+    to match on.
+    """
+    start = time.perf_counter()
+    with stage("topics") as st:
+        with stage("load") as load:
+            df = load_dataset(PROCESSED_DATA, "cleaned_reviews")
+            dedup = dedup and "cluster_id" in df.columns
+            texts = (representative_texts(df) if dedup else df["clean_content"]).astype(str)
+            heads = cluster_heads(df) if dedup else np.ones(len(df), dtype=bool)
+            model = load_model()
 
-if __name__ == "__main__":
-    run_topic_modeling()
+            previous = None
+            if model is not None and not refit and dataset_exists(PROCESSED_DATA, "topic_results"):
+                previous = load_dataset(PROCESSED_DATA, "topic_results")
+                previous = previous[["review_id", "topic"]] if "review_id" in previous.columns else None
+            load.rows = len(df)
+
+        if previous is None or model[2]["num_topics"] != num_topics or "review_id" not in df.columns:
+            with stage("fit", rows=int(heads.sum())):
+                vectorizer, lda, state, topics = fit_online_model(texts[heads].tolist(), num_topics,
+                                                                  chunk_size, n_jobs)
+            df["topic"] = fan_out(df, heads, topics)
+            base = state["baseline"]
+            print(f"Full fit on {len(df)} reviews ({int(heads.sum())} documents): "
+                  f"perplexity {base['perplexity']:.1f}, coherence {base['coherence']:.2f}")
+        else:
+            vectorizer, lda, state = model
+            known = previous.drop_duplicates("review_id").set_index("review_id")["topic"]
+            df["topic"] = df["review_id"].map(known)
+            if dedup:
+                seen = df[df["topic"].notna()].drop_duplicates("cluster_id").set_index("cluster_id")["topic"]
+                df["topic"] = df["topic"].fillna(df["cluster_id"].map(seen))
+            new = df["topic"].isna().to_numpy()
+            print(f"{int(new.sum())} new reviews, {int((~new).sum())} already have topics")
+            if new.any():
+                fit = new & heads
+                with stage("update", rows=int(fit.sum())):
+                    topics, health = update_online_model(vectorizer, lda, state, texts[fit].tolist(),
+                                                         chunk_size, n_jobs)
+                df.loc[new, "topic"] = fan_out(df[new], fit[new], topics)
+                print(f"New reviews: perplexity {health['perplexity']:.1f} "
+                      f"(baseline {state['baseline']['perplexity']:.1f}), "
+                      f"OOV {health['oov_rate']:.1%}, coherence {health['coherence']:.2f}")
+                reasons = refit_reasons(state, health, max_ratio, max_oov)
+                if reasons:
+                    print("⚠️ Topic model is drifting (" + "; ".join(reasons) + "); run with --refit")
+            df["topic"] = df["topic"].astype(int)
+
+        with stage("save", rows=len(df)):
+            save_model(vectorizer, lda, state)
+            output_path = save_dataset(df, PROCESSED_DATA, "topic_results", csv=EXPORT_CSV)
+        st.rows = len(df)
+    print(f"Topics extracted → {output_path} ({time.perf_counter() - start:.1f}s)")
+    return df
+
+def main():
+    parser = argparse.ArgumentParser(description="LDA topic modeling of cleaned reviews.")
+    parser.add_argument("--topics", type=int, default=5)
+    parser.add_argument("--online", action="store_true",
+                        help="update the saved online model with new reviews only")
+    parser.add_argument("--refit", action="store_true",
+                        help="with --online: refit vocabulary and model on all reviews")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--jobs", type=int, default=None, help="cores for LDA fitting (-1: all)")
+    parser.add_argument("--max-perplexity-ratio", type=float, default=MAX_PERPLEXITY_RATIO)
+    parser.add_argument("--max-oov", type=float, default=MAX_OOV_RATE)
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="model near-duplicates as separate documents")
+    args = parser.parse_args()
+
+    if args.online:
+        run_online_topics(args.topics, refit=args.refit, chunk_size=args.chunk_size, n_jobs=args.jobs,
+                          max_ratio=args.max_perplexity_ratio, max_oov=args.max_oov, dedup=not args.no_dedup)
+    else:
+        run_topic_modeling(args.topics, n_jobs=args.jobs, dedup=not args.no_dedup)
     print("Topic modeling completed.")
+
+
+if __name__ == "__main__":
+    main()
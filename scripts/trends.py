@@ -0,0 +1,314 @@
+# scripts/trends.py
+"""
+Streaming keyword trends and spike detection.
+
+Reviews are consumed in time order, one window (default: a week) at a time.
+For every stream (one per app) KeywordTrends keeps, in fixed memory:
+
+- a count-min sketch of how many of the current window's reviews use each
+  term (a review counts a term once),
+- the sketches of the last ``baseline_windows`` closed windows, and
+- the window's ``top_k`` heavy hitters: candidate terms re-estimated from
+  the sketch after every batch, so only k term strings are ever kept.
+
+When a window closes, each heavy hitter's share of the window's reviews is
+compared with its share over the baseline windows. A term is flagged as a
+spike when it appears in at least ``min_count`` reviews, at least
+``min_ratio`` times the expected count, and ``min_z`` standard deviations
+(Poisson) above it. Sketch size depends on width x depth, never on history.
+
+run_trends streams each app's rows of the processed dataset (stored sorted
+by app and date; an unsorted app is first sorted on disk) in one pass and
+writes every window's heavy hitters, with the spike flag, to
+data/processed/task4_keyword_trends.csv.
+"""
+import os
+import sys
+import argparse
+from collections import deque
+import numpy as np
+import pandas as pd
+
+# the scripts import each other flat (from config import ...); this keeps that
+# working when the module is imported as scripts.<name> (notebooks, python -m)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import PROCESSED_DATA
+from keywords import MIN_LEN, BOUNDARY
+from score_cache import text_hashes
+
+TRENDS_PATH = os.path.join(PROCESSED_DATA, "task4_keyword_trends.csv")
+FREQ = "W"              # pandas period alias of a window
+BASELINE_WINDOWS = 4
+TOP_K = 30
+SKETCH_WIDTH = 2**14    # counters per row (power of two)
+SKETCH_DEPTH = 4        # rows; estimates are the minimum over rows
+MIN_COUNT = 5
+MIN_RATIO = 2.0
+MIN_Z = 3.0
+
+TREND_COLUMNS = ["app", "window_start", "reviews", "term", "count", "share", "baseline_share",
+                 "expected", "ratio", "z", "spike"]
+
+
+class CountMinSketch:
+    """Count-min sketch over 64-bit term hashes (multiply-shift row hashes)."""
+
+    def __init__(self, width=SKETCH_WIDTH, depth=SKETCH_DEPTH, seed=0):
+        if width & (width - 1):
+            raise ValueError("width must be a power of two")
+        rng = np.random.default_rng(seed)
+        self.shift = np.uint64(64 - int(width).bit_length() + 1)
+        self.a = rng.integers(0, 2**63, depth, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.b = rng.integers(0, 2**63, depth, dtype=np.uint64)
+        self.table = np.zeros((depth, width), dtype=np.int64)
+
+    def _cells(self, hashes):
+        h = np.asarray(hashes, dtype=np.int64).view(np.uint64)
+        return ((self.a[:, None] * h + self.b[:, None]) >> self.shift).astype(np.intp)
+
+    def add(self, hashes, counts):
+        for row, cells in enumerate(self._cells(hashes)):
+            self.table[row] += np.bincount(cells, weights=counts, minlength=self.table.shape[1]).astype(np.int64)
+
+    def query(self, hashes):
+        if not len(hashes):
+            return np.zeros(0, dtype=np.int64)
+        cells = self._cells(hashes)
+        return np.min([self.table[row, c] for row, c in enumerate(cells)], axis=0)
+
+    def clear(self):
+        self.table[:] = 0
+
+
+def document_terms(texts, stopwords=(), min_len=MIN_LEN):
+    """(terms, review counts) in a batch: each term counted once per review."""
+    texts = [t if isinstance(t, str) else "" for t in texts]
+    words = np.array(f" {BOUNDARY} ".join(texts).split(), dtype=object)
+    if not len(words):
+        return np.empty(0, dtype=object), np.zeros(0, dtype=np.int64)
+    codes, uniques = pd.factorize(words)
+    is_boundary = uniques[codes] == BOUNDARY
+    doc = np.cumsum(is_boundary)
+    stopwords = set(stopwords)
+    usable = np.fromiter((len(u) >= min_len and u not in stopwords and u != BOUNDARY for u in uniques),
+                         dtype=bool, count=len(uniques))
+    keep = usable[codes]
+    pairs = np.unique((doc[keep].astype(np.int64) << 32) | codes[keep])
+    counts = np.bincount(pairs & 0xFFFFFFFF, minlength=len(uniques))
+    present = np.flatnonzero(counts)
+    return uniques[present], counts[present]
+
+
+class KeywordTrends:
+    """
+    Windowed term counts of one review stream and their spikes. Feed batches
+    with ``add`` in time order (rows inside a batch may be in any order);
+    rows older than the open window are dropped and counted in ``late``.
+    ``add`` and ``close`` return the rows (TREND_COLUMNS minus app) of the
+    windows they closed.
+    """
+
+    def __init__(self, freq=FREQ, baseline_windows=BASELINE_WINDOWS, top_k=TOP_K, stopwords=(),
+                 width=SKETCH_WIDTH, depth=SKETCH_DEPTH, min_count=MIN_COUNT, min_ratio=MIN_RATIO,
+                 min_z=MIN_Z):
+        self.freq = freq
+        self.top_k = top_k
+        self.stopwords = set(stopwords)
+        self.min_count, self.min_ratio, self.min_z = min_count, min_ratio, min_z
+        self.current = CountMinSketch(width, depth)
+        self.baseline = deque(maxlen=baseline_windows)  # (sketch, reviews) of closed windows
+        self.spare = []  # sketches that dropped out of the baseline, reused
+        self._new_sketch = lambda: CountMinSketch(width, depth)
+        self.window = None
+        self.reviews = 0
+        self.heavy = {}  # term -> hash, at most top_k
+        self.late = 0
+
+    def add(self, texts, dates):
+        periods = pd.PeriodIndex(pd.to_datetime(pd.Series(dates)), freq=self.freq)
+        texts = np.asarray(list(texts), dtype=object)[periods.notna()]
+        windows = periods[periods.notna()].asi8
+        closed = []
+        for window in np.unique(windows):
+            if self.window is not None and window < self.window.ordinal:
+                self.late += int((windows == window).sum())
+                continue
+            if self.window is not None and window > self.window.ordinal:
+                closed += self._close_window(window)
+            self.window = pd.Period(ordinal=window, freq=self.freq)
+            self._count(texts[windows == window])
+        return closed
+
+    def close(self):
+        """Close the open window (end of stream)."""
+        return self._close_window(None) if self.window is not None else []
+
+    def _count(self, texts):
+        terms, counts = document_terms(texts, self.stopwords)
+        self.reviews += len(texts)
+        if not len(terms):
+            return
+        hashes = text_hashes(terms)
+        self.current.add(hashes, counts)
+        # heavy hitters: keep the top_k of the old candidates and this batch's terms
+        names = list(self.heavy) + [t for t in terms if t not in self.heavy]
+        cand = np.concatenate([np.fromiter(self.heavy.values(), dtype=np.int64, count=len(self.heavy)),
+                               hashes[[t not in self.heavy for t in terms]]])
+        est = self.current.query(cand)
+        top = np.argsort(-est, kind="stable")[:self.top_k]
+        self.heavy = {names[i]: cand[i] for i in top}
+
+    def _close_window(self, next_window):
+        rows = self.evaluate()
+        if len(self.baseline) == self.baseline.maxlen and self.baseline:
+            self.spare.append(self.baseline[0][0])
+        self.baseline.append((self.current, self.reviews))
+        self.current = self.spare.pop() if self.spare else self._new_sketch()
+        self.current.clear()
+        self.reviews = 0
+        self.heavy = {}
+        # windows without reviews still age the baseline
+        if next_window is not None:
+            gap = int(next_window - self.window.ordinal) - 1
+            for _ in range(min(gap, self.baseline.maxlen or 0)):
+                self.baseline.append((self._new_sketch(), 0))
+        return rows
+
+    def evaluate(self):
+        """Heavy hitters of the open window with their spike statistics."""
+        if not self.heavy:
+            return []
+        terms = list(self.heavy)
+        hashes = np.fromiter(self.heavy.values(), dtype=np.int64, count=len(terms))
+        count = self.current.query(hashes).astype(float)
+        base_reviews = sum(r for _, r in self.baseline)
+        base = sum((s.query(hashes) for s, _ in self.baseline), np.zeros(len(terms))).astype(float)
+        if base_reviews:
+            expected = base * self.reviews / base_reviews
+            z = (count - expected) / np.sqrt(np.maximum(expected, 1.0))
+            ratio = (count + 1) / (expected + 1)
+            spike = (count >= self.min_count) & (ratio >= self.min_ratio) & (z >= self.min_z)
+        else:
+            expected = z = ratio = np.full(len(terms), np.nan)
+            spike = np.zeros(len(terms), dtype=bool)
+        start = self.window.start_time
+        order = np.argsort(-count, kind="stable")
+        return [{
+            "window_start": start,
+            "reviews": self.reviews,
+            "term": terms[i],
+            "count": int(count[i]),
+            "share": count[i] / self.reviews if self.reviews else 0.0,
+            "baseline_share": base[i] / base_reviews if base_reviews else np.nan,
+            "expected": expected[i],
+            "ratio": ratio[i],
+            "z": z[i],
+            "spike": bool(spike[i]),
+        } for i in order]
+
+
+def dates_sorted(backend, dataset, app, filters=None):
+    """Whether an app's dates are in order; reads the at column batch by batch."""
+    last = None
+    for df in backend.batches(dataset, ["at"], apps=[app], filters=filters):
+        at = df["at"].dropna()
+        if at.empty:
+            continue
+        if not at.is_monotonic_increasing or (last is not None and at.iloc[0] < last):
+            return False
+        last = at.iloc[-1]
+    return True
+
+def app_batches(backend, dataset, app, filters=None, spill_dir=None):
+    """
+    Batches of an app's (at, clean_content) in date order. Saved datasets are
+    sorted by (app, at) and are streamed as they are; when the app's dates
+    are out of order, its rows are sorted through a ChunkedDatasetWriter in a
+    temporary directory (under ``spill_dir`` if given), so memory stays
+    bounded by the writer's merge buffer and the disk holds one sorted copy.
+    """
+    import tempfile
+    from eda_queries import ParquetBackend
+    from storage import ChunkedDatasetWriter
+
+    columns = ["at", "clean_content"]
+    if dates_sorted(backend, dataset, app, filters):
+        yield from backend.batches(dataset, columns, apps=[app], filters=filters)
+        return
+    print(f"⚠️ {app}: {dataset} is not sorted by date; sorting the app's reviews on disk")
+    with tempfile.TemporaryDirectory(prefix="cx_trends_", dir=spill_dir) as tmp:
+        with ChunkedDatasetWriter(tmp, "sorted", csv=False) as writer:
+            for df in backend.batches(dataset, columns, apps=[app], filters=filters):
+                writer.write(df)
+        if writer.rows:
+            yield from ParquetBackend(tmp, backend.batch_rows).batches("sorted", columns)
+
+def run_trends(apps=None, sentiment=None, freq=FREQ, baseline_windows=BASELINE_WINDOWS, top_k=TOP_K,
+               stopwords=(), output_path=TRENDS_PATH, **thresholds):
+    """
+    Stream every app's reviews (only ``sentiment`` ones if given, e.g.
+    "negative") through KeywordTrends and write all windows' heavy hitters
+    to ``output_path``. Returns that frame.
+    """
+    from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+    from eda_queries import ParquetBackend, CLEANED_NAME, SENTIMENT_NAME
+
+    backend = ParquetBackend()
+    dataset = SENTIMENT_NAME if sentiment else CLEANED_NAME
+    filters = [("sentiment", "==", sentiment)] if sentiment else None
+    apps = apps if apps is not None else [str(a) for a in backend.view("reviews_per_app")["app"]]
+    stopwords = set(ENGLISH_STOP_WORDS) | set(stopwords)
+
+    rows = []
+    for app in apps:
+        trends = KeywordTrends(freq, baseline_windows, top_k, stopwords, **thresholds)
+        for df in app_batches(backend, dataset, app, filters):
+            rows += [dict(r, app=app) for r in trends.add(df["clean_content"], df["at"])]
+        rows += [dict(r, app=app) for r in trends.close()]
+
+    out = pd.DataFrame(rows, columns=TREND_COLUMNS)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    out.to_csv(output_path, index=False)
+    return out
+
+def latest_spikes(trends):
+    """Spiking terms of each app's most recent window."""
+    if trends.empty:
+        return trends
+    last = trends.groupby("app")["window_start"].transform("max")
+    return trends[(trends["window_start"] == last) & trends["spike"]]
+
+def print_spikes(trends, recent=None):
+    spikes = trends[trends["spike"]]
+    print(f"\n--- Keyword spikes ({len(spikes)} over {trends['window_start'].nunique()} windows) ---\n")
+    shown = latest_spikes(trends) if recent is None else spikes[spikes["window_start"] >= recent]
+    if shown.empty:
+        print("No spikes in the latest window.")
+        return
+    for (app, start), group in shown.groupby(["app", "window_start"], sort=True):
+        terms = ", ".join(f"{t} ({c} vs {e:.1f} expected)" for t, c, e in
+                          zip(group["term"], group["count"], group["expected"]))
+        print(f"{app} {pd.Timestamp(start).date()}: {terms}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Windowed keyword trends and spikes per app.")
+    parser.add_argument("--apps", nargs="+", default=None)
+    parser.add_argument("--sentiment", default=None, help="only reviews with this label (e.g. negative)")
+    parser.add_argument("--freq", default=FREQ, help="window length as a pandas period alias (W, D, M)")
+    parser.add_argument("--baseline", type=int, default=BASELINE_WINDOWS, help="windows in the baseline")
+    parser.add_argument("--top-k", type=int, default=TOP_K, help="heavy hitters tracked per window")
+    parser.add_argument("--min-count", type=int, default=MIN_COUNT)
+    parser.add_argument("--min-ratio", type=float, default=MIN_RATIO)
+    parser.add_argument("--min-z", type=float, default=MIN_Z)
+    parser.add_argument("--since", default=None, help="print spikes of windows from this date (default: latest)")
+    parser.add_argument("--output", default=TRENDS_PATH)
+    args = parser.parse_args()
+
+    trends = run_trends(args.apps, args.sentiment, args.freq, args.baseline, args.top_k, output_path=args.output,
+                        min_count=args.min_count, min_ratio=args.min_ratio, min_z=args.min_z)
+    print_spikes(trends, pd.Timestamp(args.since) if args.since else None)
+    print(f"\nTrends saved to: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+# tests/conftest.py
+import os
+import sys
+import uuid
+
+import pytest
+
+# no metrics files from test runs (read by config at import)
+os.environ.setdefault("CX_METRICS", "0")
+
+# the scripts import each other flat (from config import ...)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+
+@pytest.fixture
+def pg_db(monkeypatch):
+    """
+    A scratch database on the PostgreSQL server of the PG_* settings (see
+    db_config.py), dropped after the test; the test is skipped without a server.
+    """
+    psycopg2 = pytest.importorskip("psycopg2")
+    from db_config import get_db_params
+
+    try:
+        admin = psycopg2.connect(**dict(get_db_params(), dbname="postgres", connect_timeout=3))
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"no PostgreSQL server: {e}")
+    admin.autocommit = True
+    name = f"cx_test_{uuid.uuid4().hex[:12]}"
+    with admin.cursor() as cur:
+        cur.execute(f'CREATE DATABASE "{name}"')
+    monkeypatch.setenv("PG_DATABASE", name)
+    try:
+        yield name
+    finally:
+        with admin.cursor() as cur:
+            cur.execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
+        admin.close()
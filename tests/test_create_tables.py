@@ -0,0 +1,70 @@
+# tests/test_create_tables.py
+import psycopg2
+import pytest
+
+from create_tables import DDL, INDEX_DDL, create_partitioned, is_partitioned, migrate_to_partitioned
+from db_config import get_db_params
+
+
+@pytest.fixture
+def conn(pg_db):
+    conn = psycopg2.connect(**get_db_params())
+    yield conn
+    conn.close()
+
+
+def _partitions(cur):
+    cur.execute("SELECT review_text, tableoid::regclass::text FROM reviews ORDER BY review_text")
+    return dict(cur.fetchall())
+
+
+def test_partitioned_schema_routes_rows_by_month(conn):
+    with conn.cursor() as cur:
+        create_partitioned(cur, months_ahead=1)
+        cur.execute(INDEX_DDL)
+        cur.execute("INSERT INTO banks (bank_name, app_name) VALUES ('CBE', 'CBE')")
+        cur.execute("INSERT INTO reviews (bank_id, review_text, review_date) VALUES "
+                    "(1, 'old', '2021-05-03'), (1, 'undated', NULL)")
+        assert _partitions(cur) == {"old": "reviews_default", "undated": "reviews_default"}
+
+        # rows already in the default partition move out to the new month
+        cur.execute("SELECT create_review_partitions('2021-05-01', '2021-05-01')")
+        assert cur.fetchone()[0] == 1
+        assert _partitions(cur) == {"old": "reviews_y2021m05", "undated": "reviews_default"}
+        cur.execute("SELECT create_review_partitions('2021-05-01', '2021-05-01')")
+        assert cur.fetchone()[0] == 0
+    conn.commit()
+
+
+def test_partitioned_refuses_an_unpartitioned_table(conn):
+    with conn.cursor() as cur:
+        cur.execute(DDL)
+        with pytest.raises(ValueError, match="--migrate"):
+            create_partitioned(cur)
+
+
+def test_migrate_keeps_rows_and_ids(conn):
+    with conn.cursor() as cur:
+        cur.execute(DDL + INDEX_DDL)
+        cur.execute("INSERT INTO banks (bank_name, app_name) VALUES ('CBE', 'CBE')")
+        cur.execute("INSERT INTO reviews (bank_id, review_text, review_date, rating) "
+                    "SELECT 1, 'r' || g, TIMESTAMP '2024-01-01' + g * INTERVAL '1 day', 3 "
+                    "FROM generate_series(1, 100) g")
+        cur.execute("INSERT INTO reviews (bank_id, review_text, review_date) VALUES (1, 'undated', NULL)")
+        cur.execute("SELECT review_id, review_text FROM reviews ORDER BY review_id")
+        before = cur.fetchall()
+        conn.commit()
+
+        assert migrate_to_partitioned(cur, months_ahead=0) == 101
+        cur.execute(INDEX_DDL)
+        conn.commit()
+        assert is_partitioned(cur)
+        cur.execute("SELECT review_id, review_text FROM reviews ORDER BY review_id")
+        assert cur.fetchall() == before
+        cur.execute("SELECT count(*) FROM reviews_default")
+        assert cur.fetchone()[0] == 1
+        # new rows continue the id sequence
+        cur.execute("INSERT INTO reviews (bank_id, review_text, review_date) "
+                    "VALUES (1, 'new', '2024-02-01') RETURNING review_id")
+        assert cur.fetchone()[0] == 102
+    conn.commit()
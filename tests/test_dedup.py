@@ -0,0 +1,63 @@
+# tests/test_dedup.py
+import numpy as np
+import pandas as pd
+
+from dedup import cluster_heads, cluster_ids, fan_out, minhash_signatures, representative_texts
+
+BASE = " ".join(f"word{i}" for i in range(20))
+
+
+def _frame(texts):
+    return pd.DataFrame({
+        "review_id": np.arange(1, len(texts) + 1) * 10,
+        "at": pd.date_range("2024-01-01", periods=len(texts), freq="D"),
+        "clean_content": texts,
+    })
+
+
+def test_signatures_are_per_text():
+    sig = minhash_signatures(np.array(["good app", "bad app", "good app", None], dtype=object))
+    assert sig.shape == (4, 64)
+    assert (sig[0] == sig[2]).all()
+    assert (sig[0] != sig[1]).any()
+
+
+def test_near_duplicates_share_the_oldest_review_id():
+    df = _frame([BASE, "app keeps crashing after update", BASE + " thanks", "completely different words here",
+                 BASE])
+    assert cluster_ids(df).tolist() == [10, 20, 10, 40, 10]
+    # the same reviews in another row order get the same ids
+    shuffled = df.sample(frac=1, random_state=0)
+    assert cluster_ids(shuffled).tolist() == cluster_ids(df)[shuffled.index].tolist()
+
+
+def test_a_review_linking_two_clusters_merges_their_ids():
+    # Jaccard of the word/bigram shingles: 0.55 between the first two, 0.74 and
+    # 0.75 between the third and each of them
+    extra = " ".join(f"extra{i}" for i in range(16))
+    half = " ".join(f"extra{i}" for i in range(7))
+    df = _frame([BASE + " " + extra, BASE])
+    assert cluster_ids(df).tolist() == [10, 20]
+
+    # a newer review close to both: the younger cluster takes the older id
+    df = _frame([BASE + " " + extra, BASE, BASE + " " + half])
+    assert cluster_ids(df).tolist() == [10, 10, 10]
+
+
+def test_fan_out_spreads_head_values_to_the_cluster():
+    df = pd.DataFrame({"review_id": [1, 2, 3, 4], "cluster_id": [1, 1, 3, 1]})
+    heads = cluster_heads(df)
+    assert heads.tolist() == [True, False, True, False]
+    assert fan_out(df, heads, [0.5, -0.25]).tolist() == [0.5, 0.5, -0.25, 0.5]
+    # without clusters every row is its own head
+    plain = df.drop(columns="cluster_id")
+    assert cluster_heads(plain).all()
+    assert fan_out(plain, cluster_heads(plain), [1, 2, 3, 4]).tolist() == [1, 2, 3, 4]
+
+
+def test_representative_texts_split_by_key():
+    df = pd.DataFrame({"review_id": [1, 2, 3], "cluster_id": [1, 1, 1],
+                       "clean_content": ["very good app", "not very good app", "very good app!"]})
+    assert representative_texts(df).tolist() == ["very good app"] * 3
+    key = ["pos", "neg", "pos"]
+    assert representative_texts(df, key=key).tolist() == ["very good app", "not very good app", "very good app"]
@@ -0,0 +1,86 @@
+# tests/test_insights_api.py
+import http.client
+import json
+import threading
+
+import pandas as pd
+import pytest
+
+import insights_api
+from eda_queries import ParquetBackend
+from insights_api import InsightsService, make_server
+from storage import save_dataset
+
+
+def _save_reviews(directory, n):
+    df = pd.DataFrame({
+        "review_id": range(n),
+        "app": ["CBE", "BOA"] * (n // 2),
+        "at": pd.date_range("2024-01-01", periods=n, freq="h"),
+        "score": [1, 5] * (n // 2),
+        "clean_content": ["app crashes on login", "fast transfer great app"] * (n // 2),
+    })
+    save_dataset(df, directory, "cleaned_reviews", csv=False)
+    save_dataset(df.assign(sentiment=["negative", "positive"] * (n // 2)), directory, "sentiment_results",
+                 csv=False)
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(insights_api, "PROCESSED_DATA", str(tmp_path))
+    monkeypatch.setattr(insights_api, "PLOT_DIRS", {"eda": str(tmp_path / "eda"), "task4": str(tmp_path / "task4")})
+    _save_reviews(tmp_path, 10)
+    return tmp_path
+
+
+def _counts(body):
+    return {row["app"]: row["review_count"] for row in json.loads(body)}
+
+
+def test_data_change_clears_cache_and_changes_etag(data_dir):
+    service = InsightsService(ParquetBackend(str(data_dir)), version_ttl=0)
+    _, body, etag, status = service.respond("/banks", {})
+    assert status == "miss" and _counts(body) == {"CBE": 5, "BOA": 5}
+    assert service.respond("/banks", {})[2:] == (etag, "hit")
+    version = service.version()
+
+    _save_reviews(data_dir, 20)
+    assert service.version() != version
+    assert len(service.cache) == 0
+    _, body, new_etag, status = service.respond("/banks", {})
+    assert status == "miss" and _counts(body) == {"CBE": 10, "BOA": 10}
+    assert new_etag != etag
+
+
+@pytest.fixture
+def server(data_dir):
+    server = make_server(port=0, quiet=True)
+    server.service = InsightsService(ParquetBackend(str(data_dir)), version_ttl=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _get(server, path, etag=None):
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=10)
+    try:
+        conn.request("GET", path, headers={"If-None-Match": etag} if etag else {})
+        resp = conn.getresponse()
+        return resp.status, resp.getheader("ETag"), resp.read()
+    finally:
+        conn.close()
+
+
+def test_if_none_match_returns_304(server, data_dir):
+    status, etag, body = _get(server, "/banks")
+    assert status == 200 and etag
+    status, same, body = _get(server, "/banks", etag)
+    assert (status, same, body) == (304, etag, b"")
+    assert _get(server, "/banks", f'"stale", {etag}')[0] == 304
+
+    _save_reviews(data_dir, 20)
+    status, new_etag, body = _get(server, "/banks", etag)
+    assert status == 200 and new_etag != etag
+    assert _counts(body) == {"CBE": 10, "BOA": 10}
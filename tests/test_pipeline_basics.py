@@ -0,0 +1,132 @@
+# tests/test_pipeline_basics.py
+from urllib.error import HTTPError
+
+import pandas as pd
+import pytest
+
+from review_sources import FakeReviewSource
+from scrape_scheduler import ThrottledSource, TokenBucket, run_scheduler
+from scraper import FIRST_RUN_PAGES, raw_path, load_checkpoint, scrape_incremental
+from storage import ChunkedDatasetWriter, save_dataset, load_dataset, load_reviews
+
+
+def test_incremental_scrape_appends_only_new_reviews(tmp_path):
+    source = FakeReviewSource(total=50)
+    assert scrape_incremental("CBE", "app.cbe", source, page_size=20, max_pages=0, data_dir=tmp_path) == 50
+    assert load_checkpoint("CBE", tmp_path)["newest_review_id"] == "app.cbe-000000049"
+
+    source.add_reviews("app.cbe", 7)
+    assert scrape_incremental("CBE", "app.cbe", source, page_size=20, data_dir=tmp_path) == 7
+    assert scrape_incremental("CBE", "app.cbe", source, page_size=20, data_dir=tmp_path) == 0
+
+    raw = pd.read_csv(raw_path("CBE", tmp_path))
+    assert len(raw) == 57
+    assert raw["reviewId"].is_unique
+
+
+def test_first_run_is_bounded_and_backfills_later(tmp_path):
+    source = FakeReviewSource(total=1000)
+    assert scrape_incremental("CBE", "app.cbe", source, page_size=20, data_dir=tmp_path) == FIRST_RUN_PAGES * 20
+    assert scrape_incremental("CBE", "app.cbe", source, page_size=20, backfill_pages=1, data_dir=tmp_path) == 20
+    raw = pd.read_csv(raw_path("CBE", tmp_path))
+    assert raw["reviewId"].tolist() == [f"app.cbe-{seq:09d}" for seq in range(999, 999 - len(raw), -1)]
+
+
+def test_max_pages_does_not_skip_reviews(tmp_path):
+    source = FakeReviewSource(total=100)
+    assert scrape_incremental("CBE", "app.cbe", source, page_size=10, max_pages=0, data_dir=tmp_path) == 100
+
+    source.add_reviews("app.cbe", 50)
+    assert scrape_incremental("CBE", "app.cbe", source, page_size=10, max_pages=2, data_dir=tmp_path) == 20
+    # the newest-seen markers only move once the pass reaches the old reviews
+    assert load_checkpoint("CBE", tmp_path)["newest_review_id"] == "app.cbe-000000099"
+    source.add_reviews("app.cbe", 5)
+    assert scrape_incremental("CBE", "app.cbe", source, page_size=10, max_pages=2, data_dir=tmp_path) == 20
+    assert scrape_incremental("CBE", "app.cbe", source, page_size=10, data_dir=tmp_path) == 15
+    assert scrape_incremental("CBE", "app.cbe", source, page_size=10, data_dir=tmp_path) == 0
+
+    raw = pd.read_csv(raw_path("CBE", tmp_path))
+    assert len(raw) == 155
+    assert raw["reviewId"].is_unique
+    assert load_checkpoint("CBE", tmp_path)["newest_review_id"] == "app.cbe-000000154"
+
+
+class FlakySource:
+    host = "flaky"
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def fetch(self, app_id, count, continuation_token=None):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return [], None
+
+
+def test_throttled_source_retries_only_transient_errors():
+    busy = HTTPError("https://play.google.com", 503, "unavailable", None, None)
+    source = FlakySource([ConnectionResetError(), busy])
+    throttled = ThrottledSource(source, TokenBucket(1000), retries=3, backoff=0)
+    assert throttled.fetch("app.cbe", 10) == ([], None)
+    assert throttled.retried == 2
+
+    source = FlakySource([ValueError("bad response")])
+    with pytest.raises(ValueError):
+        ThrottledSource(source, TokenBucket(1000), retries=3, backoff=0).fetch("app.cbe", 10)
+    assert source.calls == 1
+
+
+def test_scheduler_with_no_apps(tmp_path):
+    report = run_scheduler(apps=[], data_dir=tmp_path, report_path=None)
+    assert report.empty
+
+
+def _reviews(n=1_000):
+    at = pd.date_range("2024-01-01", periods=n, freq="h")
+    return pd.DataFrame({
+        "review_id": range(n),
+        "app": ["CBE", "BOA", "Amole", "Dashen"] * (n // 4),
+        "at": at[::-1],  # newest first, as scraped
+        "score": [1, 2, 3, 4, 5] * (n // 5),
+        "clean_content": [f"review {i}" for i in range(n)],
+    })
+
+
+def test_storage_round_trip(tmp_path):
+    df = _reviews()
+    save_dataset(df, tmp_path, "cleaned_reviews", csv=False)
+    back = load_dataset(tmp_path, "cleaned_reviews")
+    assert len(back) == len(df)
+    assert set(back["review_id"]) == set(df["review_id"])
+    # sorted by (app, at) for row-group statistics
+    assert back.groupby("app", observed=True)["at"].apply(lambda s: s.is_monotonic_increasing).all()
+
+    cbe = load_reviews(tmp_path, "cleaned_reviews", text=True, apps=["CBE"])
+    assert cbe["app"].cat.categories.tolist() == ["CBE"]
+    assert cbe["clean_content"].tolist() == df.loc[df["app"] == "CBE"].sort_values("at")["clean_content"].tolist()
+
+
+def test_chunked_writer_matches_save_dataset(tmp_path):
+    df = _reviews()
+    save_dataset(df, tmp_path, "whole", csv=False)
+    with ChunkedDatasetWriter(tmp_path, "chunked", csv=False, merge_rows=100) as writer:
+        for start in range(0, len(df), 130):
+            writer.write(df.iloc[start:start + 130])
+    assert writer.rows == len(df)
+    whole = load_dataset(tmp_path, "whole")
+    chunked = load_dataset(tmp_path, "chunked")
+    assert chunked["review_id"].tolist() == whole["review_id"].tolist()
+
+
+def test_chunked_writer_unique_keeps_each_version(tmp_path):
+    first = pd.DataFrame({"review_id": [1, 2], "app": ["CBE", "CBE"],
+                          "at": pd.to_datetime(["2024-01-01", "2024-01-02"])})
+    edited = first.assign(at=pd.to_datetime(["2024-01-01", "2024-01-03"]))  # 1 repeated, 2 edited
+    with ChunkedDatasetWriter(tmp_path, "reviews", csv=False, unique="review_id") as writer:
+        writer.write(first)
+        writer.write(edited)
+    back = load_dataset(tmp_path, "reviews")
+    assert back["review_id"].tolist() == [1, 2, 2]
+    assert back["at"].dt.day.tolist() == [1, 2, 3]
@@ -0,0 +1,54 @@
+# tests/test_preprocessing.py
+import pandas as pd
+
+from preprocessing import PARITY_SAMPLES, clean_series, clean_text
+
+
+def test_clean_series_matches_clean_text():
+    texts = pd.Series(PARITY_SAMPLES, dtype=object)
+    expected = [clean_text(t).encode("utf-8") for t in texts]
+    assert [t.encode("utf-8") for t in clean_series(texts)] == expected
+
+
+def test_clean_series_keeps_index():
+    texts = pd.Series(["Good App!!", None], index=[7, 3])
+    assert clean_series(texts).to_dict() == {7: "good app", 3: ""}
+
+
+def _raw_reviews(app, n):
+    at = pd.date_range("2024-03-01", periods=n, freq="6h")
+    df = pd.DataFrame({
+        "reviewId": [f"{app}-{i}" for i in range(n)],
+        "content": [f"Review {i} of the {app} app!" for i in range(n)],
+        "score": [i % 5 + 1 for i in range(n)],
+        "at": at.astype(str),
+    })
+    df.loc[3, "reviewId"] = None     # older scrape without reviewId
+    df.loc[5, "content"] = "!!!"     # cleans to empty
+    repeat = df.iloc[[0, 1, 2]]      # scraped twice
+    edited = df.iloc[[4]].assign(at="2024-06-01 12:00:00", content="Edited: now it works")
+    return pd.concat([df, repeat, edited, repeat.iloc[[0]]], ignore_index=True)
+
+
+def test_streaming_matches_batch(tmp_path, monkeypatch):
+    import preprocessing
+    from storage import load_reviews
+
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    apps = ["CBE", "BOA"]
+    for app in apps:
+        _raw_reviews(app, 30).to_csv(raw / f"{app}_reviews.csv", index=False)
+    monkeypatch.setattr(preprocessing, "RAW_DATA", str(raw))
+    monkeypatch.setattr(preprocessing, "APPS", apps)
+    monkeypatch.setattr(preprocessing, "EXPORT_CSV", False)
+    monkeypatch.setattr(preprocessing, "PROCESSED_DATA", str(tmp_path / "batch"))
+
+    preprocessing.preprocess_app_reviews()
+    rows = preprocessing.preprocess_app_reviews_streaming(chunksize=7, output_dir=str(tmp_path / "stream"))
+
+    order = ["app", "at", "review_id"]
+    batch = load_reviews(tmp_path / "batch", "cleaned_reviews", text=True).sort_values(order, ignore_index=True)
+    stream = load_reviews(tmp_path / "stream", "cleaned_reviews", text=True).sort_values(order, ignore_index=True)
+    assert rows == len(batch) == 2 * (30 - 1 + 1)  # minus the empty review, plus the edit
+    pd.testing.assert_frame_equal(stream[batch.columns], batch)
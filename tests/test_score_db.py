@@ -0,0 +1,84 @@
+# tests/test_score_db.py
+import threading
+import time
+
+import psycopg2
+import pytest
+
+import score_db
+from create_tables import DDL, refresh_rollups
+from db_config import get_db_params
+from sentiment import CACHE_NAMES
+
+MODEL = CACHE_NAMES["vader"]
+
+
+@pytest.fixture
+def conn(pg_db):
+    conn = psycopg2.connect(**get_db_params())
+    with conn.cursor() as cur:
+        cur.execute(DDL)
+        cur.execute("INSERT INTO banks (bank_name, app_name) VALUES ('CBE', 'CBE'), ('BOA', 'BOA')")
+        # unscored, stale-model and already current rows, over ten days; some undated
+        cur.execute("""
+            INSERT INTO reviews (bank_id, review_text, rating, review_date, sentiment_label, sentiment_score,
+                                 sentiment_model)
+            SELECT mod(g, 2) + 1,
+                   (ARRAY['good app', 'worst app ever', 'slow and not working'])[mod(g, 3) + 1] || ' ' || g,
+                   mod(g, 5) + 1,
+                   CASE WHEN mod(g, 50) = 0 THEN NULL ELSE TIMESTAMP '2024-03-01' + mod(g, 10) * INTERVAL '1 day' END,
+                   CASE WHEN mod(g, 7) = 0 OR mod(g, 11) = 0 THEN 'neutral' END,
+                   CASE WHEN mod(g, 7) = 0 OR mod(g, 11) = 0 THEN 0 END,
+                   CASE WHEN mod(g, 7) = 0 THEN 'old_model' WHEN mod(g, 11) = 0 THEN %s END
+            FROM generate_series(1, 600) g
+        """, (MODEL,))
+        refresh_rollups(cur)
+        cur.execute("SELECT review_id FROM reviews WHERE sentiment_model IS DISTINCT FROM %s", (MODEL,))
+        todo = {row[0] for row in cur.fetchall()}
+    conn.commit()
+    yield conn, todo
+    conn.close()
+
+
+def test_two_workers_split_the_rows_and_keep_rollups_exact(conn, monkeypatch):
+    conn, todo = conn
+    write = score_db.write_scores
+    written = {}
+
+    def slow_write(cur, ids, compound, model, scored=score_db.SCORED_TABLE):
+        written.setdefault(threading.current_thread().name, []).extend(int(i) for i in ids)
+        time.sleep(0.02)  # hold the claimed rows so the workers overlap
+        return write(cur, ids, compound, model, scored)
+
+    monkeypatch.setattr(score_db, "write_scores", slow_write)
+    totals = {}
+
+    def worker(name):
+        totals[name] = score_db.run_worker("vader", workers=1, claim_rows=50, fetch_rows=20, use_cache=False)
+
+    threads = [threading.Thread(target=worker, args=(name,), name=name) for name in ("a", "b")]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert set(written) == {"a", "b"}, "both workers claimed rows"
+    a, b = set(written["a"]), set(written["b"])
+    assert not a & b
+    assert len(written["a"]) + len(written["b"]) == len(todo)
+    assert a | b == todo
+    assert totals["a"] + totals["b"] == len(todo)
+
+    with conn.cursor() as cur:
+        cur.execute("SELECT count(*) FROM reviews WHERE sentiment_model IS DISTINCT FROM %s "
+                    "OR sentiment_label IS NULL", (MODEL,))
+        assert cur.fetchone()[0] == 0
+        cur.execute("SELECT * FROM review_daily_rollup ORDER BY 1, 2, 3, 4")
+        incremental = cur.fetchall()
+        refresh_rollups(cur)
+        cur.execute("SELECT * FROM review_daily_rollup ORDER BY 1, 2, 3, 4")
+        assert cur.fetchall() == incremental
+    conn.rollback()
+
+    # nothing is left for another run
+    assert score_db.run_worker("vader", workers=1, use_cache=False) == 0
@@ -0,0 +1,84 @@
+# tests/test_trends.py
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from eda_queries import ParquetBackend
+from score_cache import text_hashes
+from trends import CountMinSketch, KeywordTrends, TREND_COLUMNS, app_batches, latest_spikes
+
+
+def test_count_min_sketch_within_error_bound():
+    rng = np.random.default_rng(1)
+    counts = rng.zipf(1.3, 5_000).clip(max=500)
+    hashes = text_hashes(np.array([f"term{i}" for i in range(len(counts))], dtype=object))
+    width, depth = 256, 4
+    sketch = CountMinSketch(width, depth)
+    sketch.add(hashes, counts)
+    error = sketch.query(hashes) - counts
+    assert (error >= 0).all()  # never undercounts
+    # over by at most e * N / width, except with probability e ** -depth
+    within = (error <= math.e * counts.sum() / width).mean()
+    assert within >= 1 - math.exp(-depth)
+
+
+def test_count_min_sketch_needs_power_of_two_width():
+    with pytest.raises(ValueError):
+        CountMinSketch(width=1000)
+
+
+WORDS = ["login", "transfer", "balance", "update", "support", "account", "payment", "screen"]
+
+
+def _reviews(weeks=6, per_week=40, spike_week=5):
+    rows = []
+    for week in range(weeks):
+        start = pd.Timestamp("2024-01-01") + pd.Timedelta(weeks=week)
+        for i in range(per_week):
+            words = [WORDS[(i + j + week) % len(WORDS)] for j in range(3)]
+            # a crash in one review a week, then in most of the spike week's
+            if i == 0 or (week == spike_week and i % 3):
+                words.append("crash")
+            rows.append({"app": "CBE", "at": start + pd.Timedelta(hours=4 * i),
+                         "clean_content": " ".join(words)})
+    return pd.DataFrame(rows)
+
+
+def _trends(batches):
+    trends = KeywordTrends(baseline_windows=4)
+    rows = []
+    for df in batches:
+        rows += [dict(r, app="CBE") for r in trends.add(df["clean_content"], df["at"])]
+    rows += [dict(r, app="CBE") for r in trends.close()]
+    return pd.DataFrame(rows, columns=TREND_COLUMNS), trends
+
+
+def test_spike_is_flagged_in_latest_window():
+    df = _reviews()
+    out, trends = _trends(df.iloc[i:i + 25] for i in range(0, len(df), 25))
+    assert trends.late == 0
+    assert out["window_start"].nunique() == 6
+
+    spikes = latest_spikes(out)
+    assert spikes["term"].tolist() == ["crash"]
+    row = spikes.iloc[0]
+    assert row["count"] == 27 and row["expected"] == pytest.approx(1.0)
+    assert not out.loc[out["window_start"] < row["window_start"], "spike"].any()
+
+
+def test_unsorted_dataset_is_streamed_in_date_order(tmp_path):
+    df = _reviews()
+    df.sample(frac=1, random_state=0).to_parquet(tmp_path / "cleaned_reviews.parquet", index=False)
+    backend = ParquetBackend(str(tmp_path), batch_rows=30)
+
+    batches = list(app_batches(backend, "cleaned_reviews", "CBE", spill_dir=str(tmp_path)))
+    assert len(batches) > 1
+    at = pd.concat(batches)["at"]
+    assert at.is_monotonic_increasing and len(at) == len(df)
+    assert [p.name for p in tmp_path.iterdir()] == ["cleaned_reviews.parquet"]  # spill removed
+
+    out, trends = _trends(batches)
+    assert trends.late == 0
+    assert latest_spikes(out)["term"].tolist() == ["crash"]